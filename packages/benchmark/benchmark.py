@@ -1,9 +1,9 @@
 import os
 import sys
 import warnings
-from concurrent.futures import ProcessPoolExecutor
-from multiprocessing import cpu_count
+from functools import partial
 from pathlib import Path
+from threading import Lock
 
 import torch
 
@@ -28,8 +28,14 @@ from clusview.metrics.davies_bouldin_score import DaviesBouldinScore
 from clusview.metrics.outlier_ratio import OutlierRatio
 from clusview.metrics.silhouette_score import SilhouetteScore
 from clusview.metrics.v_measure_score import VMeasureScore
+from clusview.pipelines.execution_policy import ExecutionPolicy
+from clusview.pipelines.memory_budget import MemoryBudget
+from clusview.pipelines.scheduler import Scheduler
+from clusview.pipelines.worker_pool import WorkerPool
+from clusview.profiling.profiler import profiler
 from clusview.samplers.clusters.hdsbcan_sampler import HDBSCANSampler
 from clusview.samplers.parameters.linear_sampler import LinearSampler
+from clusview.storage.embedding_store import EmbeddingStore
 from hdbscan import HDBSCAN
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
@@ -65,8 +71,6 @@ schema = {
 for metric in benchmark.metrics:
     schema[metric] = pl.Float64
 
-df = pl.DataFrame(schema=schema)
-
 datasets = benchmark.datasets
 columns = benchmark.columns
 models = benchmark.models
@@ -84,87 +88,224 @@ metrics = {
 }
 
 
-def cluster(hdbscan: HDBSCAN, embeddings: np.ndarray, groundtruth: np.ndarray):
-    clusters = hdbscan.fit_predict(embeddings)
-    metrics["VMeasureScore"] = VMeasureScore(groundtruth_clusters=groundtruth, beta=1.0)
-    metric_values = []
-    for metric in metrics:
-        metric_values.append(
-            metrics[metric].perform_metric(clusters=clusters, embeddings=embeddings)
+def load(dataset: str):
+    documents = CSVConcatenator(dataset, columns).load_documents()
+    groundtruth = np.where(
+        pl.read_csv(dataset).select("status").to_series() == "Accepted", 1, 0
+    )
+    return documents, groundtruth
+
+
+def groundtruth_of(loaded):
+    # Only the labels, not the documents, are shipped to the clustering shards.
+    return loaded[1]
+
+
+transformers = {}
+transformers_lock = Lock()
+
+
+def embed(loaded, dataset: str, model_name: str):
+    # Encoding runs in a thread of the main process, where the models stay loaded.
+    with transformers_lock:
+        if model_name not in transformers:
+            transformers[model_name] = SentenceTransformer(
+                model_name, trust_remote_code=True
+            )
+    documents, _ = loaded
+    precision = benchmark.get("embedding_precision")
+    if precision is None:
+        return transformers[model_name].encode(
+            documents, show_progress_bar=False, device="cpu"
         )
-    return metric_values, hdbscan.min_cluster_size, hdbscan.min_samples
+    # Only the compact, memory-mapped store is kept in the main process, and workers
+    # read it from disk instead of receiving a float32 copy.
+    store = EmbeddingStore.encode(
+        f"{benchmark.get('embedding_dir', './result/embeddings')}/"
+        f"{Path(dataset).stem}_{model_name.replace('/', '_')}",
+        transformers[model_name],
+        documents,
+        precision,
+        show_progress_bar=False,
+        device="cpu",
+    )
+    sample = np.arange(min(1000, len(documents)))
+    reference = transformers[model_name].encode(
+        [documents[index] for index in sample], show_progress_bar=False, device="cpu"
+    )
+    print(f"{precision} embeddings of {dataset} with {model_name}:")
+    print(f"  {store.quality(reference, sample)}")
+    return store
+
+
+def reduce(embeddings: np.ndarray | EmbeddingStore, umap_seed: int):
+    if isinstance(embeddings, EmbeddingStore):
+        embeddings = embeddings.dequantize()
+    with profiler.stage("umap.fit"):
+        return UMAP(
+            n_neighbors=15,
+            n_components=5,
+            min_dist=0.0,
+            metric="cosine",
+            random_state=umap_seed,
+        ).fit_transform(embeddings)
+
+
+def cluster(
+    hdbscans: list,
+    reduced_embeddings: np.ndarray,
+    groundtruth: np.ndarray,
+    metrics: dict,
+):
+    metrics = {
+        **metrics,
+        "VMeasureScore": VMeasureScore(groundtruth_clusters=groundtruth, beta=1.0),
+    }
+    rows = []
+    for hdbscan in hdbscans:
+        with profiler.stage("hdbscan.fit"):
+            clusters = hdbscan.fit_predict(reduced_embeddings)
+        rows.append(
+            [
+                hdbscan.min_cluster_size,
+                hdbscan.min_samples,
+                *[
+                    metrics[metric].perform_metric(
+                        clusters=clusters, embeddings=reduced_embeddings
+                    )
+                    for metric in metrics
+                ],
+            ]
+        )
+    return rows
+
+
+def aggregate(*shards, key):
+    return [[*key, *row] for shard in shards for row in shard]
 
 
 if __name__ == "__main__":
+    if benchmark.get("profile", False):
+        profiler.enable()
+
+    hdbscan_sampler = HDBSCANSampler(
+        [
+            LinearSampler(
+                "min_cluster_size",
+                benchmark.min_cluster_size.min,
+                benchmark.min_cluster_size.max,
+                benchmark.min_cluster_size.max - benchmark.min_cluster_size.min + 1,
+            ),
+            LinearSampler(
+                "min_samples",
+                benchmark.min_samples.min,
+                benchmark.min_samples.max,
+                benchmark.min_samples.max - benchmark.min_samples.min + 1,
+            ),
+        ]
+    )
+    configurations = list(hdbscan_sampler.iterate_configurations())
+    shard_size = benchmark.get("shard_size", 1)
+
+    # The pool is sized once, for the largest dataset, and shared by the whole study.
+    n_documents = max(
+        pl.scan_csv(dataset).select(pl.len()).collect().item() for dataset in datasets
+    )
+    policy = ExecutionPolicy(
+        processes=benchmark.get("processes"),
+        threads_per_process=benchmark.get("threads_per_process"),
+    )
+    processes, threads = policy.plan(
+        n_documents, len(configurations) * len(models) * len(umap_seeds)
+    )
+    if benchmark.get("memory_budget") is not None:
+        metrics, processes = MemoryBudget(benchmark.memory_budget).admit(
+            metrics,
+            n_documents,
+            5,
+            processes,
+            n_threads=threads,
+            min_samples=benchmark.min_samples.max,
+        )
+    print(f"Sweeping with {processes} processes of {threads} threads each.")
+    pool = WorkerPool(max_workers=processes, threads_per_worker=threads)
+    for hdbscan in configurations:
+        hdbscan.core_dist_n_jobs = threads
+
+    progress_bar = tqdm(
+        total=len(configurations) * len(datasets) * len(models) * len(umap_seeds),
+        desc="Clustering",
+    )
+
+    # load(dataset) → embed(dataset, model) → reduce(seed) → shards → aggregate, so that
+    # UMAP fits and encodings overlap with the clustering of earlier branches.
+    scheduler = Scheduler(pool, threads=2)
     for dataset in datasets:
-        documents = CSVConcatenator(dataset, columns).load_documents()
-        groundtruth = np.where(
-            pl.read_csv(dataset).select("status").to_series() == "Accepted", 1, 0
+        scheduler.add(("load_documents", dataset), load, place="thread")
+        scheduler.add(
+            ("groundtruth", dataset),
+            groundtruth_of,
+            ("load_documents", dataset),
+            place="main",
         )
         for model_name in models:
-            print(f"Embedding {dataset} with {model_name}.")
-            model = SentenceTransformer(model_name, trust_remote_code=True)
-            embeddings = model.encode(documents, show_progress_bar=True, device="cpu")
+            scheduler.add(
+                ("encode", dataset, model_name),
+                embed,
+                ("load_documents", dataset),
+                args=(dataset, model_name),
+                place="thread",
+            )
             for umap_seed in umap_seeds:
-                reduced_embeddings = UMAP(
-                    n_neighbors=15,
-                    n_components=5,
-                    min_dist=0.0,
-                    metric="cosine",
-                    random_state=umap_seed,
-                ).fit_transform(embeddings)
-                hdbscan_sampler = HDBSCANSampler(
-                    [
-                        LinearSampler(
-                            "min_cluster_size",
-                            benchmark.min_cluster_size.min,
-                            benchmark.min_cluster_size.max,
-                            benchmark.min_cluster_size.max
-                            - benchmark.min_cluster_size.min
-                            + 1,
-                        ),
-                        LinearSampler(
-                            "min_samples",
-                            benchmark.min_samples.min,
-                            benchmark.min_samples.max,
-                            benchmark.min_samples.max - benchmark.min_samples.min + 1,
-                        ),
-                    ]
+                branch = (dataset, model_name, umap_seed)
+                scheduler.add(
+                    ("umap", *branch),
+                    reduce,
+                    ("encode", dataset, model_name),
+                    args=(umap_seed,),
                 )
-
-                progress_bar = tqdm(
-                    total=sum(1 for _ in hdbscan_sampler.iterate_configurations()),
-                    desc=f"Clustering with UMAP seed {umap_seed}",
+                shards = [
+                    scheduler.add(
+                        ("hdbscan", *branch, start),
+                        cluster,
+                        ("umap", *branch),
+                        ("groundtruth", dataset),
+                        args=(configurations[start : start + shard_size], metrics),
+                        on_done=lambda rows: progress_bar.update(len(rows)),
+                    )
+                    for start in range(0, len(configurations), shard_size)
+                ]
+                scheduler.add(
+                    ("aggregate", *branch),
+                    partial(aggregate, key=branch),
+                    *shards,
+                    place="main",
                 )
-                results = []
-
-                with ProcessPoolExecutor(max_workers=cpu_count()) as pool:
-                    for hdbscan in hdbscan_sampler.iterate_configurations():
-                        future_result = pool.submit(
-                            cluster, hdbscan, reduced_embeddings, groundtruth
-                        )
-                        future_result.add_done_callback(
-                            lambda future: (
-                                results.append(
-                                    [
-                                        dataset,
-                                        model_name,
-                                        umap_seed,
-                                        future.result()[1],
-                                        future.result()[2],
-                                        *future.result()[0],
-                                    ]
-                                ),
-                                progress_bar.update(1),
-                            )
-                        )
-
-                df = df.extend(pl.DataFrame(results, schema=schema, orient="row"))
-                pool.shutdown(wait=True)
-                progress_bar.close()
-            print()
+
+    results = scheduler.run()
+    progress_bar.close()
+    df = pl.DataFrame(
+        [row for rows in results.values() for row in rows],
+        schema=schema,
+        orient="row",
+    )
+
+    pool.shutdown(wait=True)
+    report = pool.report()
+    print(
+        f"Worker pool: {report['workers']} workers, {report['tasks']} tasks, "
+        f"{report['startup_seconds']:.1f}s startup, {report['busy_seconds']:.1f}s busy, "
+        f"{report['utilization']:.0%} utilization."
+    )
 
     print("Ordering results.")
     df = df.sort(["dataset", "model", "umap_seed", "min_cluster_size", "min_samples"])
     print("Saving results to disk.")
     df.write_csv("./result/clusview.csv")
+    # Parquet lets SweepResultLoader read only the row groups and columns it needs.
+    df.write_parquet("./result/clusview.parquet")
+
+    if profiler.enabled:
+        print("Saving profile to disk.")
+        profiler.to_json("./result/profile.json")
+        profiler.to_trace("./result/profile_trace.json")
@@ -0,0 +1,82 @@
+"""Import-time benchmark for the lightweight clusview modules.
+
+Every module is imported in a fresh interpreter, which reports its import time and
+whether any heavy dependency got loaded along the way. The script exits with a
+non-zero status if a module exceeds its time budget or pulls a heavy dependency.
+
+Usage: python import_time.py [repetitions]
+"""
+
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "umap",
+    "hdbscan",
+    "numba",
+    "pandas",
+    "matplotlib",
+    "scipy",
+    "sklearn",
+]
+
+# Module -> maximum import time in seconds.
+BUDGETS = {
+    "clusview.metrics": 0.5,
+    "clusview.metrics.base_metric": 0.5,
+    "clusview.metrics.silhouette_score": 1.0,
+    "clusview.metrics.davies_bouldin_score": 1.0,
+    "clusview.metrics.v_measure_score": 1.0,
+    "clusview.metrics.cluster_count": 1.0,
+    "clusview.metrics.outlier_ratio": 1.0,
+    "clusview.metrics.average_cluster_size": 1.0,
+    "clusview.metrics.metric_maps": 1.5,
+    "clusview.samplers.clusters.hdsbcan_sampler": 1.0,
+    "clusview.loaders.documents.csv_concatenator": 0.5,
+    "clusview.pipelines.metric_mapper": 1.5,
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module: str, repetitions: int) -> dict:
+    timings = []
+    heavy = []
+    for _ in range(repetitions):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy = result["heavy"]
+    return {"seconds": min(timings), "heavy": heavy}
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    failures = 0
+
+    for module, budget in BUDGETS.items():
+        result = measure(module, repetitions)
+        failed = result["seconds"] > budget or result["heavy"]
+        failures += bool(failed)
+        print(
+            f"{'FAIL' if failed else 'ok':4} {module:45} {result['seconds']:.3f}s"
+            f" (budget {budget:.1f}s)"
+            + (f" loaded {', '.join(result['heavy'])}" if result["heavy"] else "")
+        )
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,308 @@
+"""Offline performance benchmark for clusview's hot paths.
+
+Unlike `benchmark.py`, which measures clustering quality on real datasets, this suite
+measures clusview's own speed on synthetic Gaussian-blob embeddings, so it needs
+neither downloaded models nor datasets.
+
+Usage:
+    python performance.py run [performance.yml]
+        Times every case and writes `result/performance/<commit>.json`.
+    python performance.py compare BASE.json HEAD.json [--tolerance 0.2]
+        Compares two result files, exiting with a non-zero status on regressions.
+"""
+
+import argparse
+import copy
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from os import cpu_count
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import yaml
+from clusview.loaders.documents.csv_concatenator import CSVConcatenator
+from clusview.metrics import map_expressions as mexp
+from clusview.metrics import metric_maps as mmaps
+from clusview.metrics.average_cluster_size import AverageClusterSize
+from clusview.metrics.cluster_count import ClusterCount
+from clusview.metrics.davies_bouldin_score import DaviesBouldinScore
+from clusview.metrics.outlier_ratio import OutlierRatio
+from clusview.metrics.silhouette_score import SilhouetteScore
+from clusview.metrics.v_measure_score import VMeasureScore
+from clusview.samplers.clusters.hdsbcan_sampler import HDBSCANSampler
+from clusview.samplers.parameters.linear_sampler import LinearSampler
+
+RESULT_DIR = Path("./result/performance")
+
+
+def blobs(documents: int, dimensions: int, config: dict) -> tuple:
+    """Gaussian blobs with a fraction of their labels marked as outliers."""
+    rng = np.random.default_rng(config["seed"])
+    centers = rng.uniform(-10, 10, size=(config["centers"], dimensions))
+    labels = rng.integers(0, config["centers"], size=documents)
+    embeddings = centers[labels] + rng.normal(size=(documents, dimensions))
+
+    clusters = labels.copy()
+    clusters[rng.random(documents) < config["outlier_ratio"]] = -1
+
+    return embeddings.astype(np.float32), labels, clusters
+
+
+def timed(fn, repetitions: int, setup=None) -> float:
+    """Best wall time out of `repetitions` calls, in seconds.
+
+    With `setup`, every call is given a fresh `setup()` result, built outside the
+    timing, so that in-place operations never run twice on the same input.
+    """
+    timings = []
+    for _ in range(repetitions):
+        arguments = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        fn(*arguments)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def write_documents_csv(path: Path, documents: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(5000)])
+    pl.DataFrame(
+        {
+            "Title": [" ".join(rng.choice(vocabulary, 8)) for _ in range(documents)],
+            "Abstract": [
+                " ".join(rng.choice(vocabulary, 150)) for _ in range(documents)
+            ],
+        }
+    ).write_csv(path)
+
+
+def sampling_grid(points: int, axes: int, seed: int) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    grid = np.stack(
+        np.meshgrid(*[np.arange(points)] * axes, indexing="ij"), axis=-1
+    ).reshape(-1, axes)
+    columns = {f"param_{axis}": grid[:, axis] for axis in range(axes)}
+    columns["metric"] = rng.random(len(grid))
+    return pl.DataFrame(columns)
+
+
+def run(config: dict) -> list:
+    results = []
+    repetitions = config["repetitions"]
+    max_documents = config["max_documents"]
+
+    def add(case: str, shape: str, seconds: float) -> None:
+        results.append({"case": case, "shape": shape, "seconds": seconds})
+        print(f"{case:30} {shape:15} {seconds:10.4f}s")
+
+    for documents, dimensions in config["sizes"]:
+        shape = f"{documents}x{dimensions}"
+        embeddings, labels, clusters = blobs(documents, dimensions, config)
+
+        metrics = {
+            "SilhouetteScore": SilhouetteScore(backend="sklearn"),
+            "SilhouetteScore[numba]": SilhouetteScore(backend="numba"),
+            "DaviesBouldinScore": DaviesBouldinScore(backend="sklearn"),
+            "DaviesBouldinScore[numba]": DaviesBouldinScore(backend="numba"),
+            "VMeasureScore": VMeasureScore(groundtruth_clusters=labels),
+            "OutlierRatio": OutlierRatio(),
+            "ClusterCount": ClusterCount(),
+            "AverageClusterSize": AverageClusterSize(),
+        }
+        for name, metric in metrics.items():
+            if documents > max_documents[name.split("[")[0]]:
+                continue
+            if name.endswith("[numba]"):
+                # Compiled kernels must agree with the scikit-learn implementation.
+                reference = metrics[name.split("[")[0]].perform_metric(
+                    clusters=clusters, embeddings=embeddings
+                )
+                value = metric.perform_metric(clusters=clusters, embeddings=embeddings)
+                if not np.isclose(value, reference, rtol=1e-5):
+                    raise AssertionError(
+                        f"{name} on {shape}: {value} differs from scikit-learn's {reference}."
+                    )
+            add(
+                name,
+                shape,
+                timed(
+                    lambda: metric.perform_metric(
+                        clusters=clusters, embeddings=embeddings
+                    ),
+                    repetitions,
+                ),
+            )
+
+        if documents <= max_documents["hdbscan_sweep"]:
+            grid = config["hdbscan_sweep"]
+            sampler = HDBSCANSampler(
+                [
+                    LinearSampler(name, axis["min"], axis["max"], axis["samples"])
+                    for name, axis in grid.items()
+                ]
+            )
+
+            def sweep():
+                for hdbscan in sampler.iterate_configurations():
+                    hdbscan.fit_predict(embeddings)
+
+            add("hdbscan_sweep", shape, timed(sweep, 1))
+
+        if documents <= max_documents["csv_loading"] and dimensions == 5:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "documents.csv"
+                write_documents_csv(path, documents, config["seed"])
+                loader = CSVConcatenator(str(path), ["Title", "Abstract"])
+                add("csv_loading", shape, timed(loader.load_documents, repetitions))
+
+    for points, axes in config["metric_maps"]:
+        shape = "x".join([str(points)] * axes)
+        sampling = sampling_grid(points, axes, config["seed"])
+        other_sampling = sampling_grid(points, axes, config["seed"] + 1)
+
+        add("metric_map.build", shape, timed(lambda: mmaps.MetricMap(sampling), 1))
+
+        map_a = mmaps.MetricMap(sampling)
+        map_b = mmaps.MetricMap(other_sampling)
+
+        # Normalizing and smoothing modify the map, they run on copies.
+        add(
+            "metric_map.normalize",
+            shape,
+            timed(
+                lambda metric_map: metric_map.normalize(),
+                repetitions,
+                setup=lambda: copy.deepcopy(map_a),
+            ),
+        )
+        add(
+            "metric_map.smooth",
+            shape,
+            timed(
+                lambda metric_map: metric_map.smooth(passes=3, sigma=1.0),
+                repetitions,
+                setup=lambda: copy.deepcopy(map_a),
+            ),
+        )
+        distances = [
+            mmaps.total_distance,
+            mmaps.average_distance,
+            mmaps.max_distance,
+        ]
+        # scikit-learn's mean squared error only takes 2-D arrays.
+        if axes <= 2:
+            distances.append(mmaps.mean_squared_error)
+        for distance in distances:
+            add(
+                f"metric_map.{distance.__name__}",
+                shape,
+                timed(lambda: distance(map_a, map_b), repetitions),
+            )
+        add(
+            "map_expressions.mse",
+            shape,
+            timed(
+                lambda: mexp.distance(mexp.lazy(map_a), mexp.lazy(map_b), kind="mse"),
+                repetitions,
+            ),
+        )
+        add(
+            "metric_map.linear_combination",
+            shape,
+            timed(
+                lambda: mmaps.linear_combination([map_a, map_b], [0.5, 0.5]),
+                repetitions,
+            ),
+        )
+        add(
+            "map_expressions.objective",
+            shape,
+            timed(
+                lambda: mexp.weighted_sum(
+                    [mexp.lazy(map_a).normalize(), mexp.lazy(map_b).normalize()],
+                    [0.5, 0.5],
+                )
+                .smooth(passes=3, sigma=1.0)
+                .evaluate(),
+                repetitions,
+            ),
+        )
+
+    return results
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def compare(base_path: str, head_path: str, tolerance: float) -> int:
+    base = json.loads(Path(base_path).read_text())
+    head = json.loads(Path(head_path).read_text())
+
+    base_seconds = {(r["case"], r["shape"]): r["seconds"] for r in base["results"]}
+    regressions = 0
+
+    print(f"{base['commit']} -> {head['commit']}")
+    for result in head["results"]:
+        key = (result["case"], result["shape"])
+        if key not in base_seconds:
+            continue
+        ratio = result["seconds"] / base_seconds[key]
+        regressed = ratio > 1 + tolerance
+        regressions += regressed
+        print(
+            f"{'SLOWER' if regressed else '':6} {key[0]:30} {key[1]:15}"
+            f" {base_seconds[key]:10.4f}s -> {result['seconds']:10.4f}s ({ratio:.2f}x)"
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("config", nargs="?", default="performance.yml")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(compare(args.base, args.head, args.tolerance))
+
+    commit = current_commit()
+    results = run(yaml.safe_load(Path(args.config).read_text()))
+
+    RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    output = RESULT_DIR / f"{commit}.json"
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": cpu_count(),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results saved to {output}.")
@@ -1,7 +1,5 @@
 from typing import List
 
-import pandas as pd
-
 from .base_document_loader import BaseDocumentLoader
 
 
@@ -27,6 +25,8 @@ class CSVConcatenator(BaseDocumentLoader):
         Returns:
             List[str]: A list of concatenated documents.
         """
+        import pandas as pd
+
         df: pd.DataFrame = pd.read_csv(self.path_to_csv).astype(str)
 
         if self.column_names:
@@ -0,0 +1,3 @@
+"""
+Functions for loading metric maps from sweep results.
+"""
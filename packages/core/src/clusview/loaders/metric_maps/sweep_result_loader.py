@@ -0,0 +1,195 @@
+import glob
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+
+from ...metrics.metric_maps import MetricMap
+
+
+class SweepResultLoader:
+    """
+    Builds metric maps straight from sweep result files, without loading them whole.
+
+    Results, either the wide table written by the benchmark (one row per dataset,
+    model, seed and configuration, one column per metric) or the `<metric>_map.csv`
+    files written by `MetricMapper`, are scanned lazily with polars. Filters and the
+    selection of the hyperparameter and metric columns are pushed down into the scan,
+    so only the matching rows of the needed columns are read, and the remaining rows
+    are averaged per configuration, over seeds and any other unfiltered column, before
+    being collected.
+
+    Built maps are cached in `cache_dir`, keyed by the query and by the size and
+    modification time of the scanned files, so that repeated queries skip both the
+    scan and the interpolation of the map.
+
+    Args:
+        path (str): Parquet or CSV result file, or a glob pattern matching several.
+        cache_dir (str): Directory where built maps are cached. Not cached if `None`.
+
+    Examples:
+        >>> loader = SweepResultLoader("result/clusview.parquet", cache_dir=".map_cache")
+        >>> metric_map = loader.load_map(
+        ...     "SilhouetteScore",
+        ...     ["min_cluster_size", "min_samples"],
+        ...     filters={"dataset": "data/dataset_A.csv", "model": "all-MiniLM-L6-v2"},
+        ... )
+    """
+
+    def __init__(self, path: str, cache_dir: str = None) -> None:
+        self.path = path
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def scan(self) -> pl.LazyFrame:
+        """
+        Returns:
+            pl.LazyFrame: Lazy scan of the result files.
+        """
+        if self.path.endswith(".parquet"):
+            return pl.scan_parquet(self.path)
+        return pl.scan_csv(self.path)
+
+    def query(
+        self,
+        metric: str,
+        hyperparameters: List[str],
+        filters: Dict[str, Any] = None,
+    ) -> pl.LazyFrame:
+        """
+        Builds the lazy query of a metric map, without running it.
+
+        Args:
+            metric (str): Metric column to map.
+            hyperparameters (List[str]): Hyperparameter columns spanning the map.
+            filters (Dict[str, Any]): Value, or list of accepted values, of any other
+                column. Rows matching every filter are averaged per configuration.
+
+        Returns:
+            pl.LazyFrame: Sampling of the hyperparameters and their mean metric
+            values, sorted by configuration.
+        """
+        frame = self.scan()
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                frame = frame.filter(pl.col(column).is_in(list(value)))
+            else:
+                frame = frame.filter(pl.col(column) == value)
+
+        return (
+            frame.select(hyperparameters + [metric])
+            .group_by(hyperparameters)
+            .agg(pl.col(metric).mean())
+            .sort(hyperparameters)
+        )
+
+    def cache_path(
+        self,
+        metric: str,
+        hyperparameters: List[str],
+        filters: Dict[str, Any],
+        coordinates: str | Dict[str, Any] = "sampled",
+        resolution: int = 64,
+    ) -> Path | None:
+        if self.cache_dir is None:
+            return None
+
+        files = [
+            [file, Path(file).stat().st_size, Path(file).stat().st_mtime_ns]
+            for file in sorted(glob.glob(self.path))
+        ]
+        key = json.dumps(
+            {
+                "files": files,
+                "metric": metric,
+                "hyperparameters": hyperparameters,
+                "filters": {
+                    column: (
+                        sorted(value)
+                        if isinstance(value, (list, tuple, set))
+                        else value
+                    )
+                    for column, value in (filters or {}).items()
+                },
+                "coordinates": (
+                    coordinates
+                    if isinstance(coordinates, str)
+                    else {
+                        name: (
+                            spacing
+                            if isinstance(spacing, str)
+                            else np.asarray(spacing).tolist()
+                        )
+                        for name, spacing in coordinates.items()
+                    }
+                ),
+                "resolution": resolution,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz"
+
+    def load_map(
+        self,
+        metric: str,
+        hyperparameters: List[str],
+        filters: Dict[str, Any] = None,
+        coordinates: str | Dict[str, Any] = "sampled",
+        resolution: int = 64,
+    ) -> MetricMap:
+        """
+        Builds the metric map of a query, see `query`, from the cache when possible.
+
+        Args:
+            metric (str): Metric column to map.
+            hyperparameters (List[str]): Hyperparameter columns spanning the map.
+            filters (Dict[str, Any]): Value, or list of accepted values, of any other
+                column.
+            coordinates (str | Dict[str, Any]): Spacing of the grid along every
+                hyperparameter, or along each of them by name, see `MetricMap`.
+            resolution (int): Number of coordinates of `linear` and `log` axes.
+
+        Returns:
+            MetricMap: The metric map over the given hyperparameters.
+        """
+        path = self.cache_path(
+            metric, hyperparameters, filters, coordinates, resolution
+        )
+        if path is not None and path.exists():
+            with np.load(path) as cached:
+                metric_map = MetricMap()
+                metric_map.mapping = cached["mapping"]
+                metric_map.coordinates = [
+                    cached[f"coordinates_{axis}"]
+                    for axis in range(metric_map.mapping.ndim)
+                ]
+                metric_map.skipped = (
+                    cached["skipped"]
+                    if "skipped" in cached.files
+                    else np.zeros(metric_map.mapping.shape, dtype=bool)
+                )
+                metric_map.metric_name = metric
+                metric_map.hyperparameters = list(hyperparameters)
+                return metric_map
+
+        sampling = self.query(metric, hyperparameters, filters).collect()
+        if sampling.height == 0:
+            raise ValueError(f"No results of {self.path} match the filters {filters}.")
+        metric_map = MetricMap(sampling, coordinates, resolution)
+
+        if path is not None:
+            np.savez(
+                path,
+                mapping=metric_map.mapping,
+                skipped=metric_map.skipped,
+                **{
+                    f"coordinates_{axis}": axis_coordinates
+                    for axis, axis_coordinates in enumerate(metric_map.coordinates)
+                },
+            )
+        return metric_map
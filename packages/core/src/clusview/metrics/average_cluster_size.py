@@ -3,7 +3,7 @@ from typing import Any
 import numpy as np
 from numpy import ndarray
 
-from .base_metric import BaseMetric
+from .base_metric import BaseMetric, batch_cluster_sizes
 
 
 class AverageClusterSize(BaseMetric):
@@ -25,6 +25,9 @@ class AverageClusterSize(BaseMetric):
         >>> result = metric.perform_metric(clusters=clusters)
         >>> print(result)
         3.0
+
+        >>> metric.perform_metric_batch(np.array([[0, 0, 1, -1], [-1, -1, -1, -1]]))
+        array([1.5, 0. ])
     """
 
     def perform_metric(self, **kwargs: Any) -> float:
@@ -36,3 +39,14 @@ class AverageClusterSize(BaseMetric):
         unique_clusters, cluster_counts = np.unique(clusters, return_counts=True)
         average_size = np.mean(cluster_counts)
         return average_size
+
+    def perform_metric_batch(self, clusters: ndarray, **kwargs: Any) -> ndarray:
+        sizes = batch_cluster_sizes(clusters)[:, 1:]
+        cluster_count = (sizes > 0).sum(axis=1)
+        clustered_count = sizes.sum(axis=1)
+        return np.divide(
+            clustered_count,
+            cluster_count,
+            out=np.zeros(len(sizes)),
+            where=cluster_count > 0,
+        )
@@ -1,15 +1,145 @@
+import copy
 from abc import ABC, abstractmethod
+from importlib.util import find_spec
 from typing import Any
 
+import numpy as np
+from numpy import ndarray
+
+from ..profiling.profiler import profiler
+
+
+def batch_cluster_sizes(clusters: ndarray) -> ndarray:
+    """
+    Counts the members of every cluster, row by row, with a single offset `bincount`.
+
+    Args:
+        clusters (ndarray): Label matrix of shape (configurations, documents), where -1
+            indicates outliers.
+
+    Returns:
+        ndarray: Matrix of shape (configurations, max label + 2), where column 0 holds
+        the outlier count and column `c + 1` the size of cluster `c`.
+
+    Examples:
+        >>> batch_cluster_sizes(np.array([[0, 0, 1, -1], [-1, -1, 0, 0]]))
+        array([[1, 2, 1],
+               [2, 2, 0]])
+    """
+    clusters = np.asarray(clusters)
+    configurations = len(clusters)
+    width = int(clusters.max()) + 2 if clusters.size else 1
+
+    offsets = (np.arange(configurations, dtype=np.int64) * width)[:, None]
+    counts = np.bincount(
+        (clusters.astype(np.int64) + 1 + offsets).ravel(),
+        minlength=configurations * width,
+    )
+    return counts.reshape(configurations, width)
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Resolves the implementation used by metrics with compiled kernels.
+
+    Args:
+        backend (str): `"numba"`, `"sklearn"`, or `"auto"` for numba when installed.
+
+    Returns:
+        str: Either `"numba"` or `"sklearn"`.
+    """
+    if backend == "auto":
+        return "numba" if find_spec("numba") is not None else "sklearn"
+    if backend not in ("numba", "sklearn"):
+        raise ValueError(
+            f"Unknown backend '{backend}', expected 'auto', 'numba' or 'sklearn'."
+        )
+    return backend
+
 
 class BaseMetric(ABC):
     """
     Base class for metrics.
+
+    Every `perform_metric` and `perform_metric_batch` implementation is profiled under
+    `metric.<ClassName>` and `metric.<ClassName>.batch` when profiling is enabled.
+
+    Metrics whose memory grows faster than their inputs override `estimate_memory`,
+    and `within_memory` when they have chunked or approximate variants, so that sweeps
+    can be kept within a `MemoryBudget`.
     """
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if "perform_metric" in cls.__dict__:
+            cls.perform_metric = profiler.profiled(f"metric.{cls.__name__}")(
+                cls.perform_metric
+            )
+        if "perform_metric_batch" in cls.__dict__:
+            cls.perform_metric_batch = profiler.profiled(
+                f"metric.{cls.__name__}.batch"
+            )(cls.perform_metric_batch)
+
     @abstractmethod
     def perform_metric(self, **kwargs: Any) -> float:
         """
         Performs the specification of this metric.
         """
         pass
+
+    def estimate_memory(
+        self, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> int:
+        """
+        Estimates an upper bound of the memory allocated by one `perform_metric` call.
+
+        By default, a few label-sized arrays.
+
+        Args:
+            n_documents (int): Number of clustered documents.
+            n_dimensions (int): Dimensions of their embeddings.
+            n_threads (int): Threads available to the metric.
+
+        Returns:
+            int: Peak memory in bytes, on top of the labels and embeddings themselves.
+        """
+        return 4 * n_documents * 8
+
+    def within_memory(
+        self, memory: int, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> "BaseMetric":
+        """
+        Returns a variant of this metric fitting in `memory` bytes, or the closest one.
+
+        Chunked variants, which give the same values, are preferred over approximate
+        ones. By default, metrics have no variants and return themselves.
+        """
+        return self
+
+    def with_options(self, **options: Any) -> "BaseMetric":
+        """
+        Returns a copy of this metric with some of its attributes replaced.
+        """
+        variant = copy.copy(self)
+        for name, value in options.items():
+            setattr(variant, name, value)
+        return variant
+
+    def perform_metric_batch(self, clusters: ndarray, **kwargs: Any) -> ndarray:
+        """
+        Performs this metric on many configurations at once.
+
+        Metrics that only depend on the labels override this with vectorised
+        reductions; by default, `perform_metric` is called on every row.
+
+        Args:
+            clusters (ndarray): Label matrix of shape (configurations, documents).
+            kwargs: Any other argument of `perform_metric`, shared by every row.
+
+        Returns:
+            ndarray: One metric value per configuration.
+        """
+        return np.array(
+            [self.perform_metric(clusters=row, **kwargs) for row in clusters],
+            dtype=float,
+        )
@@ -2,7 +2,7 @@ from typing import Any
 
 from numpy import ndarray
 
-from .base_metric import BaseMetric
+from .base_metric import BaseMetric, batch_cluster_sizes
 
 
 class ClusterCount(BaseMetric):
@@ -21,8 +21,14 @@ class ClusterCount(BaseMetric):
         >>> count = metric.perform_metric(clusters=clusters)
         >>> print(count)
         3
+
+        >>> metric.perform_metric_batch(np.array([[0, 1, 0, 2], [0, 0, -1, -1]]))
+        array([3, 2])
     """
 
     def perform_metric(self, **kwargs: Any) -> float:
         clusters: ndarray = kwargs["clusters"]
         return len(set(clusters))
+
+    def perform_metric_batch(self, clusters: ndarray, **kwargs: Any) -> ndarray:
+        return (batch_cluster_sizes(clusters) > 0).sum(axis=1)
@@ -1,10 +1,10 @@
+from importlib.util import find_spec
 from typing import Any
 
 import numpy as np
 from numpy import ndarray
-from sklearn.metrics import davies_bouldin_score
 
-from .base_metric import BaseMetric
+from .base_metric import BaseMetric, resolve_backend
 
 
 class DaviesBouldinScore(BaseMetric):
@@ -15,7 +15,13 @@ class DaviesBouldinScore(BaseMetric):
     between clusters and the dissimilarity between clusters. A lower Davies-Bouldin score indicates better clustering
     performance.
 
+    With the `numba` backend, a compiled, multi-threaded kernel computes centroids and
+    intra-cluster distances directly on the full embedding array, without copying out
+    the non-outlier points.
+
     Args:
+        backend (str): `"numba"`, `"sklearn"`, or `"auto"` for numba when installed.
+        n_threads (int): Threads used by the numba kernel, all of them if `None`.
         clusters (ndarray): An array containing the cluster assignments for each data point.
         embeddings (ndarray): An array containing the embeddings of the data points.
 
@@ -34,10 +40,18 @@ class DaviesBouldinScore(BaseMetric):
         - [Scikit-learn Davies-Bouldin Score](https://scikit-learn.org/stable/modules/generated/sklearn.metrics.davies_bouldin_score.html)
     """
 
+    def __init__(self, backend: str = "auto", n_threads: int = None) -> None:
+        super().__init__()
+        self.backend = resolve_backend(backend)
+        self.n_threads = n_threads
+
     def perform_metric(self, **kwargs: Any) -> float:
         clusters: ndarray = kwargs["clusters"]
         embeddings: ndarray = kwargs["embeddings"]
 
+        if self.backend == "numba":
+            return self.perform_numba(clusters, embeddings)
+
         indices = np.where(clusters != -1)[0]
 
         if len(indices) == 0:
@@ -46,4 +60,63 @@ class DaviesBouldinScore(BaseMetric):
         X = embeddings[indices]
         labels = clusters[indices]
 
+        from sklearn.metrics import davies_bouldin_score
+
         return davies_bouldin_score(X, labels)
+
+    def estimate_memory(
+        self, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> int:
+        memory = 4 * n_documents * 8
+        if self.backend == "numba":
+            return memory
+        # scikit-learn copies the clustered points, then each cluster in turn.
+        return memory + 2 * n_documents * n_dimensions * 8
+
+    def within_memory(
+        self, memory: int, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> BaseMetric:
+        if self.estimate_memory(n_documents, n_dimensions, n_threads) <= memory:
+            return self
+        if self.backend == "sklearn" and find_spec("numba") is not None:
+            return self.with_options(backend="numba")
+        return self
+
+    def perform_numba(self, clusters: ndarray, embeddings: ndarray) -> float:
+        from . import numba_kernels
+
+        labels, n_clusters = numba_kernels.consecutive_labels(clusters)
+        n_points = int((labels != -1).sum())
+
+        if n_points == 0:
+            return 1
+
+        # Same validity requirement as scikit-learn's implementation.
+        if not 2 <= n_clusters <= n_points - 1:
+            raise ValueError(
+                f"Number of labels is {n_clusters}. Valid values are 2 to n_samples - 1 (inclusive)"
+            )
+
+        with numba_kernels.thread_limit(self.n_threads) as n_threads:
+            centroids, intra_distances = numba_kernels.davies_bouldin_sums(
+                np.ascontiguousarray(embeddings), labels, n_clusters, n_threads
+            )
+
+        # From here on, as in scikit-learn, over the (clusters x clusters) distances.
+        centroid_distances = np.sqrt(
+            np.maximum(
+                (centroids**2).sum(axis=1)[:, None]
+                + (centroids**2).sum(axis=1)[None, :]
+                - 2 * centroids @ centroids.T,
+                0,
+            )
+        )
+        np.fill_diagonal(centroid_distances, 0)
+
+        if np.allclose(intra_distances, 0) or np.allclose(centroid_distances, 0):
+            return 0.0
+
+        centroid_distances[centroid_distances == 0] = np.inf
+        combined_intra_distances = intra_distances[:, None] + intra_distances
+        scores = np.max(combined_intra_distances / centroid_distances, axis=1)
+        return float(np.mean(scores))
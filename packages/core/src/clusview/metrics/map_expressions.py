@@ -0,0 +1,425 @@
+"""Lazy map algebra over metric maps.
+
+Operations on `MetricMap`s eagerly materialise a full intermediate array each, which
+makes composite objectives over large N-D maps memory- and bandwidth-bound. Here,
+operations build an expression instead, and nothing is computed until `evaluate`:
+
+- sums, scalings and normalizations are all affine in the input maps, so any tree of
+  them folds into a single `sum(weight * map) + bias`, evaluated in one pass over the
+  inputs, chunk by chunk, into one output array;
+- normalization only needs the minimum and maximum of its operand, reduced in one
+  chunked pass over the inputs without materialising the operand;
+- repeated Gaussian passes fold into a single filter, `passes` filters of width
+  `sigma` being one of width `sigma * sqrt(passes)`;
+- distances reduce the difference of both maps chunk by chunk, never allocating it.
+
+NaN regions, such as those left outside the convex hull of the sampling by `griddata`,
+are ignored by reductions and by smoothing, which uses normalized convolution instead
+of spreading them.
+
+Examples
+---
+>>> from clusview.metrics import map_expressions as mexp
+>>> objective = mexp.weighted_sum(
+...     [mexp.lazy(silhouette).normalize(), mexp.lazy(outliers).normalize()],
+...     [0.7, -0.3],
+... ).smooth(passes=3, sigma=1.0)
+>>> objective.to_metric_map("objective").mapping
+>>> mexp.distance(mexp.lazy(map_A), mexp.lazy(map_B), kind="average")
+"""
+
+from abc import ABC, abstractmethod
+from math import sqrt
+
+import numpy as np
+
+from .metric_maps import MetricMap, grid_coordinates
+
+DEFAULT_CHUNK_SIZE = 2**18
+
+DISTANCES = ["total", "average", "max", "mse"]
+
+# Reduction of a chunk, and how two partial reductions combine.
+REDUCTIONS = {
+    "min": (np.min, min),
+    "max": (np.max, max),
+    "abs_sum": (lambda values: np.abs(values).sum(), lambda a, b: a + b),
+    "abs_max": (lambda values: np.abs(values).max(), max),
+    "squared_sum": (lambda values: np.square(values).sum(), lambda a, b: a + b),
+}
+
+
+class MapExpression(ABC):
+    """Lazy expression over metric maps.
+
+    Every expression can be reduced to an affine form of materialised arrays, see
+    `affine_form`, which `evaluate` computes in a single chunked pass.
+
+    Methods
+    ---
+    - `normalize()` -> `MapExpression`: Normalize the expression to the range [0, 1].
+    - `smooth(passes: int, sigma: float)` -> `MapExpression`: Smooth the expression with a Gaussian filter.
+    - `evaluate(out: np.ndarray, chunk_size: int)` -> `np.ndarray`: Compute the expression.
+    - `to_metric_map(metric_name: str)` -> `MetricMap`: Compute the expression as a metric map.
+    """
+
+    shape: tuple
+    metric_name: str
+    hyperparameters: list
+    coordinates: list
+    skipped: np.ndarray
+
+    @abstractmethod
+    def affine_form(self) -> tuple[list[tuple[np.ndarray, float]], float]:
+        """Reduce the expression to `sum(weight * array) + bias`.
+
+        Returns
+        ---
+        - `tuple[list[tuple[np.ndarray, float]], float]`: The arrays with their weights, and the bias.
+        """
+
+    def __add__(self, other: "MapExpression | float") -> "MapExpression":
+        return Affine.combine([self, other], [1.0, 1.0])
+
+    def __radd__(self, other: float) -> "MapExpression":
+        return Affine.combine([other, self], [1.0, 1.0])
+
+    def __sub__(self, other: "MapExpression | float") -> "MapExpression":
+        return Affine.combine([self, other], [1.0, -1.0])
+
+    def __rsub__(self, other: float) -> "MapExpression":
+        return Affine.combine([other, self], [1.0, -1.0])
+
+    def __mul__(self, weight: float) -> "MapExpression":
+        return Affine.combine([self], [weight])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, divisor: float) -> "MapExpression":
+        return Affine.combine([self], [1.0 / divisor])
+
+    def __neg__(self) -> "MapExpression":
+        return Affine.combine([self], [-1.0])
+
+    def normalize(self) -> "MapExpression":
+        return Normalized(self)
+
+    def smooth(self, passes: int, sigma: float) -> "MapExpression":
+        return Smoothed(self, passes, sigma)
+
+    def evaluate(
+        self, out: np.ndarray | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> np.ndarray:
+        """Compute the expression, in a single pass over its inputs.
+
+        Parameters
+        ---
+        - out (`np.ndarray`): Array to write the result into, which may be one of the inputs.
+        A new array is allocated if `None`.
+        - chunk_size (`int`): Number of elements computed at once, bounding the temporaries.
+
+        Returns
+        ---
+        - `np.ndarray`: The values of the expression.
+        """
+        terms, bias = self.affine_form()
+
+        if out is None:
+            out = np.empty(self.shape)
+        elif out.shape != self.shape or not out.flags.c_contiguous:
+            raise ValueError(
+                f"Output must be a C-contiguous array of shape {self.shape}."
+            )
+        flat_out = out.reshape(-1)
+        flat_terms = [(array.reshape(-1), weight) for array, weight in terms]
+
+        scratch = np.empty(min(chunk_size, flat_out.size))
+        for start in range(0, flat_out.size, chunk_size):
+            chunk = slice(start, start + chunk_size)
+            # Inputs are read before the output chunk is written, so `out` may be one.
+            accumulator = scratch[: min(chunk_size, flat_out.size - start)]
+            accumulator.fill(bias)
+            for array, weight in flat_terms:
+                accumulator += weight * array[chunk]
+            flat_out[chunk] = accumulator
+
+        return out
+
+    def reduce(
+        self, *reductions: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> tuple[list[float], int]:
+        """Reduce the expression chunk by chunk, in a single pass, ignoring NaN values.
+
+        Parameters
+        ---
+        - reductions (`str`): Any of `"min"`, `"max"`, `"abs_sum"`, `"abs_max"` and `"squared_sum"`.
+        - chunk_size (`int`): Number of elements computed at once.
+
+        Returns
+        ---
+        - `tuple[list[float], int]`: The value of each reduction, NaN if every element
+        is NaN, and the number of non-NaN elements.
+        """
+        for reduction in reductions:
+            if reduction not in REDUCTIONS:
+                raise ValueError(
+                    f"Unknown reduction '{reduction}', expected one of {list(REDUCTIONS)}."
+                )
+
+        terms, bias = self.affine_form()
+        flat_terms = [(array.reshape(-1), weight) for array, weight in terms]
+        size = int(np.prod(self.shape))
+
+        values = [None] * len(reductions)
+        count = 0
+        scratch = np.empty(min(chunk_size, size))
+        for start in range(0, size, chunk_size):
+            chunk = slice(start, start + chunk_size)
+            accumulator = scratch[: min(chunk_size, size - start)]
+            accumulator.fill(bias)
+            for array, weight in flat_terms:
+                accumulator += weight * array[chunk]
+
+            finite = accumulator[~np.isnan(accumulator)]
+            if finite.size == 0:
+                continue
+            count += finite.size
+            for i, reduction in enumerate(reductions):
+                chunk_value, combine = REDUCTIONS[reduction]
+                value = chunk_value(finite)
+                values[i] = value if values[i] is None else combine(values[i], value)
+
+        return [np.nan if value is None else float(value) for value in values], count
+
+    def to_metric_map(self, metric_name: str | None = None) -> MetricMap:
+        """Compute the expression as a new metric map.
+
+        Parameters
+        ---
+        - metric_name (`str`): Name of the resulting metric, derived from the expression if `None`.
+
+        Returns
+        ---
+        - `MetricMap`: The computed metric map.
+        """
+        metric_map = MetricMap()
+        metric_map.mapping = self.evaluate()
+        metric_map.metric_name = metric_name or self.metric_name
+        metric_map.hyperparameters = list(self.hyperparameters)
+        metric_map.coordinates = list(self.coordinates)
+        metric_map.skipped = self.skipped.copy()
+        return metric_map
+
+
+class Leaf(MapExpression):
+    """A materialised metric map."""
+
+    def __init__(self, metric_map: MetricMap):
+        self.array = np.ascontiguousarray(metric_map.mapping, dtype=float)
+        self.shape = self.array.shape
+        self.metric_name = metric_map.metric_name
+        self.hyperparameters = getattr(metric_map, "hyperparameters", [])
+        self.coordinates = grid_coordinates(metric_map)
+        skipped = getattr(metric_map, "skipped", None)
+        # Maps assembled by hand may carry no mask, or one of another shape.
+        if skipped is None or skipped.shape != self.shape:
+            skipped = np.zeros(self.shape, dtype=bool)
+        self.skipped = skipped
+
+    def affine_form(self) -> tuple[list[tuple[np.ndarray, float]], float]:
+        return [(self.array, 1.0)], 0.0
+
+
+class Affine(MapExpression):
+    """A weighted sum of expressions plus a constant."""
+
+    def __init__(
+        self,
+        expressions: list[MapExpression],
+        weights: list[float],
+        bias: float,
+        metric_name: str,
+    ):
+        shapes = {expression.shape for expression in expressions}
+        if len(shapes) > 1:
+            raise ValueError(f"Cannot combine metric maps of shapes {sorted(shapes)}.")
+
+        self.expressions = expressions
+        self.weights = weights
+        self.bias = bias
+        self.shape = expressions[0].shape
+        self.metric_name = metric_name
+        self.hyperparameters = expressions[0].hyperparameters
+        self.coordinates = expressions[0].coordinates
+        self.skipped = np.logical_or.reduce(
+            [expression.skipped for expression in expressions]
+        )
+
+    @classmethod
+    def combine(
+        cls, operands: list["MapExpression | float"], weights: list[float]
+    ) -> "Affine":
+        expressions, expression_weights, bias = [], [], 0.0
+        for operand, weight in zip(operands, weights):
+            if isinstance(operand, MapExpression):
+                expressions.append(operand)
+                expression_weights.append(weight)
+            else:
+                bias += weight * operand
+        return cls(
+            expressions,
+            expression_weights,
+            bias,
+            " + ".join(
+                f"{weight:g} * {expression.metric_name}"
+                for expression, weight in zip(expressions, expression_weights)
+            ),
+        )
+
+    def affine_form(self) -> tuple[list[tuple[np.ndarray, float]], float]:
+        # Terms over the same array are merged, so that each input is read once.
+        weights_by_array: dict[int, list] = {}
+        bias = self.bias
+        for expression, weight in zip(self.expressions, self.weights):
+            terms, expression_bias = expression.affine_form()
+            bias += weight * expression_bias
+            for array, term_weight in terms:
+                entry = weights_by_array.setdefault(id(array), [array, 0.0])
+                entry[1] += weight * term_weight
+        return [(array, weight) for array, weight in weights_by_array.values()], bias
+
+
+class Normalized(MapExpression):
+    """An expression rescaled to the range [0, 1], ignoring NaN values."""
+
+    def __init__(self, expression: MapExpression):
+        self.expression = expression
+        self.shape = expression.shape
+        self.metric_name = f"normalized {expression.metric_name}"
+        self.hyperparameters = expression.hyperparameters
+        self.coordinates = expression.coordinates
+        self.skipped = expression.skipped
+        self.bounds: tuple[float, float] | None = None
+
+    def affine_form(self) -> tuple[list[tuple[np.ndarray, float]], float]:
+        terms, bias = self.expression.affine_form()
+        if self.bounds is None:
+            self.bounds = tuple(self.expression.reduce("min", "max")[0])
+        low, high = self.bounds
+        if not high > low:
+            return terms, bias
+
+        scale = 1.0 / (high - low)
+        shift = (bias - low) * scale
+        return [(array, weight * scale) for array, weight in terms], shift
+
+
+class Smoothed(MapExpression):
+    """An expression filtered with a Gaussian kernel.
+
+    `passes` filters of standard deviation `sigma` are folded into one of standard
+    deviation `sigma * sqrt(passes)`, which is exact away from the borders. NaN values
+    are left out of the filter through normalized convolution, and stay NaN.
+    """
+
+    def __init__(self, expression: MapExpression, passes: int, sigma: float):
+        self.expression = expression
+        self.sigma = sigma * sqrt(passes)
+        self.shape = expression.shape
+        self.metric_name = f"smoothed {expression.metric_name}"
+        self.hyperparameters = expression.hyperparameters
+        self.coordinates = expression.coordinates
+        self.skipped = expression.skipped
+        self.array: np.ndarray | None = None
+
+    def smooth(self, passes: int, sigma: float) -> MapExpression:
+        # Consecutive Gaussian filters compose into one, their variances adding up.
+        return Smoothed(self.expression, 1, sqrt(self.sigma**2 + passes * sigma**2))
+
+    def affine_form(self) -> tuple[list[tuple[np.ndarray, float]], float]:
+        if self.array is None:
+            from scipy.ndimage import gaussian_filter
+
+            values = self.expression.evaluate()
+            missing = np.isnan(values)
+            if self.sigma == 0:
+                self.array = values
+            elif not missing.any():
+                self.array = gaussian_filter(values, sigma=self.sigma, output=values)
+            else:
+                values[missing] = 0.0
+                weights = (~missing).astype(float)
+                gaussian_filter(values, sigma=self.sigma, output=values)
+                gaussian_filter(weights, sigma=self.sigma, output=weights)
+                np.divide(values, weights, out=values, where=weights > 0)
+                values[missing] = np.nan
+                self.array = values
+        return [(self.array, 1.0)], 0.0
+
+
+def lazy(metric_map: MetricMap) -> MapExpression:
+    """Wrap a metric map into a lazy expression.
+
+    Parameters
+    ---
+    - metric_map (`MetricMap`): The metric map.
+
+    Returns
+    ---
+    - `MapExpression`: An expression evaluating to the metric map.
+    """
+    return Leaf(metric_map)
+
+
+def weighted_sum(
+    expressions: list[MapExpression], weights: list[float]
+) -> MapExpression:
+    """Lazy linear combination of expressions.
+
+    Parameters
+    ---
+    - expressions (`list[MapExpression]`): The expressions to combine.
+    - weights (`list[float]`): The weights to apply to each expression.
+
+    Returns
+    ---
+    - `MapExpression`: The linear combination of the expressions.
+    """
+    return Affine.combine(expressions, weights)
+
+
+def distance(
+    expression_A: MapExpression,
+    expression_B: MapExpression,
+    kind: str = "total",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> float:
+    """Distance between two expressions, computed chunk by chunk over their difference.
+
+    NaN elements, in either expression, are left out.
+
+    Parameters
+    ---
+    - expression_A (`MapExpression`): The first expression to compare.
+    - expression_B (`MapExpression`): The second expression to compare.
+    - kind (`str`): `"total"`, `"average"`, `"max"` or `"mse"`, as the `total_distance`,
+    `average_distance`, `max_distance` and `mean_squared_error` functions of metric maps.
+    - chunk_size (`int`): Number of elements computed at once.
+
+    Returns
+    ---
+    - `float`: The distance between the two expressions.
+    """
+    difference = expression_A - expression_B
+
+    if kind == "total":
+        return difference.reduce("abs_sum", chunk_size=chunk_size)[0][0]
+    if kind == "average":
+        [total], count = difference.reduce("abs_sum", chunk_size=chunk_size)
+        return total / count if count else np.nan
+    if kind == "max":
+        return difference.reduce("abs_max", chunk_size=chunk_size)[0][0]
+    if kind == "mse":
+        [total], count = difference.reduce("squared_sum", chunk_size=chunk_size)
+        return total / count if count else np.nan
+    raise ValueError(f"Unknown distance '{kind}', expected one of {DISTANCES}.")
@@ -0,0 +1,221 @@
+"""Cheap projections and level-of-detail views of metric maps, for plotting.
+
+Dense maps are too large to hand every cell to `plot_surface`, and maps over more than
+two hyperparameters have to be brought down to two first. Both are done with plain
+array reductions that run in milliseconds:
+
+- `project` collapses every axis but two with a max, mean or min, keeps the argmax
+along them, or slices them at given indices;
+- `block_reduce` downsamples a map by NaN-aware block means (or max/min), and
+`MapView` keeps a pyramid of such levels to render any window of a map at a bounded
+number of cells, picking a finer level as the window shrinks on zoom.
+
+Examples
+---
+>>> view = MapView(project(metric_map.mapping, axes=(0, 1), how="max"), metric_map.coordinates[:2])
+>>> x, y, z = view.surface(max_cells=10_000)
+>>> x, y, z = view.surface(window=((0, 50), (10, 40)), max_cells=10_000)
+"""
+
+import warnings
+from math import ceil
+
+import numpy as np
+
+REDUCTIONS = {"mean": np.nanmean, "max": np.nanmax, "min": np.nanmin}
+PROJECTIONS = ("max", "mean", "min", "argmax", "slice")
+
+
+def block_reduce(
+    mapping: np.ndarray, factors: tuple[int, ...], how: str = "mean"
+) -> np.ndarray:
+    """Downsample a map by reducing non-overlapping blocks of cells.
+
+    Axes are padded with NaN up to a multiple of their factor, and NaN cells are left
+    out of each block, so that a block is NaN only when all of its cells are.
+
+    Parameters
+    ---
+    - mapping (`np.ndarray`): The map to downsample.
+    - factors (`tuple[int, ...]`): Block size along each axis.
+    - how (`str`): Block reduction, `mean`, `max` or `min`.
+
+    Returns
+    ---
+    - `np.ndarray`: The downsampled map, of shape `ceil(shape / factors)`.
+
+    Examples
+    ---
+    >>> block_reduce(np.arange(16.0).reshape(4, 4), (2, 2))
+    [[ 2.5,  4.5]
+     [10.5, 12.5]]
+    """
+    if all(factor == 1 for factor in factors):
+        return mapping
+
+    padded_shape = [
+        ceil(size / factor) * factor for size, factor in zip(mapping.shape, factors)
+    ]
+    padded = np.full(padded_shape, np.nan)
+    padded[tuple(slice(0, size) for size in mapping.shape)] = mapping
+
+    blocks = padded.reshape(
+        [
+            dimension
+            for size, factor in zip(padded_shape, factors)
+            for dimension in (size // factor, factor)
+        ]
+    )
+    with warnings.catch_warnings():
+        # All-NaN blocks are expected outside the sampled region.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return REDUCTIONS[how](blocks, axis=tuple(range(1, blocks.ndim, 2)))
+
+
+def project(
+    mapping: np.ndarray,
+    axes: tuple[int, int] = (0, 1),
+    how: str = "max",
+    index: dict[int, int] | None = None,
+) -> np.ndarray:
+    """Project an N-D map onto two of its axes.
+
+    Parameters
+    ---
+    - mapping (`np.ndarray`): The map to project.
+    - axes (`tuple[int, int]`): The axes kept, in order.
+    - how (`str`): How the other axes are collapsed: `max`, `mean` or `min` of the
+    metric, `argmax` for the flat index, over the collapsed axes, of the best cell, or
+    `slice` to fix each of them at `index`.
+    - index (`dict[int, int]`): For `slice`, the index of every collapsed axis, `0` for
+    those not given.
+
+    Returns
+    ---
+    - `np.ndarray`: The 2-D projection, of shape `(shape[axes[0]], shape[axes[1]])`.
+
+    Examples
+    ---
+    >>> metric_map.mapping.shape
+    (99, 99, 4)
+    >>> project(metric_map.mapping, axes=(0, 1), how="max").shape
+    (99, 99)
+    >>> project(metric_map.mapping, how="slice", index={2: 3}).shape
+    (99, 99)
+    """
+    if how not in PROJECTIONS:
+        raise ValueError(f"Unknown projection {how}, expected any of {PROJECTIONS}.")
+    if mapping.ndim == 1:
+        return mapping[:, None]
+
+    collapsed = [axis for axis in range(mapping.ndim) if axis not in axes]
+    if how == "slice":
+        selection = [slice(None)] * mapping.ndim
+        for axis in collapsed:
+            selection[axis] = (index or {}).get(axis, 0)
+        projection = mapping[tuple(selection)]
+        return projection if axes[0] < axes[1] else projection.T
+
+    ordered = np.moveaxis(mapping, list(axes), [0, 1])
+    if not collapsed:
+        return ordered
+    flat = ordered.reshape(ordered.shape[0], ordered.shape[1], -1)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if how == "argmax":
+            missing = np.isnan(flat).all(axis=2)
+            best = np.nanargmax(np.where(missing[..., None], 0.0, flat), axis=2)
+            return np.where(missing, np.nan, best)
+        return REDUCTIONS[how](flat, axis=2)
+
+
+class MapView:
+    """Level-of-detail view of a 2-D map.
+
+    Levels are block reductions of the map by increasing powers of two, computed on
+    first use and kept, so that rendering a window only slices the coarsest level that
+    still shows it with enough cells. The cells of a level sit at the mean coordinates
+    of the cells they reduce.
+
+    Parameters
+    ---
+    - mapping (`np.ndarray`): The 2-D map to view.
+    - coordinates (`list[np.ndarray]`): Hyperparameter values along both axes, cell
+    indices if `None`.
+    - how (`str`): Block reduction of the coarser levels, `mean`, `max` or `min`.
+    """
+
+    def __init__(
+        self,
+        mapping: np.ndarray,
+        coordinates: list[np.ndarray] | None = None,
+        how: str = "mean",
+    ):
+        if mapping.ndim != 2:
+            raise ValueError(f"Views are 2-D, project the {mapping.ndim}-D map first.")
+        self.mapping = mapping
+        if coordinates is None:
+            coordinates = [np.arange(size) for size in mapping.shape]
+        self.coordinates = [np.asarray(axis, dtype=float) for axis in coordinates]
+        self.how = how
+        self.levels: dict[int, np.ndarray] = {1: mapping}
+        self.level_coordinates: dict[int, list[np.ndarray]] = {1: self.coordinates}
+
+    def level(self, factor: int) -> np.ndarray:
+        if factor not in self.levels:
+            # Each level is reduced from the previous one, so the pyramid costs about
+            # one pass over the map in total.
+            finer = self.level(factor // 2)
+            self.levels[factor] = block_reduce(finer, (2, 2), self.how)
+            self.level_coordinates[factor] = [
+                block_reduce(axis, (2,), "mean")
+                for axis in self.level_coordinates[factor // 2]
+            ]
+        return self.levels[factor]
+
+    def surface(
+        self,
+        window: tuple[tuple[float, float], tuple[float, float]] | None = None,
+        max_cells: int = 40_000,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Grid of a window of the map, at the finest level within `max_cells`.
+
+        Parameters
+        ---
+        - window (`tuple[tuple[float, float], tuple[float, float]]`): Range of
+        hyperparameter values shown along each axis, the whole map if `None`.
+        - max_cells (`int`): Maximum number of cells returned.
+
+        Returns
+        ---
+        - `tuple[np.ndarray, np.ndarray, np.ndarray]`: Hyperparameter values along both
+        axes, at the mean coordinates of each cell, and the 2-D grid of metric values,
+        of shape `(len(x), len(y))`.
+        """
+        if window is None:
+            window = tuple((axis[0], axis[-1]) for axis in self.coordinates)
+        bounds = []
+        for axis, (low, high) in enumerate(window):
+            # The cells just outside the window are kept, so that it is fully covered.
+            coordinates = self.coordinates[axis]
+            bounds.append(
+                (
+                    max(0, int(np.searchsorted(coordinates, low, "right")) - 1),
+                    min(len(coordinates), int(np.searchsorted(coordinates, high)) + 1),
+                )
+            )
+        cells = max(1, (bounds[0][1] - bounds[0][0]) * (bounds[1][1] - bounds[1][0]))
+
+        factor = 1
+        while cells / factor**2 > max_cells:
+            factor *= 2
+
+        level = self.level(factor)
+        selection = tuple(
+            slice(low // factor, ceil(high / factor)) for low, high in bounds
+        )
+        coordinates = [
+            self.level_coordinates[factor][axis][selection[axis]] for axis in range(2)
+        ]
+        return coordinates[0], coordinates[1], level[selection]
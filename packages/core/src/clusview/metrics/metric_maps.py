@@ -1,15 +1,84 @@
 """The Metric Maps module (mmaps) provides a set of functions to generate, manipulate,
 and compare multi-dimensional matrices representing single-value metric measurements
-across a Cartesian product space of hyperparameters."""
+across a Cartesian product space of hyperparameters.
+
+Plotting, interpolation and dimensionality reduction dependencies (matplotlib, scipy,
+scikit-learn, UMAP) are imported on first use, so that loading metric maps stays cheap.
+
+Composite objectives over large maps are better built with the lazy, fused
+expressions of `map_expressions`, and maps are plotted through the cheap projections
+and level-of-detail views of `map_views`."""
 
-import matplotlib.pyplot as plt
 import numpy as np
 import polars as pl
-import sklearn.metrics
-from matplotlib.animation import FFMpegWriter, FuncAnimation
-from scipy.interpolate import griddata
-from scipy.ndimage import gaussian_filter
-from umap import UMAP
+
+AXIS_SPACINGS = ("sampled", "integer", "linear", "log")
+
+
+def axis_scale(coordinates: np.ndarray) -> str:
+    """Scale an axis is interpolated in.
+
+    Returns
+    ---
+    - `str`: `log` for positive coordinates spaced more evenly in log than linearly,
+    such as those of a `GeometricSampler`, `linear` otherwise.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if len(coordinates) < 3 or coordinates[0] <= 0:
+        return "linear"
+
+    def spread(steps: np.ndarray) -> float:
+        return np.std(steps) / np.mean(steps)
+
+    log_steps, linear_steps = np.diff(np.log(coordinates)), np.diff(coordinates)
+    return "log" if spread(log_steps) < spread(linear_steps) else "linear"
+
+
+def scaled(values: np.ndarray, scale: str) -> np.ndarray:
+    """Values of an axis in its interpolation scale."""
+    values = np.asarray(values, dtype=float)
+    return np.log(values) if scale == "log" else values
+
+
+def axis_coordinates(
+    values: np.ndarray, spacing: "str | np.ndarray", resolution: int
+) -> np.ndarray:
+    """Coordinates of the grid along one hyperparameter.
+
+    Parameters
+    ---
+    - values (`np.ndarray`): Sampled values of the hyperparameter.
+    - spacing (`str | np.ndarray`): `sampled` for its distinct sampled values,
+    `integer` for every integer between its bounds, `linear` or `log` for `resolution`
+    evenly or geometrically spaced values between them, or the coordinates themselves.
+    - resolution (`int`): Number of `linear` or `log` coordinates.
+
+    Returns
+    ---
+    - `np.ndarray`: The sorted coordinates.
+    """
+    low, high = values.min(), values.max()
+    if not isinstance(spacing, str):
+        return np.unique(np.asarray(spacing))
+    if spacing == "sampled":
+        return np.unique(values)
+    if spacing == "integer":
+        return np.arange(low, high + 1)
+    if spacing == "linear":
+        return np.linspace(low, high, resolution)
+    if spacing == "log":
+        if low <= 0:
+            raise ValueError(f"Log-spaced axes need positive values, not {low}.")
+        return np.geomspace(low, high, resolution)
+    raise ValueError(f"Unknown spacing {spacing}, expected any of {AXIS_SPACINGS}.")
+
+
+def grid_coordinates(metric_map: "MetricMap") -> list[np.ndarray]:
+    """Coordinates of every axis of a metric map, cell indices for maps without any."""
+    coordinates = getattr(metric_map, "coordinates", [])
+    if len(coordinates) == metric_map.mapping.ndim:
+        return coordinates
+    return [np.arange(size) for size in metric_map.mapping.shape]
 
 
 class MetricMap:
@@ -33,13 +102,31 @@ class MetricMap:
     │ ...     ┆ ...     ┆ ... ┆ ...      │
     └─────────┴─────────┴─────┴──────────┘
 
-    Each row represents a single sample for a given set of hyperparameters.
+    Each row represents a single sample for a given set of hyperparameters. Samples
+    without a metric value stand for configurations skipped by the constraints of the
+    sweep: they are not interpolated across, and every cell closer to a skipped sample
+    than to a measured one is left NaN and marked in `skipped`.
 
     Missing values are linearly interpolated to form a complete grid that spans the entire
     hyperparameter space, defined by the minimum and maximum values of each hyperparameter.
     This allows for sampling across the space, not having to compute the metric for every
     possible combination.
 
+    The grid has explicit coordinates along each hyperparameter, by default its sampled
+    values, so that the size of the map follows the number of samples rather than the
+    span of the hyperparameters: 30 geometric samples of `min_cluster_size` between 2
+    and 5000 make 30 rows, not 4999. Axes whose coordinates are geometrically spaced
+    are interpolated in log scale, see `scales`.
+
+    Parameters
+    ---
+    - coordinates (`str | dict[str, str | np.ndarray]`): Spacing of the grid along every
+    hyperparameter, or along each of them by name, `sampled` for those not given:
+    `sampled` for the distinct sampled values, `integer` for every integer between the
+    bounds, `linear` or `log` for `resolution` evenly or geometrically spaced values
+    between them, or the coordinates themselves.
+    - resolution (`int`): Number of coordinates of `linear` and `log` axes.
+
     If `sampling` is `None`, an empty one-dimensional metric map is created.
     >>> metric_map = MetricMap()
     >>> metric_map.mapping
@@ -84,46 +171,188 @@ class MetricMap:
     >>> metric_map.hyperparameters
     ['param_1', 'param_2']
 
+    >>> metric_map = MetricMap(geometric_sampling, coordinates={"min_samples": "log"})
+    >>> metric_map.coordinates[1]
+    [2., 3.2, 5.1, ..., 5000.]
+    >>> metric_map.at({"min_cluster_size": 40, "min_samples": 10})
+    0.41
+
     Fields
     ---
     - mapping (`np.ndarray`): The multi-dimensional matrix representing the metric values.
     - metric_name (`str`): The name of the metric column in the sampling.
     - hyperparameters (`list[str]`): The names of the hyperparameter columns in the sampling.
+    - coordinates (`list[np.ndarray]`): The hyperparameter values along each axis of the
+    grid, so that cell `index` stands for the configuration
+    `[coordinates[axis][index[axis]] for axis in ...]`.
+    - origin (`list`): The hyperparameter values of the first cell of the grid.
+    - scales (`list[str]`): The scale, `linear` or `log`, each axis is interpolated in.
+    - skipped (`np.ndarray`): Boolean mask of the cells skipped by the constraints of the sweep.
 
     Methods
     ---
+    - `index_of(parameters: dict[str, float] | list[float])` -> `tuple[int, ...]`:
+    Find the cell closest to a configuration.
+    - `at(parameters: dict[str, float] | list[float], method: str)` -> `float`:
+    Look up the metric value of a configuration.
     - `normalize()` -> `tuple[float, float]`: Normalize the metric map to the range [0, 1].
     - `smooth(passes: int, sigma: float)` -> `None`: Smooth the metric map using a Gaussian filter.
     - `reduce_dimensions(target_dimension: int, **kwargs)` -> `np.ndarray`:
     Reduce the dimensionality of the metric map using UMAP.
-    - `plot()` -> `None`: Plot the metric map as a 3D surface.
+    - `project(axes: tuple[int, int], how: str, index: dict[int, int])` -> `np.ndarray`:
+    Project the metric map onto two of its hyperparameters.
+    - `plot(axes: tuple[int, int], how: str, index: dict[int, int], max_cells: int)` -> `None`:
+    Plot the metric map as a 3D surface, refined on zoom.
     """
 
-    def __init__(self, sampling: pl.DataFrame | None = None):
+    def __init__(
+        self,
+        sampling: pl.DataFrame | None = None,
+        coordinates: str | dict = "sampled",
+        resolution: int = 64,
+    ):
+        self.coordinates: list[np.ndarray] = []
         if sampling is None:
             self.mapping = np.array([])
+            self.skipped = np.array([], dtype=bool)
             self.metric_name = "Empty"
             return
 
         number_of_cols = sampling.width
 
-        sampled_ranges = []
         self.hyperparameters = []
         for col in sampling.columns:
             if col == sampling.columns[number_of_cols - 1]:
                 self.metric_name = col
                 continue
             self.hyperparameters.append(col)
-            sampled_ranges.append(
-                slice(sampling[col].min(), sampling[col].max() + 1, 1)
+            spacing = (
+                coordinates.get(col, "sampled")
+                if isinstance(coordinates, dict)
+                else coordinates
+            )
+            self.coordinates.append(
+                axis_coordinates(sampling[col].to_numpy(), spacing, resolution)
             )
 
+        from scipy.interpolate import griddata
+
         points = sampling.select(pl.exclude(sampling.columns[-1])).to_numpy()
         metric_values = sampling.select(pl.nth(number_of_cols - 1)).to_numpy().flatten()
 
-        self.mapping = griddata(
-            points, metric_values, tuple(np.mgrid[sampled_ranges]), method="linear"
+        # Samples and grid are interpolated in the scale of each axis.
+        scales = [axis_scale(axis) for axis in self.coordinates]
+        points = np.stack(
+            [scaled(points[:, axis], scale) for axis, scale in enumerate(scales)],
+            axis=1,
+        )
+        grid = tuple(
+            np.meshgrid(
+                *[scaled(axis, scale) for axis, scale in zip(self.coordinates, scales)],
+                indexing="ij",
+            )
+        )
+        measured = ~np.isnan(metric_values)
+
+        if measured.any():
+            self.mapping = griddata(
+                points[measured], metric_values[measured], grid, method="linear"
+            )
+        else:
+            self.mapping = np.full(grid[0].shape, np.nan)
+
+        self.skipped = np.zeros(self.mapping.shape, dtype=bool)
+        if not measured.all():
+            self.skipped = (
+                griddata(points, (~measured).astype(float), grid, method="nearest")
+                > 0.5
+            )
+            self.mapping[self.skipped] = np.nan
+
+    @property
+    def origin(self) -> list:
+        return [axis[0] for axis in grid_coordinates(self)]
+
+    @property
+    def scales(self) -> list[str]:
+        return [axis_scale(axis) for axis in grid_coordinates(self)]
+
+    def parameter_values(self, parameters: dict[str, float] | list[float]) -> list:
+        if isinstance(parameters, dict):
+            return [parameters[name] for name in self.hyperparameters]
+        return list(parameters)
+
+    def index_of(self, parameters: dict[str, float] | list[float]) -> tuple[int, ...]:
+        """Find the cell closest to a configuration.
+
+        Distances along each axis are measured in its interpolation scale.
+
+        Parameters
+        ---
+        - parameters (`dict[str, float] | list[float]`): Value of every hyperparameter,
+        by name or in order.
+
+        Returns
+        ---
+        - `tuple[int, ...]`: Index of the closest cell.
+
+        Examples
+        ---
+        >>> metric_map.coordinates
+        [array([ 2,  4,  8, 16, 32]), array([1, 2, 3])]
+        >>> metric_map.index_of({"min_cluster_size": 10, "min_samples": 2})
+        (2, 1)
+        """
+        index = []
+        for value, axis, scale in zip(
+            self.parameter_values(parameters), grid_coordinates(self), self.scales
+        ):
+            positions, target = scaled(axis, scale), scaled(value, scale)
+            if len(positions) == 1:
+                index.append(0)
+                continue
+            right = np.searchsorted(positions, target)
+            right = int(np.clip(right, 1, len(positions) - 1))
+            if target - positions[right - 1] <= positions[right] - target:
+                index.append(right - 1)
+            else:
+                index.append(right)
+        return tuple(index)
+
+    def at(
+        self, parameters: dict[str, float] | list[float], method: str = "nearest"
+    ) -> float:
+        """Look up the metric value of a configuration.
+
+        Parameters
+        ---
+        - parameters (`dict[str, float] | list[float]`): Value of every hyperparameter,
+        by name or in order.
+        - method (`str`): `nearest` for the value of the closest cell, `linear` to
+        interpolate between the surrounding cells, in the scale of each axis.
+
+        Returns
+        ---
+        - `float`: The metric value, NaN outside the sampled region.
+        """
+        if method == "nearest":
+            return float(self.mapping[self.index_of(parameters)])
+
+        from scipy.interpolate import RegularGridInterpolator
+
+        scales = self.scales
+        coordinates = grid_coordinates(self)
+        interpolator = RegularGridInterpolator(
+            [scaled(axis, scale) for axis, scale in zip(coordinates, scales)],
+            self.mapping,
+            method=method,
+            bounds_error=False,
         )
+        point = [
+            scaled(value, scale)
+            for value, scale in zip(self.parameter_values(parameters), scales)
+        ]
+        return float(interpolator([point])[0])
 
     def normalize(self) -> tuple[float, float]:
         """Normalize the metric map to the range [0, 1].
@@ -153,9 +382,7 @@ class MetricMap:
         if map_max == map_min:
             return map_max, map_min
 
-        self.mapping = (self.mapping - np.min(self.mapping)) / (
-            np.max(self.mapping) - np.min(self.mapping)
-        )
+        self.mapping = (self.mapping - map_min) / (map_max - map_min)
 
         return map_min, map_max
 
@@ -188,6 +415,8 @@ class MetricMap:
         [[1.0, 2.0, 3.0]
          [4.0, 5.0, 6.0]]
         """
+        from scipy.ndimage import gaussian_filter
+
         old_mapping = self.mapping.copy()
 
         for _ in range(passes):
@@ -199,7 +428,8 @@ class MetricMap:
         """Reduce the dimensionality of the metric map using UMAP.
 
         By default, UMAP is randomly initialized, but a seed can be provided to
-        ensure reproducibility.
+        ensure reproducibility. To view a map over more than two hyperparameters,
+        `project` is far cheaper.
 
         Parameters
         ---
@@ -233,14 +463,92 @@ class MetricMap:
         if self.mapping.ndim >= target_dimension:
             return old_mapping
 
+        from umap import UMAP
+
         umap = UMAP(n_components=target_dimension, **kwargs)
         self.mapping = umap.fit_transform(self.mapping)
         return old_mapping
 
-    def plot(self) -> None:
+    def project(
+        self,
+        axes: tuple[int, int] = (0, 1),
+        how: str = "max",
+        index: dict[int, int] | None = None,
+    ) -> np.ndarray:
+        """Project the metric map onto two of its hyperparameters.
+
+        See `map_views.project`.
+
+        Parameters
+        ---
+        - axes (`tuple[int, int]`): The hyperparameter axes kept, in order.
+        - how (`str`): How the other axes are collapsed: `max`, `mean`, `min`,
+        `argmax` or `slice`.
+        - index (`dict[int, int]`): For `slice`, the index of every collapsed axis.
+
+        Returns
+        ---
+        - `np.ndarray`: The 2-D projection.
+
+        Examples
+        ---
+        >>> metric_map.mapping.shape
+        (99, 99, 4)
+        >>> metric_map.project((0, 1), how="max").shape
+        (99, 99)
+        """
+        from .map_views import project
+
+        return project(self.mapping, axes, how, index)
+
+    def view(
+        self,
+        axes: tuple[int, int] = (0, 1),
+        how: str = "max",
+        index: dict[int, int] | None = None,
+    ) -> tuple["MapView", list[str], str]:
+        """Level-of-detail view of the projection of the metric map onto `axes`.
+
+        Returns
+        ---
+        - `tuple[MapView, list[str], str]`: The view, the names of its axes and of the
+        values it shows.
+        """
+        from .map_views import MapView
+
+        ndim = self.mapping.ndim
+        hyperparameters = getattr(
+            self, "hyperparameters", [f"axis_{axis}" for axis in range(ndim)]
+        )
+        coordinates = grid_coordinates(self)
+        view = MapView(
+            self.project(axes, how, index),
+            [coordinates[axis] if axis < ndim else np.zeros(1) for axis in axes],
+        )
+        labels = [hyperparameters[axis] if axis < ndim else "" for axis in axes]
+        z_label = self.metric_name if ndim <= 2 else f"{how} {self.metric_name}"
+        return view, labels, z_label
+
+    def plot(
+        self,
+        axes: tuple[int, int] = (0, 1),
+        how: str = "max",
+        index: dict[int, int] | None = None,
+        max_cells: int = 40_000,
+    ) -> None:
         """Plot the metric map as a 3D surface.
 
-        Dimensions are reduced to 2 if the metric map is higher-dimensional.
+        Maps over more than two hyperparameters are projected onto `axes` first, see
+        `project`. Large maps are drawn at a level of detail of at most `max_cells`
+        cells, which is refined to the visible window when zooming in.
+
+        Parameters
+        ---
+        - axes (`tuple[int, int]`): The hyperparameter axes plotted.
+        - how (`str`): How the other axes are collapsed: `max`, `mean`, `min`,
+        `argmax` or `slice`.
+        - index (`dict[int, int]`): For `slice`, the index of every collapsed axis.
+        - max_cells (`int`): Maximum number of cells drawn.
 
         Examples
         ---
@@ -249,32 +557,52 @@ class MetricMap:
          [4.0, 5.0, 6.0]]
         >>> metric_map.plot()
         """
+        import matplotlib.pyplot as plt
 
-        mapping_to_plot = self.mapping.copy().transpose()
-        self.reduce_dimensions(2)
+        view, labels, z_label = self.view(axes, how, index)
 
         fig = plt.figure()
         ax = fig.add_subplot(111, projection="3d")
-
-        x, y = np.meshgrid(
-            np.arange(mapping_to_plot.shape[0]), np.arange(mapping_to_plot.shape[1])
-        )
-        ax.plot_surface(x, y, mapping_to_plot, cmap="magma")
-
-        ax.set_xlabel(self.hyperparameters[0])
-        ax.set_ylabel(self.hyperparameters[1])
-        ax.set_zlabel(self.metric_name)
+        surface = None
+        drawing = False
+
+        def draw(window=None):
+            nonlocal surface, drawing
+            drawing = True
+            x, y, z = view.surface(window, max_cells)
+            if surface is not None:
+                surface.remove()
+            x, y = np.meshgrid(x, y, indexing="ij")
+            surface = ax.plot_surface(x, y, z, cmap="magma")
+            drawing = False
+
+        def refine(_):
+            if not drawing:
+                draw((ax.get_xlim(), ax.get_ylim()))
+                fig.canvas.draw_idle()
+
+        draw()
+        ax.set_autoscale_on(False)
+        ax.callbacks.connect("xlim_changed", refine)
+        ax.callbacks.connect("ylim_changed", refine)
+
+        ax.set_xlabel(labels[0])
+        ax.set_ylabel(labels[1])
+        ax.set_zlabel(z_label)
 
         fig.canvas.manager.full_screen_toggle()
         plt.show()
 
-    def render_turn_around(self, speed: int = 1) -> None:
+    def render_turn_around(self, speed: int = 1, max_cells: int = 40_000) -> None:
         """
         Render a 3D plot of the metric map that rotates around the vertical axis.
 
+        Maps over more than two hyperparameters are max-projected onto their first two.
+
         Parameters
         ---
         - speed (`int`): The speed at which the plot rotates around the vertical axis.
+        - max_cells (`int`): Maximum number of cells drawn.
 
         Examples
         ---
@@ -283,17 +611,18 @@ class MetricMap:
          [4.0, 5.0, 6.0]]
         >>> metric_map.render_turn_around(speed=1)
         """
-        mapping_to_plot = self.mapping.copy().transpose()
-        self.reduce_dimensions(2)
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FFMpegWriter, FuncAnimation
+
+        view, _, _ = self.view()
+        x, y, z = view.surface(max_cells=max_cells)
 
         fig = plt.figure(figsize=(19.20, 10.80), dpi=100)
         fig.patch.set_facecolor("#1A1C27")
         ax = fig.add_subplot(111, projection="3d", facecolor="#1A1C27")
 
-        x, y = np.meshgrid(
-            np.arange(mapping_to_plot.shape[0]), np.arange(mapping_to_plot.shape[1])
-        )
-        ax.plot_surface(x, y, mapping_to_plot, cmap="magma")
+        x, y = np.meshgrid(x, y, indexing="ij")
+        ax.plot_surface(x, y, z, cmap="magma")
         ax.set_axis_off()
 
         def update(frame):
@@ -424,6 +753,8 @@ def mean_squared_error(metric_map_A: MetricMap, metric_map_B: MetricMap) -> floa
     1.0
     """
 
+    import sklearn.metrics
+
     return sklearn.metrics.mean_squared_error(
         metric_map_A.mapping, metric_map_B.mapping
     )
@@ -455,13 +786,9 @@ def linear_combination(metric_maps: list[MetricMap], weights: list[float]) -> Me
      [14.0, 17.0, 20.0]]
     """
 
-    linear_combination = MetricMap()
-    linear_combination.mapping = np.zeros_like(metric_maps[0].mapping)
-    for metric_map, weight in zip(metric_maps, weights):
-        linear_combination.mapping += weight * metric_map.mapping
-
-    linear_combination.metric_name = f"Linear Combination of {
-        ', '.join([metric_map.metric_name for metric_map in metric_maps])
-    }"
+    from .map_expressions import lazy, weighted_sum
 
-    return linear_combination
+    names = ", ".join([metric_map.metric_name for metric_map in metric_maps])
+    return weighted_sum(
+        [lazy(metric_map) for metric_map in metric_maps], weights
+    ).to_metric_map(f"Linear Combination of {names}")
@@ -0,0 +1,160 @@
+"""Numba-compiled kernels for the distance-based clustering metrics.
+
+Kernels work directly on the full embedding array, skipping outliers through their
+label instead of copying the clustered points out, and compute distances in blocks
+that fit in cache. Labels must be consecutive integers starting at 0, with -1 marking
+the points to skip, see `consecutive_labels`.
+
+This module imports numba at load time, so metrics only import it once a compiled
+backend has been selected.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+import numba
+import numpy as np
+from numba import njit, prange
+
+
+@contextmanager
+def thread_limit(n_threads: int | None) -> Iterator[int]:
+    """
+    Limits the threads used by the kernels inside the context, all of them if `None`.
+
+    Yields:
+        int: The number of threads in use.
+    """
+    previous = numba.get_num_threads()
+    if n_threads is not None:
+        numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        yield numba.get_num_threads()
+    finally:
+        numba.set_num_threads(previous)
+
+
+def consecutive_labels(clusters: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Maps cluster labels to consecutive integers starting at 0, keeping -1 for outliers.
+
+    Returns:
+        tuple[np.ndarray, int]: The relabelled clusters and the number of clusters.
+    """
+    mask = clusters != -1
+    unique_labels, inverse = np.unique(clusters[mask], return_inverse=True)
+
+    labels = np.full(clusters.shape, -1, dtype=np.int64)
+    labels[mask] = inverse
+    return labels, len(unique_labels)
+
+
+@njit(parallel=True, cache=True)
+def silhouette_samples(
+    embeddings: np.ndarray, labels: np.ndarray, n_clusters: int, block_size: int
+) -> np.ndarray:
+    """
+    Silhouette coefficient of every non-outlier point, `0` for outliers.
+
+    Points are processed in tiles of `block_size` x `block_size`, accumulating the
+    distance sums from each point to every cluster, so that memory stays
+    O(points x clusters) instead of O(points^2).
+    """
+    n_points, n_dimensions = embeddings.shape
+
+    cluster_sizes = np.zeros(n_clusters, dtype=np.int64)
+    for i in range(n_points):
+        if labels[i] >= 0:
+            cluster_sizes[labels[i]] += 1
+
+    scores = np.zeros(n_points, dtype=np.float64)
+    n_blocks = (n_points + block_size - 1) // block_size
+
+    for block in prange(n_blocks):
+        start_i = block * block_size
+        stop_i = min(start_i + block_size, n_points)
+        distance_sums = np.zeros((stop_i - start_i, n_clusters), dtype=np.float64)
+
+        for start_j in range(0, n_points, block_size):
+            stop_j = min(start_j + block_size, n_points)
+            for i in range(start_i, stop_i):
+                if labels[i] < 0:
+                    continue
+                for j in range(start_j, stop_j):
+                    if labels[j] < 0 or i == j:
+                        continue
+                    squared_distance = 0.0
+                    for k in range(n_dimensions):
+                        difference = embeddings[i, k] - embeddings[j, k]
+                        squared_distance += difference * difference
+                    distance_sums[i - start_i, labels[j]] += np.sqrt(squared_distance)
+
+        for i in range(start_i, stop_i):
+            label = labels[i]
+            if label < 0 or cluster_sizes[label] <= 1:
+                continue
+
+            intra = distance_sums[i - start_i, label] / (cluster_sizes[label] - 1)
+            inter = np.inf
+            for cluster in range(n_clusters):
+                if cluster != label and cluster_sizes[cluster] > 0:
+                    mean_distance = (
+                        distance_sums[i - start_i, cluster] / cluster_sizes[cluster]
+                    )
+                    if mean_distance < inter:
+                        inter = mean_distance
+
+            denominator = max(intra, inter)
+            if denominator > 0:
+                scores[i] = (inter - intra) / denominator
+
+    return scores
+
+
+@njit(parallel=True, cache=True)
+def davies_bouldin_sums(
+    embeddings: np.ndarray, labels: np.ndarray, n_clusters: int, n_chunks: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Centroids and mean intra-cluster distances of every cluster.
+
+    Points are split in `n_chunks` contiguous chunks that accumulate into their own
+    partial sums in parallel, which are reduced at the end.
+    """
+    n_points, n_dimensions = embeddings.shape
+    chunk_size = (n_points + n_chunks - 1) // n_chunks
+
+    partial_sums = np.zeros((n_chunks, n_clusters, n_dimensions), dtype=np.float64)
+    partial_sizes = np.zeros((n_chunks, n_clusters), dtype=np.int64)
+    for chunk in prange(n_chunks):
+        for i in range(chunk * chunk_size, min((chunk + 1) * chunk_size, n_points)):
+            label = labels[i]
+            if label < 0:
+                continue
+            partial_sizes[chunk, label] += 1
+            for k in range(n_dimensions):
+                partial_sums[chunk, label, k] += embeddings[i, k]
+
+    centroids = partial_sums.sum(axis=0)
+    cluster_sizes = partial_sizes.sum(axis=0)
+    for cluster in range(n_clusters):
+        for k in range(n_dimensions):
+            centroids[cluster, k] /= max(cluster_sizes[cluster], 1)
+
+    partial_distances = np.zeros((n_chunks, n_clusters), dtype=np.float64)
+    for chunk in prange(n_chunks):
+        for i in range(chunk * chunk_size, min((chunk + 1) * chunk_size, n_points)):
+            label = labels[i]
+            if label < 0:
+                continue
+            squared_distance = 0.0
+            for k in range(n_dimensions):
+                difference = embeddings[i, k] - centroids[label, k]
+                squared_distance += difference * difference
+            partial_distances[chunk, label] += np.sqrt(squared_distance)
+
+    intra_distances = partial_distances.sum(axis=0)
+    for cluster in range(n_clusters):
+        intra_distances[cluster] /= max(cluster_sizes[cluster], 1)
+
+    return centroids, intra_distances
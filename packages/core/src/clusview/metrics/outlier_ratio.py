@@ -20,6 +20,9 @@ class OutlierRatio(BaseMetric):
         >>> metric = OutlierRatio()
         >>> metric.perform_metric(clusters=clusters)
         0.375
+
+        >>> metric.perform_metric_batch(np.array([[0, -1, 0, -1], [0, 0, 0, -1]]))
+        array([0.5 , 0.25])
     """
 
     def perform_metric(self, **kwargs: Any) -> float:
@@ -28,3 +31,6 @@ class OutlierRatio(BaseMetric):
         total_count = clusters.size
         outlier_ratio = outlier_count / total_count
         return outlier_ratio
+
+    def perform_metric_batch(self, clusters: ndarray, **kwargs: Any) -> ndarray:
+        return (clusters == -1).mean(axis=1)
@@ -0,0 +1,213 @@
+"""Multi-objective selection of configurations over metric maps.
+
+A configuration is Pareto-optimal, or non-dominated, when no other configuration is at
+least as good on every metric and strictly better on one. The Pareto front is the set
+of trade-offs worth choosing from, instead of eyeballing surfaces one metric at a time
+or hand-weighting a `linear_combination`.
+
+Fronts are extracted with a sort-filter skyline: points are sorted by the sum of their
+objectives, which no point can have lower than a point dominating it, so each point only
+needs checking against the front found so far, in vectorised blocks. Two objectives
+have a dedicated O(n log n) sweep. Duplicate points are collapsed first, and `ParetoFront`
+maintains a front incrementally while a sweep is still streaming results in.
+
+Examples
+---
+>>> front = pareto_front([silhouette, davies_bouldin], maximize=[True, False])
+>>> front
+┌──────────────────┬─────────────┬─────────────────┬────────────────────┐
+│ min_cluster_size ┆ min_samples ┆ SilhouetteScore ┆ DaviesBouldinScore │
+│ ---------------- ┆ ----------- ┆ --------------- ┆ ------------------ │
+│ i64              ┆ i64         ┆ f64             ┆ f64                │
+╞══════════════════╪═════════════╪═════════════════╪════════════════════╡
+│ 12               ┆ 3           ┆ 0.41            ┆ 0.82               │
+│ 40               ┆ 9           ┆ 0.47            ┆ 0.95               │
+│ ...              ┆ ...         ┆ ...             ┆ ...                │
+└──────────────────┴─────────────┴─────────────────┴────────────────────┘
+"""
+
+import numpy as np
+import polars as pl
+
+from .metric_maps import MetricMap, grid_coordinates
+
+BLOCK_SIZE = 1024
+
+
+def dominated_by(candidates: np.ndarray, front: np.ndarray) -> np.ndarray:
+    """Which candidates are dominated by some point of the front, minimizing every
+    objective.
+
+    Parameters
+    ---
+    - candidates (`np.ndarray`): Points of shape (candidates, objectives).
+    - front (`np.ndarray`): Points of shape (points, objectives).
+
+    Returns
+    ---
+    - `np.ndarray`: Boolean mask over the candidates.
+    """
+    dominated = np.zeros(len(candidates), dtype=bool)
+    for start in range(0, len(front), BLOCK_SIZE):
+        block = front[start : start + BLOCK_SIZE]
+        no_worse = (block[None, :, :] <= candidates[:, None, :]).all(axis=2)
+        better = (block[None, :, :] < candidates[:, None, :]).any(axis=2)
+        dominated |= (no_worse & better).any(axis=1)
+    return dominated
+
+
+def skyline(points: np.ndarray) -> np.ndarray:
+    """Indices of the non-dominated points, minimizing every objective.
+
+    Parameters
+    ---
+    - points (`np.ndarray`): Points of shape (points, objectives), without NaN values.
+
+    Returns
+    ---
+    - `np.ndarray`: Sorted indices of the points on the Pareto front. Equal points are
+    either all on the front or all off it.
+    """
+    if len(points) == 0:
+        return np.array([], dtype=np.int64)
+
+    unique_points, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    if unique_points.shape[1] == 1:
+        on_front = unique_points[:, 0] == unique_points[0, 0]
+    elif unique_points.shape[1] == 2:
+        # Unique rows come sorted by the first objective, then the second: a point is
+        # dominated exactly when an earlier one is no worse on the second objective.
+        previous_best = np.minimum.accumulate(unique_points[:, 1])
+        on_front = np.ones(len(unique_points), dtype=bool)
+        on_front[1:] = unique_points[1:, 1] < previous_best[:-1]
+    else:
+        order = np.argsort(unique_points.sum(axis=1), kind="stable")
+        front_indices = []
+        front = unique_points[:0]
+        for start in range(0, len(order), BLOCK_SIZE):
+            block_indices = order[start : start + BLOCK_SIZE]
+            block = unique_points[block_indices]
+
+            survivors = ~dominated_by(block, front)
+            block_indices, block = block_indices[survivors], block[survivors]
+            survivors = ~dominated_by(block, block)
+            block_indices, block = block_indices[survivors], block[survivors]
+
+            front_indices.append(block_indices)
+            front = np.concatenate([front, block])
+
+        on_front = np.zeros(len(unique_points), dtype=bool)
+        on_front[np.concatenate(front_indices)] = True
+
+    return np.flatnonzero(on_front[inverse])
+
+
+def objectives(values: np.ndarray, maximize: list[bool]) -> np.ndarray:
+    """Turns metric values into objectives to minimize."""
+    signs = np.where(np.asarray(maximize), -1.0, 1.0)
+    return np.asarray(values, dtype=float) * signs
+
+
+def pareto_front(metric_maps: list[MetricMap], maximize: list[bool]) -> pl.DataFrame:
+    """Non-dominated configurations of several metric maps over the same grid.
+
+    Grid cells where any metric is NaN, such as those outside the sampled region, are
+    left out.
+
+    Parameters
+    ---
+    - metric_maps (`list[MetricMap]`): The metric maps, all of the same shape.
+    - maximize (`list[bool]`): For each metric, whether higher values are better, e.g.
+    `True` for the Silhouette score and `False` for the Davies-Bouldin score.
+
+    Returns
+    ---
+    - `pl.DataFrame`: One row per Pareto-optimal configuration, with its hyperparameters
+    followed by its metric values.
+    """
+    shapes = {metric_map.mapping.shape for metric_map in metric_maps}
+    if len(shapes) > 1:
+        raise ValueError(f"Cannot compare metric maps of shapes {sorted(shapes)}.")
+
+    values = np.stack([metric_map.mapping.reshape(-1) for metric_map in metric_maps], 1)
+    cells = np.flatnonzero(~np.isnan(values).any(axis=1))
+    cells = cells[skyline(objectives(values[cells], maximize))]
+
+    reference = metric_maps[0]
+    indices = np.unravel_index(cells, reference.mapping.shape)
+    coordinates = grid_coordinates(reference)
+    hyperparameters = getattr(
+        reference,
+        "hyperparameters",
+        [f"axis_{axis}" for axis in range(reference.mapping.ndim)],
+    )
+
+    columns = {
+        name: coordinates[axis][indices[axis]]
+        for axis, name in enumerate(hyperparameters)
+    }
+    for metric_map, metric_values in zip(metric_maps, values[cells].T):
+        columns[metric_map.metric_name] = metric_values
+    return pl.DataFrame(columns)
+
+
+class ParetoFront:
+    """Pareto front maintained incrementally, as configurations stream in.
+
+    Each batch is only compared with the current front: new points dominated by it are
+    discarded, and front points dominated by new ones are evicted.
+
+    Parameters
+    ---
+    - maximize (`list[bool]`): For each metric, whether higher values are better.
+
+    Examples
+    ---
+    >>> front = ParetoFront(maximize=[True, False])
+    >>> for future in as_completed(futures):
+    ...     configurations, values = future.result()
+    ...     front.add(configurations, values)
+    ...     print(len(front), "configurations on the front so far")
+    >>> front.configurations
+    [[12, 3], [40, 9], ...]
+    """
+
+    def __init__(self, maximize: list[bool]):
+        self.maximize = list(maximize)
+        self.configurations: list[list] = []
+        self.values = np.empty((0, len(self.maximize)))
+
+    def __len__(self) -> int:
+        return len(self.configurations)
+
+    def add(self, configurations: list[list], values: np.ndarray) -> None:
+        """Adds a batch of configurations to the front.
+
+        Parameters
+        ---
+        - configurations (`list[list]`): Hyperparameters of each configuration.
+        - values (`np.ndarray`): Metric values of shape (configurations, metrics).
+        Configurations with NaN values are ignored.
+        """
+        values = np.asarray(values, dtype=float).reshape(-1, len(self.maximize))
+        valid = ~np.isnan(values).any(axis=1)
+        configurations = [c for c, keep in zip(configurations, valid) if keep]
+        values = values[valid]
+        if len(values) == 0:
+            return
+
+        new_points = objectives(values, self.maximize)
+        new_points_front = skyline(new_points)
+        configurations = [configurations[i] for i in new_points_front]
+        values, new_points = values[new_points_front], new_points[new_points_front]
+
+        front_points = objectives(self.values, self.maximize)
+        kept_new = ~dominated_by(new_points, front_points)
+        kept_front = ~dominated_by(front_points, new_points[kept_new])
+
+        self.configurations = [
+            c for c, keep in zip(self.configurations, kept_front) if keep
+        ] + [c for c, keep in zip(configurations, kept_new) if keep]
+        self.values = np.concatenate([self.values[kept_front], values[kept_new]])
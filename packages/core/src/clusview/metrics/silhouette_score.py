@@ -1,10 +1,10 @@
+from importlib.util import find_spec
 from typing import Any
 
 import numpy as np
 from numpy import ndarray
-from sklearn.metrics import silhouette_score
 
-from .base_metric import BaseMetric
+from .base_metric import BaseMetric, resolve_backend
 
 
 class SilhouetteScore(BaseMetric):
@@ -16,7 +16,24 @@ class SilhouetteScore(BaseMetric):
     a way to assess the quality of a clustering solution by quantifying the
     separation between clusters and the compactness of data points within clusters.
 
+    With the `numba` backend, a compiled, multi-threaded kernel computes the score
+    directly on the full embedding array, without copying out the non-outlier points
+    and in cache-sized blocks, never materializing the pairwise distance matrix.
+
+    Under a `MemoryBudget`, the metric switches to the numba backend or smaller
+    scikit-learn chunks when that suffices, and otherwise to the approximate score
+    of a random sample of the clustered points.
+
     Args:
+        backend (str): `"numba"`, `"sklearn"`, or `"auto"` for numba when installed.
+        n_threads (int): Threads used by the numba kernel, all of them if `None`. Give
+            a worker all of its threads when sweeping few, large configurations.
+        block_size (int): Points per side of the distance blocks of the numba kernel.
+        working_memory (int): Memory, in MB, of the distance chunks of scikit-learn.
+            Scikit-learn's `working_memory` setting if `None`.
+        sample_size (int): Number of clustered points the score is approximated on.
+            Exact if `None`.
+        random_state (int): Seed of the sample.
         clusters (ndarray): The cluster assignments for each data point.
         embeddings (ndarray): The embeddings of the data points.
 
@@ -37,10 +54,37 @@ class SilhouetteScore(BaseMetric):
         - [Scikit-learn Silhouette Score](https://scikit-learn.org/stable/modules/generated/sklearn.metrics.silhouette_score.html)
     """
 
+    def __init__(
+        self,
+        backend: str = "auto",
+        n_threads: int = None,
+        block_size: int = 256,
+        working_memory: int = None,
+        sample_size: int = None,
+        random_state: int = 0,
+    ) -> None:
+        super().__init__()
+        self.backend = resolve_backend(backend)
+        self.n_threads = n_threads
+        self.block_size = block_size
+        self.working_memory = working_memory
+        self.sample_size = sample_size
+        self.random_state = random_state
+
     def perform_metric(self, **kwargs: Any) -> float:
         clusters: ndarray = kwargs["clusters"]
         embeddings: ndarray = kwargs["embeddings"]
 
+        if self.sample_size is not None:
+            indices = np.where(clusters != -1)[0]
+            if len(indices) > self.sample_size:
+                rng = np.random.default_rng(self.random_state)
+                indices = np.sort(rng.choice(indices, self.sample_size, replace=False))
+                clusters, embeddings = clusters[indices], embeddings[indices]
+
+        if self.backend == "numba":
+            return self.perform_numba(clusters, embeddings)
+
         indices = np.where(clusters != -1)[0]
 
         if len(indices) == 0:
@@ -49,4 +93,83 @@ class SilhouetteScore(BaseMetric):
         X = embeddings[indices]
         labels = clusters[indices]
 
-        return silhouette_score(X, labels)
+        from sklearn import config_context
+        from sklearn.metrics import silhouette_score
+
+        with config_context(working_memory=self.working_memory):
+            return silhouette_score(X, labels)
+
+    def estimate_memory(
+        self, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> int:
+        n_points = min(n_documents, self.sample_size or n_documents)
+        # Masks, indices and relabelled clusters, plus the sampled embeddings if any.
+        memory = 4 * n_documents * 8
+        if n_points < n_documents:
+            memory += n_points * n_dimensions * 8
+
+        if self.backend == "numba":
+            # Scores, and one block of distance sums to every cluster per thread.
+            threads = self.n_threads or n_threads
+            return memory + n_points * 8 + threads * self.block_size * n_points * 8
+
+        working_memory = self.working_memory
+        if working_memory is None:
+            from sklearn import get_config
+
+            working_memory = get_config()["working_memory"]
+        # scikit-learn copies the clustered points, then computes distance chunks of
+        # as many rows as fit in its working memory, with as large a temporary.
+        chunk_rows = min(n_points, max(1, working_memory * 2**20 // (n_points * 8)))
+        return memory + n_points * n_dimensions * 8 + 2 * chunk_rows * n_points * 8
+
+    def within_memory(
+        self, memory: int, n_documents: int, n_dimensions: int, n_threads: int = 1
+    ) -> BaseMetric:
+        def fits(metric: BaseMetric) -> bool:
+            return (
+                metric.estimate_memory(n_documents, n_dimensions, n_threads) <= memory
+            )
+
+        if fits(self):
+            return self
+
+        exact = self
+        if self.backend == "sklearn" and find_spec("numba") is not None:
+            exact = self.with_options(backend="numba")
+        elif self.backend == "sklearn":
+            for working_memory in [256, 64, 16]:
+                exact = self.with_options(working_memory=working_memory)
+                if fits(exact):
+                    break
+        if fits(exact):
+            return exact
+
+        sample_size = min(n_documents, self.sample_size or n_documents)
+        approximate = exact
+        while sample_size > 1_000 and not fits(approximate):
+            sample_size //= 2
+            approximate = exact.with_options(sample_size=sample_size)
+        return approximate
+
+    def perform_numba(self, clusters: ndarray, embeddings: ndarray) -> float:
+        from . import numba_kernels
+
+        labels, n_clusters = numba_kernels.consecutive_labels(clusters)
+        n_points = int((labels != -1).sum())
+
+        if n_points == 0:
+            return 0
+
+        # Same validity requirement as scikit-learn's implementation.
+        if not 2 <= n_clusters <= n_points - 1:
+            raise ValueError(
+                f"Number of labels is {n_clusters}. Valid values are 2 to n_samples - 1 (inclusive)"
+            )
+
+        with numba_kernels.thread_limit(self.n_threads):
+            scores = numba_kernels.silhouette_samples(
+                np.ascontiguousarray(embeddings), labels, n_clusters, self.block_size
+            )
+
+        return float(scores.sum() / n_points)
@@ -0,0 +1,67 @@
+from typing import Any, Dict
+
+import numpy as np
+from numpy import ndarray
+
+from ..topics.cooccurrence import CooccurrenceIndex
+from ..topics.ctfidf import ClassTFIDF
+from .base_metric import BaseMetric
+
+
+class TopicCoherence(BaseMetric):
+    """
+    Mean NPMI coherence of the c-TF-IDF topics of a clustering result.
+
+    The topics of each cluster are its `top_k` c-TF-IDF terms, extracted over the
+    document-term matrix of the index, and scored against its precomputed
+    co-occurrence counts, so that a configuration costs one sparse product and a few
+    sparse lookups rather than a scan of the corpus. Outliers form no topic.
+
+    The metric pickles as its index, which a saved `CooccurrenceIndex` reduces to a
+    path, so that it is cheap to ship to the pool workers with every task.
+
+    Args:
+        index (CooccurrenceIndex): Co-occurrence counts of the clustered corpus.
+        top_k (int): Number of terms per topic.
+
+    Returns:
+        float: The mean coherence of the topics, in [-1, 1], 0 if no cluster has two
+        known terms.
+
+    Examples:
+        >>> index = CooccurrenceIndex.load("stores/cooccurrence")
+        >>> metric = TopicCoherence(index, top_k=10)
+        >>> metric.perform_metric(clusters=hdbscan.fit_predict(reduced_embeddings))
+        0.142
+
+    References:
+        - [Röder et al., Exploring the Space of Topic Coherence Measures](https://dl.acm.org/doi/10.1145/2684822.2685324)
+    """
+
+    def __init__(self, index: CooccurrenceIndex, top_k: int = 10) -> None:
+        super().__init__()
+        self.index = index
+        self.top_k = top_k
+        self.ctfidf: ClassTFIDF = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Topics are cached per process, the c-TF-IDF state is rebuilt on first use.
+        state = self.__dict__.copy()
+        state["ctfidf"] = None
+        return state
+
+    def perform_metric(self, **kwargs: Any) -> float:
+        clusters: ndarray = kwargs["clusters"]
+
+        if self.ctfidf is None:
+            self.ctfidf = ClassTFIDF.from_counts(
+                self.index.document_terms, self.index.vocabulary, top_k=self.top_k
+            )
+        topics = self.ctfidf.topics(clusters)
+        coherences = self.index.coherence(
+            [[term for term, _ in terms] for terms in topics.values()]
+        )
+        coherences = coherences[~np.isnan(coherences)]
+        if len(coherences) == 0:
+            return 0
+        return float(coherences.mean())
@@ -2,7 +2,6 @@ from typing import Any
 
 import numpy as np
 from numpy import ndarray
-from sklearn.metrics import v_measure_score
 
 from .base_metric import BaseMetric
 
@@ -61,4 +60,6 @@ class VMeasureScore(BaseMetric):
         labels = clusters[indices]
         groundtruth_labels = self.groundtruth_clusters[indices]
 
+        from sklearn.metrics import v_measure_score
+
         return v_measure_score(groundtruth_labels, labels, beta=self.beta)
@@ -0,0 +1,205 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from ..metrics.base_metric import BaseMetric
+
+
+class Constraint:
+    """
+    Feasibility bounds on a cheap metric, checked from the labels of a configuration
+    before any expensive metric is computed for it.
+
+    Configurations outside the bounds are skipped: their metric values are left
+    missing, and the cells of the metric maps closest to them are marked in
+    `MetricMap.skipped`.
+
+    When the metric is nearly non-increasing in a parameter, as the cluster count is in
+    `min_cluster_size`, `decreasing_in` names that parameter. Sweeps then bisect each
+    row of the grid along it for the feasible interval, and skip the configurations on
+    either side without fitting them. The trend is assumed, not checked: a metric
+    breaking it may cause a few feasible configurations to be skipped.
+
+    Args:
+        metric (BaseMetric): Metric to bound. Should only depend on the labels, such as
+            `OutlierRatio` or `ClusterCount`.
+        minimum (float): Smallest feasible value, unbounded if `None`.
+        maximum (float): Largest feasible value, unbounded if `None`.
+        decreasing_in (str): Parameter along which the metric does not increase.
+
+    Examples:
+        >>> constraints = [
+        ...     Constraint(OutlierRatio(), maximum=0.5),
+        ...     Constraint(ClusterCount(), 5, 200, decreasing_in="min_cluster_size"),
+        ... ]
+        >>> mapper = MetricMapper(..., constraints=constraints)
+    """
+
+    def __init__(
+        self,
+        metric: BaseMetric,
+        minimum: float = None,
+        maximum: float = None,
+        decreasing_in: str = None,
+    ) -> None:
+        self.metric = metric
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decreasing_in = decreasing_in
+
+    def measure(self, labels: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        return self.metric.perform_metric_batch(labels, embeddings=embeddings)
+
+    def too_low(self, values: np.ndarray) -> np.ndarray:
+        if self.minimum is None:
+            return np.zeros(len(values), dtype=bool)
+        return values < self.minimum
+
+    def too_high(self, values: np.ndarray) -> np.ndarray:
+        if self.maximum is None:
+            return np.zeros(len(values), dtype=bool)
+        return values > self.maximum
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self.metric).__name__} in "
+            f"[{'-inf' if self.minimum is None else self.minimum}, "
+            f"{'inf' if self.maximum is None else self.maximum}]"
+        )
+
+
+def satisfies(
+    constraints: List[Constraint], labels: np.ndarray, embeddings: np.ndarray
+) -> np.ndarray:
+    """
+    Checks a block of label vectors, one configuration per row, against every
+    constraint.
+
+    Returns:
+        np.ndarray: Whether each configuration is feasible.
+    """
+    feasible = np.ones(len(labels), dtype=bool)
+    for constraint in constraints:
+        values = constraint.measure(labels, embeddings)
+        feasible &= ~(constraint.too_low(values) | constraint.too_high(values))
+    return feasible
+
+
+def bisection_parameter(constraints: List[Constraint]) -> str | None:
+    """
+    Returns:
+        str | None: The parameter the grid rows can be bisected along, `None` if no
+        constraint has a trend.
+    """
+    parameters = {
+        constraint.decreasing_in
+        for constraint in constraints
+        if constraint.decreasing_in is not None
+    }
+    if len(parameters) > 1:
+        raise ValueError(
+            f"Constraints trend along several parameters {sorted(parameters)}, "
+            "rows can only be bisected along one."
+        )
+    return parameters.pop() if parameters else None
+
+
+def feasible_interval(
+    fit: Callable[[int], np.ndarray],
+    size: int,
+    constraints: List[Constraint],
+    embeddings: np.ndarray,
+) -> Tuple[int, int]:
+    """
+    Bisects a row of configurations, sorted by the parameter the trending constraints
+    decrease in, for the interval where none of them is out of bounds.
+
+    Above its maximum, a decreasing metric also is for every smaller parameter value,
+    and below its minimum for every larger one, so both ends of the interval are found
+    with O(log n) fits each.
+
+    Args:
+        fit (Callable[[int], np.ndarray]): Labels of the configuration at an index of
+            the row, cached by the caller so that probes are not fitted twice.
+        size (int): Number of configurations in the row.
+        constraints (List[Constraint]): Constraints of the sweep. Only those with a
+            trend are bisected.
+        embeddings (np.ndarray): Clustered embeddings, for the metrics needing them.
+
+    Returns:
+        Tuple[int, int]: Start and stop of the interval, empty if `start >= stop`.
+    """
+    trending = [
+        constraint for constraint in constraints if constraint.decreasing_in is not None
+    ]
+    if not trending:
+        return 0, size
+
+    def values(index: int) -> List[np.ndarray]:
+        labels = fit(index)[None, :]
+        return [constraint.measure(labels, embeddings) for constraint in trending]
+
+    def above_maximum(index: int) -> bool:
+        return any(
+            constraint.too_high(value)[0]
+            for constraint, value in zip(trending, values(index))
+        )
+
+    def below_minimum(index: int) -> bool:
+        return any(
+            constraint.too_low(value)[0]
+            for constraint, value in zip(trending, values(index))
+        )
+
+    # First index no longer above any maximum.
+    low, high = 0, size
+    while low < high:
+        middle = (low + high) // 2
+        if above_maximum(middle):
+            low = middle + 1
+        else:
+            high = middle
+    start = low
+
+    # First index, from start, below some minimum.
+    low, high = start, size
+    while low < high:
+        middle = (low + high) // 2
+        if below_minimum(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return start, low
+
+
+def group_rows(
+    configurations: List[Any],
+    parameter_names: List[str],
+    parameter: str | None,
+    block_size: int,
+) -> List[List[Any]]:
+    """
+    Splits configurations into the rows of the grid along `parameter`, each sorted by
+    it, or into blocks of `block_size` when there is nothing to bisect along.
+
+    Returns:
+        List[List[Any]]: The rows, or blocks, of configurations.
+    """
+    if parameter is None or parameter not in parameter_names:
+        return [
+            configurations[start : start + block_size]
+            for start in range(0, len(configurations), block_size)
+        ]
+
+    rows: Dict[Tuple, List[Any]] = {}
+    for configuration in configurations:
+        key = tuple(
+            getattr(configuration, name)
+            for name in parameter_names
+            if name != parameter
+        )
+        rows.setdefault(key, []).append(configuration)
+    return [
+        sorted(row, key=lambda configuration: getattr(configuration, parameter))
+        for row in rows.values()
+    ]
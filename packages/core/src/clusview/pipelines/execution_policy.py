@@ -0,0 +1,112 @@
+import os
+from math import log2
+from multiprocessing import cpu_count
+from typing import Tuple
+
+THREAD_LIMIT_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def limit_threads(n_threads: int) -> None:
+    """
+    Pins the size of every native thread pool of the current process.
+
+    Environment variables cover the libraries that have not started their pools yet,
+    `threadpoolctl` the OpenMP and BLAS pools that already have, and numba's own
+    pool is resized directly.
+
+    Args:
+        n_threads (int): Maximum number of threads per pool.
+    """
+    for env_var in THREAD_LIMIT_ENV_VARS:
+        os.environ[env_var] = str(n_threads)
+
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(limits=n_threads)
+    except ImportError:
+        pass
+
+    try:
+        import numba
+
+        numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    except ImportError:
+        pass
+
+
+class ExecutionPolicy:
+    """
+    Decides how many processes run a sweep and how many threads each process uses.
+
+    Small corpora are best served by one single-threaded process per core, each
+    clustering its own configuration. Past `large_dataset` documents, a single
+    HDBSCAN fit or silhouette becomes expensive enough that giving it several threads
+    (`core_dist_n_jobs`, Boruvka and the numba metric kernels) beats running more
+    configurations at once, and fewer processes also mean fewer copies of the
+    embeddings. When there are fewer configurations than cores, the spare cores go to
+    threads as well. Either figure can be overridden.
+
+    Processes times threads never exceeds the available cores, and every worker pins
+    its native thread pools to its share, so that numba, OpenBLAS and OpenMP do not
+    oversubscribe the machine.
+
+    Args:
+        processes (int): Fixed number of processes, decided from the workload if `None`.
+        threads_per_process (int): Fixed number of threads per process, decided from
+            the workload if `None`.
+        cores (int): Cores available to the sweep. Defaults to the CPU count.
+        large_dataset (int): Number of documents from which configurations get more
+            than one thread, doubling the dataset size adds one more thread.
+
+    Examples:
+        >>> policy = ExecutionPolicy(cores=64)
+        >>> policy.plan(n_documents=5_000, n_configurations=10_000)
+        (64, 1)
+        >>> policy.plan(n_documents=800_000, n_configurations=10_000)
+        (16, 4)
+        >>> policy.plan(n_documents=5_000, n_configurations=8)
+        (8, 8)
+    """
+
+    def __init__(
+        self,
+        processes: int = None,
+        threads_per_process: int = None,
+        cores: int = None,
+        large_dataset: int = 100_000,
+    ) -> None:
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.cores = cores or cpu_count()
+        self.large_dataset = large_dataset
+
+    def plan(self, n_documents: int, n_configurations: int) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: The number of processes and of threads per process.
+        """
+        if self.processes and self.threads_per_process:
+            return self.processes, self.threads_per_process
+        if self.processes:
+            return self.processes, max(1, self.cores // self.processes)
+        if self.threads_per_process:
+            return max(1, self.cores // self.threads_per_process), (
+                self.threads_per_process
+            )
+
+        threads = 1
+        if n_documents >= self.large_dataset:
+            threads = 1 + int(log2(n_documents / self.large_dataset))
+        threads = min(threads, self.cores)
+
+        processes = max(1, min(self.cores // threads, n_configurations))
+        threads = max(1, self.cores // processes)
+
+        return processes, threads
@@ -0,0 +1,188 @@
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+
+from ..metrics.base_metric import BaseMetric
+
+logger = logging.getLogger(__name__)
+
+SIZE_UNITS = {"B": 1, "KB": 2**10, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+
+
+def parse_size(size: int | str) -> int:
+    """
+    Converts a memory size such as `"32GB"` or `"512 MB"` to bytes.
+
+    Examples:
+        >>> parse_size("1.5GB")
+        1610612736
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?B?)\s*", size.upper())
+    if match is None:
+        raise ValueError(f"Invalid memory size '{size}', expected e.g. '32GB'.")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).rstrip("B") + "B"])
+
+
+def format_size(size: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def available_memory() -> int:
+    """
+    Memory available to new allocations, falling back to the physical memory where
+    the kernel does not report it.
+    """
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def estimate_clustering_memory(
+    n_documents: int, n_dimensions: int, min_samples: int = 5, block_size: int = 1
+) -> int:
+    """
+    Estimates the peak memory of clustering one block of configurations, in bytes.
+
+    HDBSCAN keeps a space tree over a float64 copy of the embeddings, the core
+    distances and neighbours of every point, and the spanning and linkage trees, all
+    linear in the number of documents. The labels of the whole block are kept until
+    it is measured.
+    """
+    per_document = 2 * n_dimensions * 8 + 2 * min_samples * 8 + 4 * 4 * 8
+    return n_documents * per_document + block_size * n_documents * 8
+
+
+class MemoryBudget:
+    """
+    Keeps a sweep within a memory budget.
+
+    Before a sweep starts, the peak memory of each task is estimated from the number
+    of documents, their dimensions and the configured metrics, see
+    `BaseMetric.estimate_memory`. Metrics that would not fit in the share of the
+    budget of a single task are first switched to chunked or approximate variants,
+    see `BaseMetric.within_memory`, then concurrency is lowered until every task
+    running at once fits. Each decision is logged and kept in `decisions`.
+
+    Estimates are upper bounds, so that a sweep admitted under the budget never
+    exceeds it, and one that could not fit even on a single task is refused upfront
+    rather than killed partway through.
+
+    Args:
+        total (int | str): Budget in bytes, or a size such as `"32GB"`. Defaults to
+            `fraction` of the memory available when the budget is created.
+        fraction (float): Fraction of the available memory used as the default budget,
+            leaving room for the parent process and the operating system.
+
+    Examples:
+        >>> budget = MemoryBudget("64GB")
+        >>> metrics, concurrency = budget.admit(
+        ...     metrics, 50_000, 5, concurrency=64, block_size=8, min_samples=100
+        ... )
+        >>> budget.decisions[0]
+        "SilhouetteScore needs 2.0GB per task, 934.7MB fit in 1/64 of 64.0GB: using {'backend': 'numba'} (99.6MB)."
+    """
+
+    def __init__(self, total: int | str = None, fraction: float = 0.8) -> None:
+        if total is not None:
+            self.total = parse_size(total)
+        else:
+            self.total = int(available_memory() * fraction)
+        self.decisions: List[str] = []
+
+    def log(self, decision: str) -> None:
+        logger.info(decision)
+        self.decisions.append(decision)
+
+    def admit(
+        self,
+        metrics: Dict[str, BaseMetric],
+        n_documents: int,
+        n_dimensions: int,
+        concurrency: int,
+        n_threads: int = 1,
+        block_size: int = 1,
+        min_samples: int = 5,
+    ) -> Tuple[Dict[str, BaseMetric], int]:
+        """
+        Fits a sweep in the budget.
+
+        Args:
+            metrics (Dict[str, BaseMetric]): Metrics of the sweep, by name.
+            n_documents (int): Number of documents clustered by each task.
+            n_dimensions (int): Dimensions of the clustered embeddings.
+            concurrency (int): Number of tasks that would run at once.
+            n_threads (int): Threads of each task.
+            block_size (int): Configurations clustered per task.
+            min_samples (int): Largest `min_samples` of the swept configurations.
+
+        Returns:
+            Tuple[Dict[str, BaseMetric], int]: The metrics to use instead, and the
+            number of tasks that may run at once.
+
+        Raises:
+            MemoryError: If a single task would not fit in the budget.
+        """
+        clustering_memory = estimate_clustering_memory(
+            n_documents, n_dimensions, min_samples, block_size
+        )
+        # Metrics run one after the other, each one may use all but the clustering.
+        metric_memory = self.total // concurrency - clustering_memory
+
+        admitted = {}
+        for name, metric in metrics.items():
+            needed = metric.estimate_memory(n_documents, n_dimensions, n_threads)
+            if needed <= metric_memory:
+                admitted[name] = metric
+                continue
+
+            variant = metric.within_memory(
+                max(metric_memory, 0), n_documents, n_dimensions, n_threads
+            )
+            if variant is not metric:
+                changes = {
+                    key: value
+                    for key, value in vars(variant).items()
+                    if vars(metric).get(key) != value
+                }
+                self.log(
+                    f"{name} needs {format_size(needed)} per task, "
+                    f"{format_size(max(metric_memory, 0))} fit in 1/{concurrency} of "
+                    f"{format_size(self.total)}: using {changes} "
+                    f"({format_size(variant.estimate_memory(n_documents, n_dimensions, n_threads))})."
+                )
+            admitted[name] = variant
+
+        task_memory = clustering_memory + max(
+            [
+                metric.estimate_memory(n_documents, n_dimensions, n_threads)
+                for metric in admitted.values()
+            ],
+            default=0,
+        )
+        if task_memory > self.total:
+            raise MemoryError(
+                f"A single task needs {format_size(task_memory)}, more than the "
+                f"memory budget of {format_size(self.total)}."
+            )
+
+        admitted_concurrency = min(concurrency, self.total // task_memory)
+        if admitted_concurrency < concurrency:
+            self.log(
+                f"Lowering concurrency from {concurrency} to {admitted_concurrency} "
+                f"tasks of {format_size(task_memory)} each to fit in "
+                f"{format_size(self.total)}."
+            )
+
+        return admitted, admitted_concurrency
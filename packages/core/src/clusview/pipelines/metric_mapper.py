@@ -1,30 +1,346 @@
-from concurrent.futures import ProcessPoolExecutor
-from functools import partial
-from multiprocessing import cpu_count
-from typing import Dict
+import json
+import logging
+import pickle
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
 import numpy as np
-import pandas as pd
-from hdbscan import HDBSCAN
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
-from umap import UMAP
 
 from ..loaders.documents.base_document_loader import BaseDocumentLoader
 from ..metrics.base_metric import BaseMetric
+from ..metrics.pareto import ParetoFront
+from ..profiling.profiler import profiler
+from ..samplers.clusters.base_cluster_sampler import BaseClusterSampler
 from ..samplers.clusters.hdsbcan_sampler import HDBSCANSampler
+from ..storage.label_archive import LabelArchiveWriter, smallest_label_dtype
+from .constraints import (
+    Constraint,
+    bisection_parameter,
+    feasible_interval,
+    group_rows,
+    satisfies,
+)
+from .execution_policy import ExecutionPolicy
+from .memory_budget import MemoryBudget
+from .reduction import UMAPSweep
+from .scheduler import Scheduler
+from .subsampling import assign_labels, stratified_subsample, validate_subsample
+from .worker_pool import WorkerPool
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from hdbscan import HDBSCAN
+    from sentence_transformers import SentenceTransformer
+    from umap import UMAP
+
+logger = logging.getLogger(__name__)
+
+# Fewer validated configurations do not support a meaningful rank correlation.
+MIN_RANK_CORRELATION_SAMPLES = 8
+
+
+def measure_labels(
+    labels: np.ndarray, embeddings: np.ndarray, metrics: Dict[str, BaseMetric]
+) -> Dict[str, np.ndarray]:
+    """
+    Measures a block of label vectors, one configuration per row, with the batch API
+    of each metric.
+
+    Returns:
+        Dict[str, np.ndarray]: The values of each metric for every row, by name.
+    """
+    return {
+        metric: metrics[metric].perform_metric_batch(labels, embeddings=embeddings)
+        for metric in metrics
+    }
+
+
+def cluster_and_measure(
+    hdbscans: List["HDBSCAN"],
+    embeddings: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    return_labels: bool = False,
+) -> Dict[str, np.ndarray] | Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Clusters the embeddings with a block of HDBSCAN configurations and measures the
+    stacked results at once.
+
+    Runs inside the pool workers, so that only the metric values, and the labels in
+    their smallest dtype if requested, travel back.
+
+    Returns:
+        Dict[str, np.ndarray]: The values of each metric for every configuration, by
+        name, along with the label matrix if `return_labels` is set.
+    """
+    with profiler.stage("hdbscan.fit"):
+        labels = np.stack([hdbscan.fit_predict(embeddings) for hdbscan in hdbscans])
+    metric_values = measure_labels(labels, embeddings, metrics)
+    if return_labels:
+        return metric_values, labels.astype(smallest_label_dtype(labels))
+    return metric_values
+
+
+def measure_feasible(
+    labels: np.ndarray,
+    feasible: np.ndarray,
+    embeddings: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    return_labels: bool,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray | None]:
+    """
+    Measures the feasible rows of a label matrix only, leaving the metric values of the
+    others missing.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray | None]: The values of each
+        metric for every configuration, by name, with NaN for skipped ones, whether
+        each configuration was skipped, and the labels of the measured configurations
+        if `return_labels` is set.
+    """
+    metric_values = {
+        metric: np.full(len(feasible), np.nan, dtype=float) for metric in metrics
+    }
+    kept = np.flatnonzero(feasible)
+    if len(kept):
+        for metric, values in measure_labels(labels[kept], embeddings, metrics).items():
+            metric_values[metric][kept] = values
+
+    kept_labels = None
+    if return_labels:
+        kept_labels = labels[kept].astype(smallest_label_dtype(labels[kept]))
+    return metric_values, ~feasible, kept_labels
+
+
+def cluster_and_measure_constrained(
+    hdbscans: List["HDBSCAN"],
+    embeddings: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    constraints: List[Constraint],
+    return_labels: bool = False,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray | None]:
+    """
+    Clusters the embeddings with a row of HDBSCAN configurations, sorted along the
+    parameter the constraints trend in, and measures the feasible ones.
+
+    The row is bisected for its feasible interval first, see `feasible_interval`, so
+    that the configurations on either side are skipped without being fitted. The
+    constraints are then checked on every configuration of the interval before any
+    expensive metric runs.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray | None]: See
+        `measure_feasible`.
+    """
+    labels: Dict[int, np.ndarray] = {}
+
+    def fit(index: int) -> np.ndarray:
+        if index not in labels:
+            with profiler.stage("hdbscan.fit"):
+                labels[index] = hdbscans[index].fit_predict(embeddings)
+        return labels[index]
+
+    start, stop = feasible_interval(fit, len(hdbscans), constraints, embeddings)
+
+    label_matrix = np.full((len(hdbscans), len(embeddings)), -1, dtype=np.int64)
+    feasible = np.zeros(len(hdbscans), dtype=bool)
+    if stop > start:
+        for index in range(start, stop):
+            label_matrix[index] = fit(index)
+        feasible[start:stop] = satisfies(
+            constraints, label_matrix[start:stop], embeddings
+        )
+    return measure_feasible(label_matrix, feasible, embeddings, metrics, return_labels)
+
+
+def sweep_and_measure(
+    cluster_sampler: BaseClusterSampler,
+    embeddings: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    return_labels: bool = False,
+    constraints: List[Constraint] = None,
+) -> (
+    Dict[str, np.ndarray]
+    | Tuple[Dict[str, np.ndarray], np.ndarray]
+    | Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray | None]
+):
+    """
+    Clusters the embeddings with every configuration of a warm-started sampler, in a
+    single sweep, and measures the stacked results at once.
+
+    Returns:
+        Dict[str, np.ndarray]: The values of each metric for every configuration, by
+        name, along with the label matrix if `return_labels` is set. With
+        `constraints`, only feasible configurations are measured, see
+        `measure_feasible`.
+    """
+    with profiler.stage(f"{type(cluster_sampler).__name__}.sweep"):
+        labels = cluster_sampler.sweep(embeddings)
+    if constraints is not None:
+        feasible = satisfies(constraints, labels, embeddings)
+        return measure_feasible(labels, feasible, embeddings, metrics, return_labels)
+    metric_values = measure_labels(labels, embeddings, metrics)
+    if return_labels:
+        return metric_values, labels.astype(smallest_label_dtype(labels))
+    return metric_values
+
+
+def fit_reducer(embeddings: np.ndarray, random_state: int) -> Tuple["UMAP", np.ndarray]:
+    """
+    Fits the UMAP reducer of a run, possibly inside a pool worker.
+
+    Returns:
+        Tuple[UMAP, np.ndarray]: The fitted reducer and the reduced embeddings.
+    """
+    from umap import UMAP
+
+    reducer = UMAP(
+        n_neighbors=15,
+        n_components=5,
+        min_dist=0.0,
+        metric="cosine",
+        random_state=random_state,
+    )
+    with profiler.stage("umap.fit"):
+        reduced_embeddings = reducer.fit_transform(embeddings)
+    return reducer, reduced_embeddings
+
+
+def write_metric_maps(
+    metric_maps: Dict[str, "pd.DataFrame"], sampler_names: List[str], out_dir: str
+) -> None:
+    """
+    Averages the samples of each metric over repeated configurations and writes them
+    to `<out_dir>/<metric>_map.csv`, sorted by configuration.
+    """
+    for metric, df in metric_maps.items():
+        combined_df = df.groupby(sampler_names, as_index=False).agg({metric: "mean"})
+        sorted_df = combined_df.sort_values(by=sampler_names)
+        sorted_df.to_csv(f"{out_dir}/{metric}_map.csv", index=False)
 
 
 class MetricMapper:
+    """
+    Builds metric maps by sweeping HDBSCAN configurations over UMAP reductions of
+    transformer embeddings.
+
+    Configurations that would be discarded anyway can be skipped with `constraints`,
+    cheap bounds on label-only metrics checked before the expensive metrics run. The
+    rows of the grid are also bisected along the parameter a constraint trends in,
+    such as `min_cluster_size` for the cluster count, skipping whole infeasible ranges
+    without fitting them. Skipped configurations are written without metric values,
+    and marked in `MetricMap.skipped` when the maps are loaded.
+
+    Other clustering families are swept by passing their cluster sampler, such as
+    `KMeansSampler` or `AgglomerativeSampler`, instead of an `HDBSCANSampler`. Their
+    maps share the same format, and warm-started samplers sweep all of their
+    configurations in a single task per run, reusing work across configurations.
+
+    Besides the full `run`, the mapper keeps the embeddings and the fitted UMAP
+    reducers of its last run, so that a growing corpus can be refreshed with `update`:
+    only the new documents are encoded and projected with `UMAP.transform`, and only
+    the HDBSCAN sweep is recomputed. When the new documents drift too far away from
+    the ones the reducers were fitted on, a full refit is performed instead.
+
+    The UMAP reduction can be swept as well, with `umap_sweep`: the maps then span the
+    UMAP hyperparameters along with the HDBSCAN ones, in a joint study.
+
+    Past a few hundred thousand documents, sweeping every configuration over the whole
+    corpus is out of reach. With `subsample_size`, the sweep runs on a stratified
+    subsample of the reduced embeddings instead, so that `min_cluster_size` and
+    `min_samples` apply to the subsample. The labels of the configurations of
+    interest are then extended to the whole corpus with `extend_labels`, and a few
+    configurations are also fitted on a larger stratified slice of the corpus to
+    report, in `subsample_validation.csv`, how well the subsample maps agree with
+    ones fitted on more data. The overall agreement is kept in `subsample_agreement`
+    and written to `subsample_agreement.json`.
+
+    Args:
+        document_loader (BaseDocumentLoader): Loader of the documents to map.
+        transformer (SentenceTransformer): Model used to embed the documents.
+        hdbscan_sampler (BaseClusterSampler): Sampler of the clustering
+            configurations, HDBSCAN ones unless another cluster sampler is given.
+            Subsampled sweeps require an `HDBSCANSampler`.
+        metrics (Dict[str, BaseMetric]): Metrics to map, by name.
+        runs (int): Number of UMAP reductions whose metric values are averaged.
+        umap_seed (int): Seed for UMAP. Random on every run if `None`.
+        umap_sweep (UMAPSweep): UMAP hyperparameters to sweep on every run. A single
+            `UMAP(n_neighbors=15, n_components=5, min_dist=0.0)` if `None`. Swept
+            reductions cannot project new documents, so `update` refits them.
+        out_dir (str): Directory where the metric maps are written.
+        drift_threshold (float): Relative centroid shift of the new embeddings, with
+            respect to the fitted ones, above which `update` refits UMAP from scratch.
+            Drift is never checked if `None`.
+        pool (WorkerPool): Pool in which the sweeps run. If `None`, a pool is created
+            and shut down on every sweep; share one across mappers to keep it warm.
+        execution_policy (ExecutionPolicy): Decides the processes and threads of the
+            pools created by the mapper, and the threads of each HDBSCAN fit. Shared
+            pools keep their own sizes. Defaults to `ExecutionPolicy()`.
+        memory_budget (MemoryBudget): Memory the sweeps must stay within, switching
+            metrics to chunked or approximate variants and running fewer tasks at once
+            as needed. Unbounded if `None`.
+        profile (bool): Whether to profile every stage of the runs, writing
+            `profile.json` and the flame-graph compatible `profile_trace.json` to
+            `out_dir`. When sharing a pool, enable profiling before creating it.
+        archive_labels (bool): Whether to store the labels of every configuration in
+            `<out_dir>/labels_<run>.npz`, so that new metrics can later be computed
+            with `Rescorer` without clustering again.
+        block_size (int): Number of configurations clustered and measured per worker
+            call, amortizing the per-call overhead of cheap, label-only metrics.
+        pareto_directions (Dict[str, bool]): Metrics whose Pareto front is maintained
+            in `pareto_front` while the sweep streams in, with whether higher values
+            are better for each. Samples of every run are compared individually; the
+            front of the averaged maps is given by `pareto.pareto_front`.
+        constraints (List[Constraint]): Feasibility bounds checked from the labels of
+            every configuration before its metrics are computed. Unconstrained if
+            `None`.
+        subsample_size (int): Number of documents the sweep runs on, all of them if
+            `None`.
+        validation_size (int): Number of configurations of a subsampled sweep that are
+            also fitted on the validation slice. Validation is skipped if 0.
+        validation_slice_size (int): Number of documents of the validation slice, a
+            stratified sample of the corpus containing the subsample. Four times
+            `subsample_size` if `None`.
+        assign_batch_size (int): Number of documents assigned at once when extending
+            subsample labels to the whole corpus.
+
+    Examples:
+        >>> mapper = MetricMapper(loader, transformer, sampler, metrics, out_dir="maps")
+        >>> mapper.run()
+        >>> mapper.save_state("maps/state")
+
+        >>> mapper = MetricMapper(loader, transformer, sampler, metrics, out_dir="maps")
+        >>> mapper.load_state("maps/state")
+        >>> mapper.update(CSVConcatenator("new_papers.csv", ["Title", "Abstract"]))
+
+        >>> mapper = MetricMapper(..., subsample_size=50_000, out_dir="maps")
+        >>> mapper.run()
+        >>> labels = mapper.extend_labels({"min_cluster_size": 40, "min_samples": 10})
+    """
+
     def __init__(
         self,
         document_loader: BaseDocumentLoader,
-        transformer: SentenceTransformer,
-        hdbscan_sampler: HDBSCANSampler,
+        transformer: "SentenceTransformer",
+        hdbscan_sampler: BaseClusterSampler,
         metrics: Dict[str, BaseMetric],
         runs: int = 1,
         umap_seed: int = None,
+        umap_sweep: UMAPSweep = None,
         out_dir: str = "default",
+        drift_threshold: float = None,
+        pool: WorkerPool = None,
+        execution_policy: ExecutionPolicy = None,
+        memory_budget: MemoryBudget = None,
+        profile: bool = False,
+        archive_labels: bool = False,
+        block_size: int = 8,
+        pareto_directions: Dict[str, bool] = None,
+        constraints: List[Constraint] = None,
+        subsample_size: int = None,
+        validation_size: int = 16,
+        validation_slice_size: int = None,
+        assign_batch_size: int = 100_000,
     ) -> None:
         self.document_loader = document_loader
         self.transformer = transformer
@@ -32,77 +348,635 @@ class MetricMapper:
         self.metrics = metrics
         self.runs = runs
         self.umap_seed = umap_seed
+        self.umap_sweep = umap_sweep
         self.out_dir = out_dir
+        self.drift_threshold = drift_threshold
+        self.pool = pool
+        self.execution_policy = execution_policy or ExecutionPolicy()
+        self.memory_budget = memory_budget
+        self.profile = profile
+        self.archive_labels = archive_labels
+        self.block_size = block_size
+        self.pareto_directions = pareto_directions
+        self.constraints = constraints
+        self.subsample_size = subsample_size
+        self.validation_size = validation_size
+        self.validation_slice_size = validation_slice_size
+        self.assign_batch_size = assign_batch_size
+        if subsample_size is not None and not isinstance(
+            hdbscan_sampler, HDBSCANSampler
+        ):
+            raise ValueError(
+                "Subsampled sweeps extend labels with HDBSCAN, and require an HDBSCANSampler."
+            )
+        if profile:
+            profiler.enable()
 
-    def cluster(self, hdbscan: HDBSCAN, embeddings: np.ndarray):
-        clusters = hdbscan.fit_predict(embeddings)
-        return clusters, embeddings
+        self.embeddings: np.ndarray = None
+        self.fitted_size = 0
+        self.reducers: List["UMAP"] = []
+        self.reduced_embeddings: List[np.ndarray] = []
+        self.reduction_parameters: List[Dict[str, Any]] = []
+        self.subsample_indices: np.ndarray = None
+        self.pareto_front: ParetoFront = None
+        self.subsample_agreement: Dict[str, Any] = None
 
-    def run(self):
-        documents = self.document_loader.load_documents()
+    def encode(self, documents: List[str]) -> np.ndarray:
+        with profiler.stage("encode"):
+            return self.transformer.encode(
+                documents, show_progress_bar=True, device="cpu"
+            )
 
-        embeddings = self.transformer.encode(
-            documents, show_progress_bar=True, device="cpu"
-        )
+    def fit_reducers(self) -> None:
+        self.reducers = []
+        self.reduced_embeddings = []
+        self.reduction_parameters = []
 
-        sampler_names = [
-            sampler.parameter_name
-            for sampler in self.hdbscan_sampler.parameter_samplers
+        random_states = [
+            (
+                self.umap_seed
+                if self.umap_seed is not None
+                else np.random.randint(1, 2**32)
+            )
+            for _ in range(self.runs)
         ]
 
+        if self.umap_sweep is not None:
+            for random_state in random_states:
+                for parameters, reduced_embeddings in self.umap_sweep.reduce(
+                    self.embeddings, random_state
+                ):
+                    self.reduced_embeddings.append(reduced_embeddings)
+                    self.reduction_parameters.append(parameters)
+        elif self.pool is not None and self.runs > 1:
+            # Runs are independent, so a shared pool fits their reducers side by side.
+            scheduler = Scheduler(self.pool)
+            for run, random_state in enumerate(random_states):
+                scheduler.add(
+                    ("umap.fit", run), fit_reducer, args=(self.embeddings, random_state)
+                )
+            fitted = scheduler.run()
+            for run in range(self.runs):
+                reducer, reduced_embeddings = fitted[("umap.fit", run)]
+                self.reducers.append(reducer)
+                self.reduced_embeddings.append(reduced_embeddings)
+                self.reduction_parameters.append({})
+        else:
+            for random_state in random_states:
+                reducer, reduced_embeddings = fit_reducer(self.embeddings, random_state)
+                self.reducers.append(reducer)
+                self.reduced_embeddings.append(reduced_embeddings)
+                self.reduction_parameters.append({})
+
+        self.fitted_size = len(self.embeddings)
+
+    def drift(self) -> float:
+        """
+        Measures how far the embeddings added since the last UMAP fit have moved away
+        from the fitted ones.
+
+        Returns:
+            float: Distance between the centroids of both sets of embeddings, relative to
+            the spread of the fitted embeddings. `0` if no embeddings have been added.
+        """
+        fitted = self.embeddings[: self.fitted_size]
+        added = self.embeddings[self.fitted_size :]
+
+        if len(added) == 0:
+            return 0.0
+
+        spread = np.sqrt(fitted.var(axis=0).sum())
+        if spread == 0:
+            return float("inf")
+
+        return float(np.linalg.norm(added.mean(axis=0) - fitted.mean(axis=0)) / spread)
+
+    def run(self):
+        with profiler.stage("load_documents"):
+            documents = self.document_loader.load_documents()
+        self.embeddings = self.encode(documents)
+        self.fit_reducers()
+        self.sweep()
+        self.write_profile()
+
+    def update(self, document_loader: BaseDocumentLoader, force_refit: bool = False):
+        """
+        Incrementally adds documents to the last run and recomputes the metric maps.
+
+        New documents are encoded and projected with the already fitted UMAP reducers,
+        unless `force_refit` is set or their drift exceeds `drift_threshold`, in which
+        case the reducers are fitted again over the whole corpus. With a `umap_sweep`,
+        the reducers are always fitted again, as swept reductions cannot project new
+        documents.
+
+        Args:
+            document_loader (BaseDocumentLoader): Loader of the new documents only.
+            force_refit (bool): Whether to refit UMAP regardless of the drift.
+        """
+        if self.embeddings is None:
+            raise RuntimeError(
+                "MetricMapper has no previous state, call run() or load_state() first."
+            )
+
+        with profiler.stage("load_documents"):
+            documents = document_loader.load_documents()
+        new_embeddings = self.encode(documents)
+        self.embeddings = np.concatenate([self.embeddings, new_embeddings])
+
+        if self.umap_sweep is not None:
+            logger.info("Refitting the swept UMAP reductions on the whole corpus.")
+            force_refit = True
+        elif not force_refit and self.drift_threshold is not None:
+            drift = self.drift()
+            if drift > self.drift_threshold:
+                logger.info(
+                    "Drift %.4f exceeds threshold %s, refitting UMAP.",
+                    drift,
+                    self.drift_threshold,
+                )
+                force_refit = True
+
+        if force_refit:
+            self.fit_reducers()
+        else:
+            with profiler.stage("umap.transform"):
+                self.reduced_embeddings = [
+                    np.concatenate([reduced, reducer.transform(new_embeddings)])
+                    for reducer, reduced in zip(self.reducers, self.reduced_embeddings)
+                ]
+
+        self.sweep()
+        self.write_profile()
+
+    def sweep(self):
+        import pandas as pd
+        from tqdm import tqdm
+
+        sampler_names = self.hdbscan_sampler.parameter_names
+        reduction_names = list(self.reduction_parameters[0])
+        parameter_names = reduction_names + sampler_names
+
         metric_maps = {
-            metric: pd.DataFrame(columns=sampler_names + [metric])
+            metric: pd.DataFrame(columns=parameter_names + [metric])
             for metric in self.metrics
         }
 
+        if self.subsample_size is not None:
+            with profiler.stage("subsample"):
+                self.subsample_indices = stratified_subsample(
+                    self.reduced_embeddings[0], self.subsample_size, seed=self.umap_seed
+                )
+            logger.info(
+                "Sweeping a stratified subsample of %d out of %d documents.",
+                len(self.subsample_indices),
+                len(self.embeddings),
+            )
+            swept_embeddings = [
+                reduced_embeddings[self.subsample_indices]
+                for reduced_embeddings in self.reduced_embeddings
+            ]
+        else:
+            swept_embeddings = self.reduced_embeddings
+
+        configurations = list(self.hdbscan_sampler.iterate_configurations())
+        n_configurations = len(configurations)
         progress_bar = tqdm(
-            total=sum(1 for _ in self.hdbscan_sampler.iterate_configurations())
-            * self.runs,
+            total=n_configurations * len(swept_embeddings),
             desc=MetricMapper.__name__,
         )
 
-        def compute_metrics(sampler_values, future):
-            clusters, embeddings = future.result()
-            for metric in self.metrics:
-                metric_value = self.metrics[metric].perform_metric(
-                    clusters=clusters, embeddings=embeddings
-                )
-                new_row = sampler_values + [metric_value]
-                metric_maps[metric].loc[len(metric_maps[metric])] = new_row
-            progress_bar.update(1)
-
-        with ProcessPoolExecutor(max_workers=cpu_count()) as pool:
-            for _ in range(self.runs):
-                if self.umap_seed is not None:
-                    random_state = self.umap_seed
-                else:
-                    random_state = np.random.randint(1, 2**32)
-
-                reduced_embeddings = UMAP(
-                    n_neighbors=15,
-                    n_components=5,
-                    min_dist=0.0,
-                    metric="cosine",
-                    random_state=random_state,
-                ).fit_transform(embeddings)
-
-                for hdbscan in self.hdbscan_sampler.iterate_configurations():
-                    sampler_values = [
-                        getattr(hdbscan, param_name) for param_name in sampler_names
-                    ]
-                    future_result = pool.submit(
-                        self.cluster, hdbscan, reduced_embeddings
-                    )
-                    future_result.add_done_callback(
-                        partial(compute_metrics, sampler_values)
+        archive_writers = [
+            LabelArchiveWriter(
+                f"{self.out_dir}/labels_{run}.npz", parameter_names, reduced_embeddings
+            )
+            for run, reduced_embeddings in enumerate(swept_embeddings)
+            if self.archive_labels
+        ]
+
+        if self.pareto_directions is not None:
+            self.pareto_front = ParetoFront(list(self.pareto_directions.values()))
+
+        skipped_count = 0
+
+        def add_metrics(block_values, run, future):
+            nonlocal skipped_count
+            if self.constraints is not None:
+                metric_values, skipped, labels = future.result()
+            elif self.archive_labels:
+                metric_values, labels = future.result()
+                skipped = np.zeros(len(block_values), dtype=bool)
+            else:
+                metric_values = future.result()
+                skipped = np.zeros(len(block_values), dtype=bool)
+            # Labels are only returned for the measured configurations.
+            label_rows = np.cumsum(~skipped) - 1
+            skipped_count += int(skipped.sum())
+            with profiler.stage("bookkeeping"):
+                for row, sampler_values in enumerate(block_values):
+                    if self.archive_labels and not skipped[row]:
+                        archive_writers[run].add(
+                            sampler_values, labels[label_rows[row]]
+                        )
+                    for metric in self.metrics:
+                        new_row = sampler_values + [metric_values[metric][row]]
+                        metric_maps[metric].loc[len(metric_maps[metric])] = new_row
+                if self.pareto_front is not None:
+                    self.pareto_front.add(
+                        block_values,
+                        np.column_stack(
+                            [metric_values[metric] for metric in self.pareto_directions]
+                        ),
                     )
+                progress_bar.update(len(block_values))
+
+        if self.pool is not None:
+            processes = self.pool.max_workers
+            threads = self.pool.threads_per_worker or 1
+        else:
+            processes, threads = self.execution_policy.plan(
+                len(swept_embeddings[0]),
+                n_configurations * len(swept_embeddings),
+            )
+
+        metrics = self.metrics
+        max_in_flight = None
+        if self.memory_budget is not None:
+            metrics, concurrency = self.memory_budget.admit(
+                self.metrics,
+                len(swept_embeddings[0]),
+                swept_embeddings[0].shape[1],
+                processes,
+                n_threads=threads,
+                block_size=self.block_size,
+                min_samples=max(
+                    getattr(estimator, "min_samples", None)
+                    or getattr(estimator, "min_cluster_size", 1)
+                    for estimator in configurations
+                ),
+            )
+            if concurrency < processes:
+                processes = concurrency
+                # Shared pools cannot shrink, so fewer tasks are handed to them.
+                if self.pool is not None:
+                    max_in_flight = concurrency
+
+        if self.pool is not None:
+            pool = self.pool
+        else:
+            logger.info(
+                "Sweeping with %d processes of %d threads each.", processes, threads
+            )
+            pool = WorkerPool(max_workers=processes, threads_per_worker=threads)
+
+        futures = {}
+
+        def submit_block(block, run, reduced_embeddings):
+            reduction_values = [
+                self.reduction_parameters[run][name] for name in reduction_names
+            ]
+            block_values = [
+                reduction_values
+                + [getattr(hdbscan, param_name) for param_name in sampler_names]
+                for hdbscan in block
+            ]
+            if max_in_flight is not None and len(futures) >= max_in_flight:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future_result in done:
+                    add_metrics(*futures.pop(future_result), future_result)
+            if self.hdbscan_sampler.warm_started:
+                future_result = pool.submit(
+                    sweep_and_measure,
+                    self.hdbscan_sampler,
+                    reduced_embeddings,
+                    metrics,
+                    self.archive_labels,
+                    self.constraints,
+                )
+            elif self.constraints is not None:
+                future_result = pool.submit(
+                    cluster_and_measure_constrained,
+                    block,
+                    reduced_embeddings,
+                    metrics,
+                    self.constraints,
+                    self.archive_labels,
+                )
+            else:
+                future_result = pool.submit(
+                    cluster_and_measure,
+                    block,
+                    reduced_embeddings,
+                    metrics,
+                    self.archive_labels,
+                )
+            futures[future_result] = (block_values, run)
+
+        for run, reduced_embeddings in enumerate(swept_embeddings):
+            if self.hdbscan_sampler.warm_started:
+                submit_block(configurations, run, reduced_embeddings)
+                continue
+            if self.constraints is not None:
+                for hdbscan in configurations:
+                    hdbscan.core_dist_n_jobs = threads
+                for row in group_rows(
+                    configurations,
+                    sampler_names,
+                    bisection_parameter(self.constraints),
+                    self.block_size,
+                ):
+                    submit_block(row, run, reduced_embeddings)
+                continue
+            block = []
+            for hdbscan in self.hdbscan_sampler.iterate_configurations():
+                hdbscan.core_dist_n_jobs = threads
+                block.append(hdbscan)
+                if len(block) == self.block_size:
+                    submit_block(block, run, reduced_embeddings)
+                    block = []
+            if block:
+                submit_block(block, run, reduced_embeddings)
 
-        for metric, df in metric_maps.items():
-            combined_df = df.groupby(sampler_names, as_index=False).agg(
-                {metric: "mean"}
+        for future_result in as_completed(list(futures)):
+            add_metrics(*futures.pop(future_result), future_result)
+
+        if self.constraints is not None:
+            logger.info(
+                "Skipped %d of %d configurations outside %s.",
+                skipped_count,
+                n_configurations * len(swept_embeddings),
+                self.constraints,
+            )
+
+        if self.subsample_size is not None and self.validation_size:
+            self.subsample_agreement = self.validate(
+                pool, configurations, sampler_names, processes, threads
+            )
+
+        if self.pool is None:
+            pool.shutdown(wait=True)
+
+        for archive_writer in archive_writers:
+            archive_writer.close()
+
+        # Rows of skipped configurations hold NaN, which turns their whole row, and
+        # so integer parameter columns, into floats.
+        parameter_dtypes = {
+            name: np.asarray(
+                [getattr(hdbscan, name) for hdbscan in configurations]
+            ).dtype
+            for name in sampler_names
+        }
+        parameter_dtypes.update(
+            {
+                name: np.asarray(
+                    [parameters[name] for parameters in self.reduction_parameters]
+                ).dtype
+                for name in reduction_names
+            }
+        )
+        with profiler.stage("write_maps"):
+            write_metric_maps(
+                {
+                    metric: metric_map.astype(parameter_dtypes)
+                    for metric, metric_map in metric_maps.items()
+                },
+                parameter_names,
+                self.out_dir,
             )
-            sorted_df = combined_df.sort_values(by=sampler_names)
-            sorted_df.to_csv(f"{self.out_dir}/{metric}_map.csv", index=False)
 
         progress_bar.close()
-        pool.shutdown(wait=True)
+
+    def validate(
+        self,
+        pool: WorkerPool,
+        configurations: List["HDBSCAN"],
+        sampler_names: List[str],
+        processes: int,
+        threads: int,
+    ) -> Dict[str, Any]:
+        """
+        Fits `validation_size` random configurations of a subsampled sweep on the
+        validation slice of the first run, writing the metric values on the subsample
+        and on the slice, and the agreement of the extended labels with the ones fitted
+        on the slice, to `<out_dir>/subsample_validation.csv`.
+
+        The slice is admitted in the memory budget like a sweep of its own. The rank
+        correlation of the metric values is only reported from
+        `MIN_RANK_CORRELATION_SAMPLES` configurations on.
+
+        Returns:
+            Dict[str, Any]: The overall agreement, also written to
+            `<out_dir>/subsample_agreement.json`: the number of configurations and
+            documents of the slice, the mean adjusted Rand index, and for each metric
+            the mean absolute difference and the rank correlation, `None` when there
+            are too few or constant values.
+        """
+        import pandas as pd
+
+        rng = np.random.default_rng(self.umap_seed)
+        picked = np.sort(
+            rng.choice(
+                len(configurations),
+                min(self.validation_size, len(configurations)),
+                replace=False,
+            )
+        )
+
+        reduced_embeddings = self.reduced_embeddings[0]
+        slice_size = min(
+            self.validation_slice_size or 4 * self.subsample_size,
+            len(reduced_embeddings),
+        )
+        others = np.setdiff1d(
+            np.arange(len(reduced_embeddings)), self.subsample_indices
+        )
+        extra_size = slice_size - len(self.subsample_indices)
+        with profiler.stage("subsample"):
+            extra = (
+                others[
+                    stratified_subsample(
+                        reduced_embeddings[others], extra_size, seed=self.umap_seed
+                    )
+                ]
+                if extra_size > 0
+                else others[:0]
+            )
+        slice_indices = np.union1d(self.subsample_indices, extra)
+        slice_embeddings = reduced_embeddings[slice_indices]
+        subsample_positions = np.searchsorted(slice_indices, self.subsample_indices)
+
+        metrics = self.metrics
+        max_in_flight = None
+        if self.memory_budget is not None:
+            metrics, max_in_flight = self.memory_budget.admit(
+                self.metrics,
+                len(slice_embeddings),
+                slice_embeddings.shape[1],
+                processes,
+                n_threads=threads,
+                min_samples=max(
+                    configurations[index].min_samples
+                    or configurations[index].min_cluster_size
+                    for index in picked
+                ),
+            )
+
+        rows = []
+
+        def add_row(future_result):
+            rows.append(
+                {
+                    **self.reduction_parameters[0],
+                    **futures.pop(future_result),
+                    **future_result.result(),
+                }
+            )
+
+        futures = {}
+        for index in picked:
+            if max_in_flight is not None and len(futures) >= max_in_flight:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future_result in done:
+                    add_row(future_result)
+            hdbscan = configurations[index]
+            hdbscan.core_dist_n_jobs = threads
+            future_result = pool.submit(
+                validate_subsample,
+                hdbscan,
+                slice_embeddings,
+                subsample_positions,
+                metrics,
+                self.assign_batch_size,
+            )
+            futures[future_result] = {
+                name: getattr(hdbscan, name) for name in sampler_names
+            }
+        for future_result in as_completed(list(futures)):
+            add_row(future_result)
+
+        validation = pd.DataFrame(rows).sort_values(by=sampler_names)
+        validation.to_csv(f"{self.out_dir}/subsample_validation.csv", index=False)
+
+        agreement = {
+            "configurations": len(validation),
+            "documents": len(slice_indices),
+            "adjusted_rand": float(validation["adjusted_rand"].mean()),
+            "metrics": {},
+        }
+        logger.info(
+            "Subsample validation on %d configurations over %d documents, "
+            "adjusted Rand index %.3f.",
+            agreement["configurations"],
+            agreement["documents"],
+            agreement["adjusted_rand"],
+        )
+        for metric in self.metrics:
+            subsample = validation[f"{metric}_subsample"]
+            fitted = validation[f"{metric}_slice"]
+            correlation = None
+            if (
+                len(validation) >= MIN_RANK_CORRELATION_SAMPLES
+                and subsample.nunique() > 1
+                and fitted.nunique() > 1
+            ):
+                correlation = float(subsample.corr(fitted, method="spearman"))
+            agreement["metrics"][metric] = {
+                "mean_absolute_difference": float((subsample - fitted).abs().mean()),
+                "rank_correlation": correlation,
+            }
+            logger.info(
+                "%s: mean absolute difference %.4f, rank correlation %s.",
+                metric,
+                agreement["metrics"][metric]["mean_absolute_difference"],
+                "n/a" if correlation is None else f"{correlation:.3f}",
+            )
+
+        with open(f"{self.out_dir}/subsample_agreement.json", "w") as file:
+            json.dump(agreement, file, indent=4)
+        return agreement
+
+    def extend_labels(self, configuration: Dict[str, Any], run: int = 0) -> np.ndarray:
+        """
+        Clusters the whole corpus with a configuration of a subsampled sweep.
+
+        The configuration is fitted on the subsample of the last sweep, and its labels
+        are extended to the other documents with `approximate_predict`, in batches of
+        `assign_batch_size` documents.
+
+        Args:
+            configuration (Dict[str, Any]): HDBSCAN parameters, by name.
+            run (int): Run whose reduced embeddings are clustered.
+
+        Returns:
+            np.ndarray: Label of every document, -1 for outliers.
+        """
+        from hdbscan import HDBSCAN
+
+        if self.subsample_indices is None:
+            raise RuntimeError(
+                "MetricMapper has no subsample, sweep with subsample_size first."
+            )
+
+        reduced_embeddings = self.reduced_embeddings[run]
+        hdbscan = HDBSCAN(prediction_data=True, **configuration)
+        with profiler.stage("hdbscan.fit"):
+            hdbscan.fit(reduced_embeddings[self.subsample_indices])
+        return assign_labels(
+            hdbscan, reduced_embeddings, self.subsample_indices, self.assign_batch_size
+        )
+
+    def write_profile(self) -> None:
+        if not self.profile:
+            return
+        profiler.to_json(f"{self.out_dir}/profile.json")
+        profiler.to_trace(f"{self.out_dir}/profile_trace.json")
+
+    def save_state(self, state_dir: str) -> None:
+        """
+        Persists the embeddings and fitted UMAP reducers of the last run.
+
+        Args:
+            state_dir (str): Directory where the state is written.
+        """
+        path = Path(state_dir)
+        path.mkdir(parents=True, exist_ok=True)
+
+        np.save(path / "embeddings.npy", self.embeddings)
+        for i, reduced_embeddings in enumerate(self.reduced_embeddings):
+            np.save(path / f"reduced_embeddings_{i}.npy", reduced_embeddings)
+        if self.subsample_indices is not None:
+            np.save(path / "subsample_indices.npy", self.subsample_indices)
+        with open(path / "reducers.pkl", "wb") as file:
+            pickle.dump(self.reducers, file)
+        (path / "state.json").write_text(
+            json.dumps(
+                {
+                    "fitted_size": self.fitted_size,
+                    "runs": len(self.reduced_embeddings),
+                    "reduction_parameters": self.reduction_parameters,
+                }
+            )
+        )
+
+    def load_state(self, state_dir: str) -> None:
+        """
+        Restores the state written by `save_state`.
+
+        Args:
+            state_dir (str): Directory where the state was written.
+        """
+        path = Path(state_dir)
+        state = json.loads((path / "state.json").read_text())
+
+        self.embeddings = np.load(path / "embeddings.npy")
+        self.reduced_embeddings = [
+            np.load(path / f"reduced_embeddings_{i}.npy") for i in range(state["runs"])
+        ]
+        self.reduction_parameters = state.get(
+            "reduction_parameters", [{} for _ in range(state["runs"])]
+        )
+        if (path / "subsample_indices.npy").exists():
+            self.subsample_indices = np.load(path / "subsample_indices.npy")
+        with open(path / "reducers.pkl", "rb") as file:
+            self.reducers = pickle.load(file)
+        self.fitted_size = state["fitted_size"]
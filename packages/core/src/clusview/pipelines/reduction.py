@@ -0,0 +1,220 @@
+import hashlib
+import json
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from ..profiling.profiler import profiler
+
+
+def fingerprint(array: np.ndarray) -> str:
+    """
+    Short digest of the contents of an array, used to key cached reductions.
+    """
+    digest = hashlib.sha1(str((array.shape, array.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(array).view(np.uint8))
+    return digest.hexdigest()[:16]
+
+
+class UMAPSweep:
+    """
+    Sweeps UMAP hyperparameters, sharing as much work as possible across reductions.
+
+    UMAP runs in three stages: a k-nearest-neighbour graph, a fuzzy simplicial set
+    built from it, and the optimization of the low-dimensional layout. Only the first
+    two depend on `n_neighbors`, and only the last on `n_components` and `min_dist`.
+    The sweep therefore:
+
+    - computes the kNN graph once, for the largest `n_neighbors`, and slices its
+      columns for every smaller value, as neighbours come sorted by distance;
+    - builds one fuzzy graph per `n_neighbors`, shared by every `n_components` and
+      `min_dist`;
+    - optimizes one layout per configuration, caching it, along with the kNN graph, in
+      `cache_dir` when given, so that repeated and extended studies only compute the
+      reductions they have not seen yet.
+
+    Each layout matches `UMAP(n_neighbors, n_components, min_dist, metric,
+    random_state).fit_transform`, up to the nearest-neighbour search being approximate
+    on small datasets too.
+
+    Args:
+        n_neighbors (List[int]): Values of `n_neighbors` to sweep, `[15]` if `None`.
+        n_components (List[int]): Values of `n_components` to sweep, `[5]` if `None`.
+        min_dist (List[float]): Values of `min_dist` to sweep, `[0.0]` if `None`.
+        metric (str): Metric of the input embeddings.
+        cache_dir (str): Directory where reductions are cached. Not cached if `None`.
+
+    Examples:
+        >>> sweep = UMAPSweep(n_neighbors=[5, 15, 50], n_components=[2, 5], min_dist=[0.0, 0.1])
+        >>> for parameters, reduced_embeddings in sweep.reduce(embeddings, random_state=42):
+        ...     print(parameters, reduced_embeddings.shape)
+        {'n_neighbors': 5, 'n_components': 2, 'min_dist': 0.0} (10000, 2)
+        ...
+    """
+
+    parameter_names = ["n_neighbors", "n_components", "min_dist"]
+
+    def __init__(
+        self,
+        n_neighbors: List[int] = None,
+        n_components: List[int] = None,
+        min_dist: List[float] = None,
+        metric: str = "cosine",
+        cache_dir: str = None,
+    ) -> None:
+        self.n_neighbors = sorted(n_neighbors or [15])
+        self.n_components = list(n_components or [5])
+        self.min_dist = list(min_dist or [0.0])
+        self.metric = metric
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.n_neighbors) * len(self.n_components) * len(self.min_dist)
+
+    def configurations(self) -> Iterator[Dict[str, Any]]:
+        for n_neighbors, n_components, min_dist in product(
+            self.n_neighbors, self.n_components, self.min_dist
+        ):
+            yield {
+                "n_neighbors": n_neighbors,
+                "n_components": n_components,
+                "min_dist": min_dist,
+            }
+
+    def cache_path(self, key: Dict[str, Any]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        name = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+        return self.cache_dir / f"{key['stage']}_{name}.npz"
+
+    def nearest_neighbors(
+        self, embeddings: np.ndarray, digest: str, random_state: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbours of every point, and their distances, for the largest `n_neighbors`.
+        """
+        from sklearn.utils import check_random_state
+        from umap.umap_ import nearest_neighbors
+
+        path = self.cache_path(
+            {
+                "stage": "knn",
+                "embeddings": digest,
+                "n_neighbors": self.n_neighbors[-1],
+                "metric": self.metric,
+                "random_state": random_state,
+            }
+        )
+        if path is not None and path.exists():
+            with np.load(path) as cached:
+                return cached["indices"], cached["distances"]
+
+        with profiler.stage("umap.knn"):
+            knn_indices, knn_dists, _ = nearest_neighbors(
+                embeddings,
+                n_neighbors=self.n_neighbors[-1],
+                metric=self.metric,
+                metric_kwds={},
+                angular=False,
+                random_state=check_random_state(random_state),
+            )
+
+        if path is not None:
+            np.savez(path, indices=knn_indices, distances=knn_dists)
+        return knn_indices, knn_dists
+
+    def reduce(
+        self, embeddings: np.ndarray, random_state: int = None
+    ) -> Iterator[Tuple[Dict[str, Any], np.ndarray]]:
+        """
+        Reduces the embeddings with every configuration of the sweep.
+
+        Args:
+            embeddings (np.ndarray): Embeddings to reduce.
+            random_state (int): Seed shared by every reduction. Random if `None`.
+
+        Yields:
+            Tuple[Dict[str, Any], np.ndarray]: The parameters of each configuration
+            and the reduced embeddings.
+        """
+        from sklearn.utils import check_random_state
+        from umap.umap_ import (
+            find_ab_params,
+            fuzzy_simplicial_set,
+            simplicial_set_embedding,
+        )
+
+        if random_state is None:
+            random_state = int(np.random.randint(1, 2**31))
+
+        digest = fingerprint(embeddings)
+        knn_indices = knn_dists = None
+
+        for n_neighbors in self.n_neighbors:
+            graph = None
+            for n_components, min_dist in product(self.n_components, self.min_dist):
+                parameters = {
+                    "n_neighbors": n_neighbors,
+                    "n_components": n_components,
+                    "min_dist": min_dist,
+                }
+                path = self.cache_path(
+                    {
+                        "stage": "umap",
+                        "embeddings": digest,
+                        "metric": self.metric,
+                        "random_state": random_state,
+                        **parameters,
+                    }
+                )
+                if path is not None and path.exists():
+                    with np.load(path) as cached:
+                        embedding = cached["embedding"]
+                    yield parameters, embedding
+                    continue
+
+                if knn_indices is None:
+                    knn_indices, knn_dists = self.nearest_neighbors(
+                        embeddings, digest, random_state
+                    )
+                if graph is None:
+                    with profiler.stage("umap.fuzzy_graph"):
+                        graph = fuzzy_simplicial_set(
+                            embeddings,
+                            n_neighbors,
+                            check_random_state(random_state),
+                            self.metric,
+                            knn_indices=np.ascontiguousarray(
+                                knn_indices[:, :n_neighbors]
+                            ),
+                            knn_dists=np.ascontiguousarray(knn_dists[:, :n_neighbors]),
+                        )[0]
+
+                a, b = find_ab_params(1.0, min_dist)
+                with profiler.stage("umap.embedding"):
+                    embedding, _ = simplicial_set_embedding(
+                        embeddings,
+                        graph.copy(),
+                        n_components,
+                        initial_alpha=1.0,
+                        a=a,
+                        b=b,
+                        gamma=1.0,
+                        negative_sample_rate=5,
+                        n_epochs=500 if len(embeddings) <= 10_000 else 200,
+                        init="spectral",
+                        random_state=check_random_state(random_state),
+                        metric=self.metric,
+                        metric_kwds={},
+                        densmap=False,
+                        densmap_kwds={},
+                        output_dens=False,
+                    )
+
+                if path is not None:
+                    np.savez(path, embedding=embedding)
+                yield parameters, embedding
@@ -0,0 +1,108 @@
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from typing import Dict, List
+
+from ..metrics.base_metric import BaseMetric
+from ..profiling.profiler import profiler
+from ..storage.label_archive import LabelArchive
+from .execution_policy import ExecutionPolicy
+from .metric_mapper import measure_labels, write_metric_maps
+from .worker_pool import WorkerPool
+
+
+class Rescorer:
+    """
+    Computes metric maps from the label archives of a previous sweep, skipping the
+    clustering altogether.
+
+    Extending a study with new metrics only costs their computation: the stored labels
+    are streamed block by block through the worker pool and measured with any set of
+    `BaseMetric`s. Maps are written in the same format as `MetricMapper`'s, averaging
+    over the archives as `MetricMapper` averages over its runs.
+
+    Args:
+        archive_paths (List[str]): Label archives written by `MetricMapper` with
+            `archive_labels=True`, typically one per run.
+        metrics (Dict[str, BaseMetric]): Metrics to map, by name.
+        out_dir (str): Directory where the metric maps are written.
+        pool (WorkerPool): Pool in which the metrics are computed. If `None`, a pool
+            is created and shut down on every call to `run`.
+        execution_policy (ExecutionPolicy): Decides the processes and threads of the
+            pools created by the rescorer. Defaults to `ExecutionPolicy()`.
+
+    Examples:
+        >>> rescorer = Rescorer(["maps/labels_0.npz"], {"ClusterCount": ClusterCount()}, "maps")
+        >>> rescorer.run()
+    """
+
+    def __init__(
+        self,
+        archive_paths: List[str],
+        metrics: Dict[str, BaseMetric],
+        out_dir: str = "default",
+        pool: WorkerPool = None,
+        execution_policy: ExecutionPolicy = None,
+    ) -> None:
+        self.archive_paths = archive_paths
+        self.metrics = metrics
+        self.out_dir = out_dir
+        self.pool = pool
+        self.execution_policy = execution_policy or ExecutionPolicy()
+
+    def run(self):
+        import pandas as pd
+        from tqdm import tqdm
+
+        archives = [LabelArchive(path) for path in self.archive_paths]
+        sampler_names = archives[0].parameter_names
+
+        metric_maps = {
+            metric: pd.DataFrame(columns=sampler_names + [metric])
+            for metric in self.metrics
+        }
+
+        progress_bar = tqdm(
+            total=sum(len(archive) for archive in archives),
+            desc=Rescorer.__name__,
+        )
+
+        def add_metrics(parameters, future):
+            block_values = future.result()
+            with profiler.stage("bookkeeping"):
+                for row, sampler_values in enumerate(parameters):
+                    for metric in self.metrics:
+                        new_row = list(sampler_values) + [block_values[metric][row]]
+                        metric_maps[metric].loc[len(metric_maps[metric])] = new_row
+                progress_bar.update(len(parameters))
+
+        if self.pool is not None:
+            pool = self.pool
+        else:
+            processes, threads = self.execution_policy.plan(
+                len(archives[0].embeddings), sum(len(archive) for archive in archives)
+            )
+            pool = WorkerPool(max_workers=processes, threads_per_worker=threads)
+        pending = {}
+
+        for archive in archives:
+            embeddings = archive.embeddings
+            for parameters, labels in archive.iterate_blocks():
+                # Only a couple of blocks per worker are decoded at any time.
+                if len(pending) >= 2 * pool.max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future_result in done:
+                        add_metrics(pending.pop(future_result), future_result)
+                future_result = pool.submit(
+                    measure_labels, labels, embeddings, self.metrics
+                )
+                pending[future_result] = parameters
+
+        for future_result in as_completed(list(pending)):
+            add_metrics(pending.pop(future_result), future_result)
+
+        if self.pool is None:
+            pool.shutdown(wait=True)
+
+        with profiler.stage("write_maps"):
+            write_metric_maps(metric_maps, sampler_names, self.out_dir)
+
+        progress_bar.close()
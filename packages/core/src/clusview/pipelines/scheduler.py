@@ -0,0 +1,219 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from ..profiling.profiler import profiler
+from .worker_pool import WorkerPool
+
+PLACES = ("pool", "thread", "main")
+
+
+class Node:
+    """
+    A stage of the graph, see `Scheduler.add`.
+    """
+
+    def __init__(
+        self,
+        key: Hashable,
+        fn: Callable,
+        dependencies: Tuple[Hashable, ...],
+        args: tuple,
+        place: str,
+        on_done: Callable = None,
+    ) -> None:
+        self.key = key
+        self.fn = fn
+        self.dependencies = dependencies
+        self.args = args
+        self.place = place
+        self.on_done = on_done
+        self.dependents: List[Hashable] = []
+        # Length of the longest path from the node to a sink.
+        self.height = 0
+
+
+def stage_name(key: Hashable) -> str:
+    return str(key[0]) if isinstance(key, tuple) else str(key)
+
+
+class Scheduler:
+    """
+    Runs a dependency graph of stages, such as load → embed → reduce → sweep shards →
+    aggregate, keeping every core busy for the whole study.
+
+    Each node runs as soon as its dependencies are done, concurrently with every other
+    ready node, in one of three places:
+
+    - `pool`: a task of the shared `WorkerPool`, for CPU-bound stages (UMAP, HDBSCAN);
+    - `thread`: a thread of the main process, for stages holding resident state or
+      releasing the GIL (document loading, transformer encoding);
+    - `main`: inline in the scheduling loop, for cheap bookkeeping (aggregation).
+
+    Nodes are keyed, and adding a key that is already in the graph returns the existing
+    node, so that upstream stages shared by several branches, such as the embeddings of
+    a dataset reused by every seed, run once. At most `max_workers + prefetch` tasks
+    are handed to the pool at a time, and ready nodes are dispatched longest path to a
+    sink first: a reduction for the next seed goes ahead of the queued shards of the
+    current one, so its shards are ready by the time the current ones run out.
+
+    Results are passed to dependents and dropped once every dependent has started,
+    except for sinks, whose results `run` returns.
+
+    Args:
+        pool (WorkerPool): Pool running the `pool` nodes.
+        threads (int): Number of threads running the `thread` nodes.
+        prefetch (int): Number of pool tasks queued beyond one per worker, hiding the
+            IPC round trip between two tasks.
+
+    Examples:
+        >>> scheduler = Scheduler(pool)
+        >>> scheduler.add(("load", dataset), load, place="thread")
+        >>> scheduler.add(("embed", dataset), embed, ("load", dataset), place="thread")
+        >>> for seed in seeds:
+        ...     scheduler.add(("reduce", dataset, seed), reduce, ("embed", dataset), args=(seed,))
+        >>> results = scheduler.run()
+    """
+
+    def __init__(
+        self, pool: WorkerPool, threads: int = 1, prefetch: int = None
+    ) -> None:
+        self.pool = pool
+        self.threads = threads
+        self.prefetch = pool.max_workers if prefetch is None else prefetch
+        self.nodes: Dict[Hashable, Node] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.nodes
+
+    def add(
+        self,
+        key: Hashable,
+        fn: Callable,
+        *dependencies: Hashable,
+        args: tuple = (),
+        place: str = "pool",
+        on_done: Callable = None,
+    ) -> Hashable:
+        """
+        Adds a node computing `fn(*dependency_results, *args)`, unless `key` is already
+        in the graph.
+
+        Args:
+            key (Hashable): Identifier of the node, a tuple whose first item names its
+                stage in the profile.
+            fn (Callable): Function of the node. Must be picklable for `pool` nodes.
+            dependencies (Hashable): Keys of the nodes whose results `fn` receives
+                first, in order. They must already be in the graph.
+            args (tuple): Further arguments of `fn`.
+            place (str): Where the node runs, `pool`, `thread` or `main`.
+            on_done (Callable): Called in the scheduling loop with the result of the
+                node, e.g. to update a progress bar.
+
+        Returns:
+            Hashable: The key of the node.
+        """
+        if key in self.nodes:
+            return key
+        if place not in PLACES:
+            raise ValueError(f"Unknown place {place}, expected any of {PLACES}.")
+        missing = [dependency for dependency in dependencies if dependency not in self]
+        if missing:
+            raise KeyError(f"Dependencies {missing} of {key} are not in the graph.")
+
+        self.nodes[key] = Node(key, fn, tuple(dependencies), args, place, on_done)
+        for dependency in dependencies:
+            self.nodes[dependency].dependents.append(key)
+        return key
+
+    def compute_heights(self) -> None:
+        # Nodes are added after their dependencies, so reverse insertion order visits
+        # every node after all of its dependents.
+        for node in reversed(self.nodes.values()):
+            node.height = 1 + max(
+                (self.nodes[dependent].height for dependent in node.dependents),
+                default=0,
+            )
+
+    def run(self) -> Dict[Hashable, Any]:
+        """
+        Runs the whole graph.
+
+        Returns:
+            Dict[Hashable, Any]: Results of the sink nodes, those without dependents.
+
+        Raises:
+            RuntimeError: If a node fails. Nodes already running are left to finish,
+                and no further node is started.
+        """
+        self.compute_heights()
+
+        waiting = {key: len(node.dependencies) for key, node in self.nodes.items()}
+        consumers = {key: len(node.dependents) for key, node in self.nodes.items()}
+        ready = [key for key, remaining in waiting.items() if remaining == 0]
+        results: Dict[Hashable, Any] = {}
+        running: Dict[Future, Hashable] = {}
+        sinks = {}
+
+        def arguments(node: Node) -> tuple:
+            values = tuple(results[dependency] for dependency in node.dependencies)
+            for dependency in node.dependencies:
+                consumers[dependency] -= 1
+                if consumers[dependency] == 0:
+                    del results[dependency]
+            return values + node.args
+
+        def run_local(node: Node, *args: Any) -> Any:
+            with profiler.stage(stage_name(node.key)):
+                return node.fn(*args)
+
+        def complete(key: Hashable, result: Any) -> None:
+            node = self.nodes[key]
+            if node.on_done is not None:
+                node.on_done(result)
+            if node.dependents:
+                results[key] = result
+            else:
+                sinks[key] = result
+            for dependent in node.dependents:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+
+        pool_limit = self.pool.max_workers + self.prefetch
+        with ThreadPoolExecutor(max_workers=self.threads) as threads:
+            while ready or running:
+                ready.sort(key=lambda key: self.nodes[key].height)
+                in_pool = sum(
+                    self.nodes[key].place == "pool" for key in running.values()
+                )
+                deferred = []
+                while ready:
+                    key = ready.pop()
+                    node = self.nodes[key]
+                    if node.place == "main":
+                        complete(key, run_local(node, *arguments(node)))
+                        # Completing may have made nodes of any height ready.
+                        ready.sort(key=lambda key: self.nodes[key].height)
+                    elif node.place == "thread":
+                        future = threads.submit(run_local, node, *arguments(node))
+                        running[future] = key
+                    elif in_pool < pool_limit:
+                        running[self.pool.submit(node.fn, *arguments(node))] = key
+                        in_pool += 1
+                    else:
+                        deferred.append(key)
+                ready.extend(deferred)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as exception:
+                        threads.shutdown(wait=False, cancel_futures=True)
+                        raise RuntimeError(f"Stage {key} failed.") from exception
+                    complete(key, result)
+
+        return sinks
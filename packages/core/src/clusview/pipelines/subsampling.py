@@ -0,0 +1,150 @@
+from typing import TYPE_CHECKING, Dict
+
+import numpy as np
+
+from ..metrics.base_metric import BaseMetric
+from ..profiling.profiler import profiler
+
+if TYPE_CHECKING:
+    from hdbscan import HDBSCAN
+
+
+def stratified_subsample(
+    embeddings: np.ndarray, size: int, n_strata: int = 50, seed: int = None
+) -> np.ndarray:
+    """
+    Picks `size` points spread over the whole embedding space.
+
+    Points are partitioned into `n_strata` k-means strata, and each stratum contributes
+    in proportion to its size, so that small, dense regions, which may become clusters
+    of their own, are not missed by chance. Every stratum contributes at least one
+    point, and the shares are rounded with the largest remainder method so that
+    exactly `size` points are picked.
+
+    Args:
+        embeddings (np.ndarray): Embeddings to subsample.
+        size (int): Number of points to pick.
+        n_strata (int): Number of strata.
+        seed (int): Seed of the strata and of the sample.
+
+    Returns:
+        np.ndarray: Sorted indices of the picked points.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    if size >= len(embeddings):
+        return np.arange(len(embeddings))
+
+    strata = MiniBatchKMeans(
+        n_clusters=min(n_strata, size), random_state=seed, n_init=3
+    ).fit_predict(embeddings)
+
+    counts = np.bincount(strata)
+    shares = counts * size / len(embeddings)
+    allocation = np.clip(np.floor(shares).astype(np.int64), 1, counts)
+    # Points left over go to the largest remainders, and the excess of the one point
+    # granted to every stratum is taken back from the smallest.
+    order = np.argsort(np.floor(shares) - shares, kind="stable")
+    while allocation.sum() < size:
+        grown = order[allocation[order] < counts[order]]
+        allocation[grown[: size - allocation.sum()]] += 1
+    while allocation.sum() > size:
+        shrunk = order[::-1][allocation[order[::-1]] > 1]
+        allocation[shrunk[: allocation.sum() - size]] -= 1
+
+    rng = np.random.default_rng(seed)
+    indices = [
+        rng.choice(np.flatnonzero(strata == stratum), stratum_size, replace=False)
+        for stratum, stratum_size in enumerate(allocation)
+        if stratum_size
+    ]
+    return np.sort(np.concatenate(indices))
+
+
+def assign_labels(
+    hdbscan: "HDBSCAN",
+    embeddings: np.ndarray,
+    subsample_indices: np.ndarray,
+    batch_size: int = 100_000,
+) -> np.ndarray:
+    """
+    Extends the labels of an HDBSCAN fitted on a subsample to the whole corpus.
+
+    Subsampled points keep their labels, and the others are assigned with
+    `approximate_predict` in vectorised batches of `batch_size` points, which requires
+    the HDBSCAN to have been fitted with `prediction_data=True`.
+
+    Args:
+        hdbscan (HDBSCAN): HDBSCAN fitted on `embeddings[subsample_indices]`.
+        embeddings (np.ndarray): Embeddings of the whole corpus.
+        subsample_indices (np.ndarray): Indices of the subsample.
+        batch_size (int): Number of points assigned at once.
+
+    Returns:
+        np.ndarray: Labels of every point of the corpus, -1 for outliers.
+    """
+    from hdbscan import approximate_predict
+
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    labels[subsample_indices] = hdbscan.labels_
+
+    remaining = np.setdiff1d(np.arange(len(embeddings)), subsample_indices)
+    with profiler.stage("hdbscan.approximate_predict"):
+        for start in range(0, len(remaining), batch_size):
+            batch = remaining[start : start + batch_size]
+            labels[batch], _ = approximate_predict(hdbscan, embeddings[batch])
+
+    return labels
+
+
+def validate_subsample(
+    hdbscan: "HDBSCAN",
+    embeddings: np.ndarray,
+    subsample_indices: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    batch_size: int = 100_000,
+) -> Dict[str, float]:
+    """
+    Compares a configuration swept on a subsample with the same configuration fitted
+    on a larger validation slice of the corpus that contains the subsample.
+
+    Runs inside the pool workers: the configuration is fitted on the subsample, its
+    labels are extended to the slice with `assign_labels`, and it is fitted again on
+    the whole slice, which stands in for the corpus at a bounded cost.
+
+    Args:
+        hdbscan (HDBSCAN): Configuration to validate.
+        embeddings (np.ndarray): Embeddings of the validation slice.
+        subsample_indices (np.ndarray): Positions of the subsample in the slice.
+        metrics (Dict[str, BaseMetric]): Metrics to compare, by name.
+        batch_size (int): Number of points assigned at once.
+
+    Returns:
+        Dict[str, float]: The value of each metric on the subsample
+        (`<metric>_subsample`) and on the slice (`<metric>_slice`), and the adjusted
+        Rand index between the extended and the fully fitted labels of the slice.
+    """
+    from sklearn.base import clone
+    from sklearn.metrics import adjusted_rand_score
+
+    subsample = embeddings[subsample_indices]
+
+    hdbscan.prediction_data = True
+    with profiler.stage("hdbscan.fit"):
+        hdbscan.fit(subsample)
+    extended_labels = assign_labels(hdbscan, embeddings, subsample_indices, batch_size)
+
+    with profiler.stage("hdbscan.fit"):
+        slice_labels = (
+            clone(hdbscan).set_params(prediction_data=False).fit_predict(embeddings)
+        )
+
+    validation = {"adjusted_rand": adjusted_rand_score(slice_labels, extended_labels)}
+    for name, metric in metrics.items():
+        validation[f"{name}_subsample"] = float(
+            metric.perform_metric(clusters=hdbscan.labels_, embeddings=subsample)
+        )
+        validation[f"{name}_slice"] = float(
+            metric.perform_metric(clusters=slice_labels, embeddings=embeddings)
+        )
+    return validation
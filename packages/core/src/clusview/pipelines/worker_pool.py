@@ -0,0 +1,200 @@
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import cpu_count
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from ..profiling.profiler import PROFILE_ENV_FLAG, profiler
+from .execution_policy import limit_threads
+
+_startup_seconds = 0.0
+_startup_reported = False
+
+
+def warm_up_worker(warm_up: bool = True, threads_per_worker: int = None) -> None:
+    """
+    Initializer of the pool workers.
+
+    Pins the native thread pools of the worker, then pre-imports the clustering and
+    metric dependencies and runs them once on a tiny dataset, so that their
+    numba-compiled code is already JIT-compiled when the first task arrives.
+
+    Args:
+        warm_up (bool): Whether to pre-import and JIT-warm the dependencies.
+        threads_per_worker (int): Maximum threads per native thread pool, unlimited
+            if `None`.
+    """
+    global _startup_seconds
+
+    start = time.perf_counter()
+
+    if threads_per_worker is not None:
+        limit_threads(threads_per_worker)
+
+    if warm_up:
+        import numpy as np
+        from hdbscan import HDBSCAN
+
+        from ..metrics.davies_bouldin_score import DaviesBouldinScore
+        from ..metrics.silhouette_score import SilhouetteScore
+        from ..metrics.v_measure_score import VMeasureScore
+
+        embeddings = np.random.default_rng(0).normal(size=(64, 5))
+        labels = np.arange(64) % 2
+
+        HDBSCAN(min_cluster_size=5, min_samples=5).fit_predict(embeddings)
+        for metric in [
+            SilhouetteScore(),
+            DaviesBouldinScore(),
+            VMeasureScore(groundtruth_clusters=labels),
+        ]:
+            metric.perform_metric(clusters=labels, embeddings=embeddings)
+
+    # Forked workers inherit the records of the parent, which must not be sent back.
+    profiler.reset()
+    profiler.enabled = os.environ.get(PROFILE_ENV_FLAG) == "1"
+
+    _startup_seconds = time.perf_counter() - start
+
+
+def run_task(fn: Callable, args: tuple, kwargs: dict) -> tuple:
+    """
+    Runs a task inside a worker, timing it.
+
+    Returns:
+        tuple: The result of the task, the worker PID, the startup time of the worker
+        (only on its first task, `0` afterwards), the time spent on the task and the
+        profiling records of the task, if profiling is enabled.
+    """
+    global _startup_reported
+
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    busy_seconds = time.perf_counter() - start
+
+    startup_seconds = 0.0 if _startup_reported else _startup_seconds
+    _startup_reported = True
+
+    snapshot = None
+    if profiler.enabled:
+        if startup_seconds:
+            profiler.record("worker.startup", startup_seconds)
+        profiler.record("worker.task", busy_seconds)
+        snapshot = profiler.collect()
+
+    return result, os.getpid(), startup_seconds, busy_seconds, snapshot
+
+
+class WorkerPool:
+    """
+    Long-lived process pool, meant to be shared across every stage of a sweep.
+
+    Workers are started once, pre-import the heavy clustering and metric dependencies
+    and JIT-warm them, and are then reused for every run, seed and dataset, instead of
+    paying that cost on each new `ProcessPoolExecutor`.
+
+    The pool keeps track of how much time went into starting up the workers versus
+    running tasks, see `report`.
+
+    Args:
+        max_workers (int): Number of worker processes. Defaults to the CPU count.
+        warm_up (bool): Whether workers pre-import and JIT-warm their dependencies.
+        threads_per_worker (int): Threads each worker may use in its native thread
+            pools (numba, OpenBLAS, OpenMP), see `ExecutionPolicy`. Unlimited if `None`.
+
+    Examples:
+        >>> with WorkerPool() as pool:
+        ...     for dataset in datasets:
+        ...         mapper = MetricMapper(..., pool=pool)
+        ...         mapper.run()
+        ...     print(pool.report())
+        {'workers': 8, 'tasks': 19602, 'startup_seconds': 21.3, 'busy_seconds': 8402.1, ...}
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        warm_up: bool = True,
+        threads_per_worker: int = None,
+    ) -> None:
+        self.max_workers = max_workers or cpu_count()
+        self.threads_per_worker = threads_per_worker
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=warm_up_worker,
+            initargs=(warm_up, threads_per_worker),
+        )
+
+        self.created_at = time.perf_counter()
+        self.workers = set()
+        self.tasks = 0
+        self.startup_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.lock = Lock()
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """
+        Submits a task to the pool.
+
+        Returns:
+            Future: Future resolving to the result of `fn(*args, **kwargs)`.
+        """
+        future = Future()
+        submitted_at = time.perf_counter()
+
+        def resolve(worker_future: Future):
+            try:
+                result, pid, startup_seconds, busy_seconds, snapshot = (
+                    worker_future.result()
+                )
+            except BaseException as exception:
+                future.set_exception(exception)
+                return
+
+            if snapshot is not None:
+                profiler.merge(snapshot)
+                profiler.record(
+                    "pool.queue_and_ipc",
+                    time.perf_counter() - submitted_at - busy_seconds,
+                )
+
+            with self.lock:
+                self.workers.add(pid)
+                self.tasks += 1
+                self.startup_seconds += startup_seconds
+                self.busy_seconds += busy_seconds
+
+            future.set_result(result)
+
+        self.executor.submit(run_task, fn, args, kwargs).add_done_callback(resolve)
+        return future
+
+    def report(self) -> Dict[str, float]:
+        """
+        Summarizes where the time of the pool went.
+
+        Returns:
+            Dict[str, float]: Number of workers and tasks, total worker startup time,
+            total task time, wall time since the pool was created, and the fraction of
+            the available worker time spent on tasks.
+        """
+        with self.lock:
+            wall_seconds = time.perf_counter() - self.created_at
+            return {
+                "workers": len(self.workers),
+                "tasks": self.tasks,
+                "startup_seconds": self.startup_seconds,
+                "busy_seconds": self.busy_seconds,
+                "wall_seconds": wall_seconds,
+                "utilization": self.busy_seconds / (wall_seconds * self.max_workers),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown(wait=True)
@@ -0,0 +1,3 @@
+"""
+Instrumentation for timing and profiling pipeline stages.
+"""
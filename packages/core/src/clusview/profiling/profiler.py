@@ -0,0 +1,193 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+PROFILE_ENV_FLAG = "CLUSVIEW_PROFILE"
+
+
+def max_rss_bytes() -> int:
+    """
+    Memory high-water mark of the current process, `0` where it cannot be measured.
+    """
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes on Linux.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def empty_stats() -> Dict[str, float]:
+    return {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "max_rss_bytes": 0}
+
+
+class Profiler:
+    """
+    Records wall time, CPU time, memory high-water marks and call counts per stage.
+
+    Profiling is off by default and costs a single flag check per stage while off. It is
+    switched on with `enable`, or with the `CLUSVIEW_PROFILE=1` environment variable,
+    which `enable` also sets so that worker processes started afterwards profile too.
+
+    Worker processes hand their records back with `collect`, and the parent folds them
+    in with `merge`, so that the final figures cover the whole sweep.
+
+    Examples:
+        >>> profiler.enable()
+        >>> with profiler.stage("encode"):
+        ...     embeddings = transformer.encode(documents)
+        >>> profiler.stats["encode"]
+        {'calls': 1, 'wall_seconds': 41.2, 'cpu_seconds': 160.7, 'max_rss_bytes': 2147483648}
+        >>> profiler.to_json("profile.json")
+        >>> profiler.to_trace("profile_trace.json")
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.environ.get(PROFILE_ENV_FLAG) == "1"
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.events: list = []
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+        os.environ[PROFILE_ENV_FLAG] = "1"
+
+    def disable(self) -> None:
+        self.enabled = False
+        os.environ.pop(PROFILE_ENV_FLAG, None)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats = {}
+            self.events = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Context manager recording everything executed inside it under `name`.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start_timestamp = time.time()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.record(
+                name,
+                wall_seconds=time.perf_counter() - start_wall,
+                cpu_seconds=time.process_time() - start_cpu,
+                start_timestamp=start_timestamp,
+            )
+
+    def profiled(self, name: str) -> Callable:
+        """
+        Decorator recording every call of the decorated function under `name`.
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float = 0.0,
+        start_timestamp: float = None,
+    ) -> None:
+        """
+        Adds a single measurement of a stage.
+        """
+        if start_timestamp is None:
+            start_timestamp = time.time() - wall_seconds
+
+        with self.lock:
+            stats = self.stats.setdefault(name, empty_stats())
+            stats["calls"] += 1
+            stats["wall_seconds"] += wall_seconds
+            stats["cpu_seconds"] += cpu_seconds
+            stats["max_rss_bytes"] = max(stats["max_rss_bytes"], max_rss_bytes())
+
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start_timestamp * 1e6,
+                    "dur": wall_seconds * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Takes the records gathered so far, leaving the profiler empty.
+
+        Returns:
+            Dict[str, Any]: Snapshot to be `merge`d in another profiler.
+        """
+        with self.lock:
+            snapshot = {"stats": self.stats, "events": self.events}
+            self.stats = {}
+            self.events = []
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Folds in the records `collect`ed from another profiler, usually a worker's.
+        """
+        with self.lock:
+            for name, other in snapshot["stats"].items():
+                stats = self.stats.setdefault(name, empty_stats())
+                stats["calls"] += other["calls"]
+                stats["wall_seconds"] += other["wall_seconds"]
+                stats["cpu_seconds"] += other["cpu_seconds"]
+                stats["max_rss_bytes"] = max(
+                    stats["max_rss_bytes"], other["max_rss_bytes"]
+                )
+            self.events.extend(snapshot["events"])
+
+    def to_json(self, path: str) -> None:
+        """
+        Writes the aggregated statistics per stage, slowest stages first.
+        """
+        with self.lock:
+            stats = dict(
+                sorted(self.stats.items(), key=lambda item: -item[1]["wall_seconds"])
+            )
+        with open(path, "w") as file:
+            json.dump(stats, file, indent=2)
+
+    def to_trace(self, path: str) -> None:
+        """
+        Writes every recorded call in the Chrome trace event format, which can be
+        opened as a flame graph in Perfetto, speedscope or chrome://tracing.
+        """
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+profiler = Profiler()
@@ -0,0 +1,80 @@
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from ...profiling.profiler import profiler
+from ..parameters.base_parameter_sampler import BaseSampler
+from .base_cluster_sampler import BaseClusterSampler
+
+if TYPE_CHECKING:
+    from sklearn.cluster import AgglomerativeClustering
+
+# Sampled parameter cutting the tree, and the matching `fcluster` criterion.
+CUT_CRITERIA = {"n_clusters": "maxclust", "distance_threshold": "distance"}
+
+
+class AgglomerativeSampler(BaseClusterSampler):
+    """
+    Generates agglomerative clustering configurations by sampling parameters, and
+    sweeps them by cutting a single linkage tree.
+
+    The merge order of agglomerative clustering does not depend on where the tree is
+    cut, so `sweep` builds the linkage tree once and cuts it at every sampled
+    `n_clusters` or `distance_threshold`, each cut costing O(n). Any other sampled
+    parameter falls back to one fit per configuration.
+
+    The tree is built from all pairwise distances, in O(n²) memory, as
+    `AgglomerativeClustering` does without a connectivity matrix.
+
+    Args:
+        parameter_samplers (List[BaseSampler]): A single sampler, for either
+            `n_clusters` or `distance_threshold`.
+        linkage (str): Linkage criterion, `ward`, `complete`, `average` or `single`.
+
+    Examples:
+        >>> sampler = AgglomerativeSampler([LinearSampler("n_clusters", 2, 100, 99)])
+        >>> labels = sampler.sweep(reduced_embeddings)
+        >>> labels.shape
+        (99, 5120)
+    """
+
+    warm_started = True
+
+    def __init__(
+        self, parameter_samplers: List[BaseSampler], linkage: str = "ward"
+    ) -> None:
+        super().__init__(parameter_samplers)
+        self.linkage = linkage
+
+    def make_estimator(self) -> "AgglomerativeClustering":
+        from sklearn.cluster import AgglomerativeClustering
+
+        return AgglomerativeClustering(linkage=self.linkage)
+
+    def configure(self, combination: Tuple) -> "AgglomerativeClustering":
+        estimator = super().configure(combination)
+        # Exactly one of both may be set.
+        if "distance_threshold" in self.parameter_names:
+            estimator.n_clusters = None
+        return estimator
+
+    def sweep(self, embeddings: np.ndarray) -> np.ndarray:
+        if (
+            len(self.parameter_names) != 1
+            or self.parameter_names[0] not in CUT_CRITERIA
+        ):
+            return super().sweep(embeddings)
+
+        from scipy.cluster.hierarchy import fcluster, linkage
+
+        with profiler.stage("agglomerative.linkage"):
+            tree = linkage(embeddings, method=self.linkage, metric="euclidean")
+
+        criterion = CUT_CRITERIA[self.parameter_names[0]]
+        with profiler.stage("agglomerative.cut"):
+            return np.stack(
+                [
+                    fcluster(tree, value, criterion=criterion) - 1
+                    for (value,) in self.generate_combinations()
+                ]
+            )
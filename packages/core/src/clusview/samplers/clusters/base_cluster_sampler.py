@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from itertools import product
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+
+from ..parameters.base_parameter_sampler import BaseSampler
+
+
+class BaseClusterSampler(ABC):
+    """
+    Base class for all cluster samplers, which generate the configurations of a
+    clustering algorithm from the product of their parameter samplings.
+
+    Every configuration can be fitted on its own, see `iterate_configurations`, while
+    `sweep` clusters the whole sampling at once. Samplers of algorithms whose
+    configurations share work, such as a linkage tree or the centroids of a smaller k,
+    override `sweep` and set `warm_started`, so that the sweep is run as a single task.
+
+    Args:
+        parameter_samplers (List[BaseSampler]): Samplers of the algorithm parameters.
+    """
+
+    warm_started = False
+
+    def __init__(self, parameter_samplers: List[BaseSampler]) -> None:
+        self.parameter_samplers = parameter_samplers
+
+    @property
+    def parameter_names(self) -> List[str]:
+        return [sampler.parameter_name for sampler in self.parameter_samplers]
+
+    @abstractmethod
+    def make_estimator(self) -> Any:
+        """
+        Returns:
+            Any: A new estimator of the algorithm, with default parameters.
+        """
+
+    def generate_combinations(self) -> Iterator[Tuple]:
+        samplings = [sampler.sample_range() for sampler in self.parameter_samplers]
+
+        for combination in product(*samplings):
+            yield combination
+
+    def configure(self, combination: Tuple) -> Any:
+        estimator = self.make_estimator()
+        for config, value in zip(self.parameter_samplers, combination):
+            setattr(estimator, config.parameter_name, value)
+        return estimator
+
+    def iterate_configurations(self) -> Iterator[Any]:
+        for combination in self.generate_combinations():
+            yield self.configure(combination)
+
+    def sweep(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Clusters the embeddings with every configuration.
+
+        Returns:
+            np.ndarray: Labels of shape (configurations, documents), in the order of
+            `iterate_configurations`.
+        """
+        return np.stack(
+            [
+                estimator.fit_predict(embeddings)
+                for estimator in self.iterate_configurations()
+            ]
+        )
@@ -1,12 +1,12 @@
-from itertools import product
-from typing import List
+from typing import TYPE_CHECKING
 
-from hdbscan import HDBSCAN
+from .base_cluster_sampler import BaseClusterSampler
 
-from ..parameters.base_parameter_sampler import BaseSampler
+if TYPE_CHECKING:
+    from hdbscan import HDBSCAN
 
 
-class HDBSCANSampler:
+class HDBSCANSampler(BaseClusterSampler):
     """
     A class that generates configurations for HDBSCAN clustering algorithm by sampling parameters.
 
@@ -28,18 +28,7 @@ class HDBSCANSampler:
         ...     ...
     """
 
-    def __init__(self, parameter_samplers: List[BaseSampler]) -> None:
-        self.parameter_samplers = parameter_samplers
+    def make_estimator(self) -> "HDBSCAN":
+        from hdbscan import HDBSCAN
 
-    def generate_combinations(self):
-        samplings = [sampler.sample_range() for sampler in self.parameter_samplers]
-
-        for combination in product(*samplings):
-            yield combination
-
-    def iterate_configurations(self):
-        for combination in self.generate_combinations():
-            hdbscan = HDBSCAN()
-            for config, value in zip(self.parameter_samplers, combination):
-                setattr(hdbscan, config.parameter_name, value)
-            yield hdbscan
+        return HDBSCAN()
@@ -0,0 +1,102 @@
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+
+from ...profiling.profiler import profiler
+from ..parameters.base_parameter_sampler import BaseSampler
+from .base_cluster_sampler import BaseClusterSampler
+
+if TYPE_CHECKING:
+    from sklearn.cluster import KMeans
+
+
+def grow_centers(
+    embeddings: np.ndarray,
+    centers: np.ndarray,
+    n_clusters: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Extends a set of centroids to `n_clusters`, picking each new one k-means++ style,
+    with a probability proportional to its squared distance to the nearest centroid.
+
+    Returns:
+        np.ndarray: The given centroids followed by the new ones.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    centers = [np.asarray(center, dtype=np.float64) for center in centers]
+    if not centers:
+        centers.append(embeddings[rng.integers(len(embeddings))])
+
+    distances = np.min(
+        [((embeddings - center) ** 2).sum(axis=1) for center in centers], axis=0
+    )
+    while len(centers) < n_clusters:
+        total = distances.sum()
+        if total > 0:
+            index = rng.choice(len(embeddings), p=distances / total)
+        else:
+            index = rng.integers(len(embeddings))
+        centers.append(embeddings[index])
+        distances = np.minimum(distances, ((embeddings - centers[-1]) ** 2).sum(axis=1))
+
+    return np.stack(centers[:n_clusters])
+
+
+class KMeansSampler(BaseClusterSampler):
+    """
+    Generates KMeans configurations by sampling parameters, and sweeps them warm-started.
+
+    `sweep` fits the sampled `n_clusters` in increasing order, initialising each fit
+    with the centroids of the previous one plus k-means++ picks for the extra clusters,
+    so that every fit starts close to convergence instead of from scratch. A separate
+    chain is run for each combination of the other sampled parameters.
+
+    Args:
+        parameter_samplers (List[BaseSampler]): Samplers of the KMeans parameters, one
+            of them for `n_clusters`.
+        random_state (int): Seed of the k-means++ picks and of the estimators.
+
+    Examples:
+        >>> sampler = KMeansSampler([LinearSampler("n_clusters", 2, 100, 99)])
+        >>> labels = sampler.sweep(reduced_embeddings)
+        >>> labels.shape
+        (99, 5120)
+    """
+
+    warm_started = True
+
+    def __init__(
+        self, parameter_samplers: List[BaseSampler], random_state: int = 0
+    ) -> None:
+        super().__init__(parameter_samplers)
+        self.random_state = random_state
+
+    def make_estimator(self) -> "KMeans":
+        from sklearn.cluster import KMeans
+
+        return KMeans(n_init=1, random_state=self.random_state)
+
+    def sweep(self, embeddings: np.ndarray) -> np.ndarray:
+        if "n_clusters" not in self.parameter_names:
+            return super().sweep(embeddings)
+
+        k_axis = self.parameter_names.index("n_clusters")
+        combinations = list(self.generate_combinations())
+        chains: Dict[Tuple, List[int]] = {}
+        for index, combination in enumerate(combinations):
+            others = combination[:k_axis] + combination[k_axis + 1 :]
+            chains.setdefault(tuple(others), []).append(index)
+
+        rng = np.random.default_rng(self.random_state)
+        labels = np.empty((len(combinations), len(embeddings)), dtype=np.int64)
+        for chain in chains.values():
+            centers = np.empty((0, embeddings.shape[1]))
+            for index in sorted(chain, key=lambda index: combinations[index][k_axis]):
+                kmeans = self.configure(combinations[index])
+                kmeans.init = grow_centers(embeddings, centers, kmeans.n_clusters, rng)
+                kmeans.n_init = 1
+                with profiler.stage("kmeans.fit"):
+                    labels[index] = kmeans.fit_predict(embeddings)
+                centers = kmeans.cluster_centers_
+        return labels
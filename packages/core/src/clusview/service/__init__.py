@@ -0,0 +1,3 @@
+"""
+Long-running local service keeping sweep inputs resident and streaming results.
+"""
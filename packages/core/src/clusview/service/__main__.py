@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+
+from ..pipelines.worker_pool import WorkerPool
+from .server import Server
+from .workspace import Workspace
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Runs the local clusview service, see `clusview.service.server`."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument(
+        "--data-dir",
+        default=".",
+        help="Directory corpora are loaded from, no path may leave it.",
+    )
+    parser.add_argument(
+        "--allow-origin",
+        default=None,
+        help="Origin of the UI, allowed to make cross-origin requests.",
+    )
+    parser.add_argument(
+        "--trusted-model",
+        action="append",
+        default=[],
+        help="Model allowed to run the code of its repository, may be repeated.",
+    )
+    args = parser.parse_args()
+
+    with WorkerPool(max_workers=args.workers) as pool:
+        workspace = Workspace(
+            pool,
+            device=args.device,
+            data_dir=args.data_dir,
+            trusted_models=args.trusted_model,
+        )
+        server = Server(workspace, args.host, args.port, allow_origin=args.allow_origin)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
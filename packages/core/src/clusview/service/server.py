@@ -0,0 +1,250 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+from .workspace import Workspace
+
+REASONS = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+}
+
+CORS_HEADERS = (
+    "Access-Control-Allow-Origin: {origin}\r\n"
+    "Vary: Origin\r\n"
+    "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+    "Access-Control-Allow-Headers: Content-Type\r\n"
+)
+
+
+def route_method(segments: list) -> str | None:
+    """
+    Method served on a path, `None` for unknown paths.
+    """
+    if segments in (["corpora"], ["reductions"], ["sweeps"]):
+        return "POST"
+    if segments == ["health"]:
+        return "GET"
+    if len(segments) in (2, 3) and segments[0] == "sweeps":
+        if len(segments) == 2 or segments[2] in ("maps", "events"):
+            return "GET"
+    return None
+
+
+class Server:
+    """
+    Local HTTP API over a `Workspace`, streaming sweeps with server-sent events.
+
+    Built on asyncio streams alone, so that it needs no web framework. Every endpoint
+    takes and returns JSON, and request bodies must be sent as `application/json`, so
+    that web pages cannot post them without a CORS preflight. Cross-origin requests
+    are only allowed from `allow_origin`, the origin of the UI:
+
+    - `POST /corpora` with `path`, `columns` and `model` loads and embeds a corpus;
+    - `POST /reductions` with `corpus`, and optionally `n_neighbors`, `n_components`,
+      `min_dist` and `seed`, reduces it with UMAP;
+    - `POST /sweeps` with `reduction`, `parameters`, `metrics` and optionally
+      `block_size` starts a sweep, see `Workspace.start_sweep`;
+    - `GET /sweeps/<id>` returns the progress of a sweep;
+    - `GET /sweeps/<id>/maps` returns its partial metric maps;
+    - `GET /sweeps/<id>/events` streams a `configuration` event per measured
+      configuration, a `maps` event with the partial metric maps at most every
+      `snapshot_interval` seconds, and a final `done` event, or an `error` one if
+      the sweep fails.
+
+    Corpora and reductions stay resident, so requesting them again is immediate.
+
+    Args:
+        workspace (Workspace): Workspace holding the resident state.
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+        snapshot_interval (float): Minimum seconds between two partial map events.
+        allow_origin (str): Origin allowed to make cross-origin requests, such as
+            `"http://localhost:5173"`. Cross-origin requests are refused if `None`.
+
+    Examples:
+        >>> python -m clusview.service --port 8765 --data-dir corpora
+        $ curl -X POST localhost:8765/corpora -H "Content-Type: application/json" -d '{"path": "papers.csv", "columns": ["Title"], "model": "all-MiniLM-L6-v2"}'
+        {"corpus": "3f2a9c01b7de", "documents": 5120}
+        $ curl -N localhost:8765/sweeps/9be1c2d40a11/events
+        event: configuration
+        data: {"min_cluster_size": 40, "min_samples": 10, "SilhouetteScore": 0.43}
+    """
+
+    def __init__(
+        self,
+        workspace: Workspace,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        snapshot_interval: float = 0.5,
+        allow_origin: str = None,
+    ) -> None:
+        self.workspace = workspace
+        self.host = host
+        self.port = port
+        self.snapshot_interval = snapshot_interval
+        self.cors_headers = (
+            "" if allow_origin is None else CORS_HEADERS.format(origin=allow_origin)
+        )
+
+    async def serve_forever(self) -> None:
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"clusview service listening on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line.")
+        method, target, _ = request_line
+
+        headers = {}
+        while (line := (await reader.readline()).decode("latin-1").strip()) != "":
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+        return method, urlsplit(target).path.rstrip("/"), headers, body
+
+    async def respond(
+        self, writer: asyncio.StreamWriter, status: int, payload: Any = None
+    ) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode()
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"{self.cors_headers}"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+
+    async def send_event(
+        self, writer: asyncio.StreamWriter, event: str, payload: Any
+    ) -> None:
+        writer.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode())
+        await writer.drain()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            try:
+                method, path, headers, body = await self.read_request(reader)
+                content_type = headers.get("content-type", "").partition(";")[0]
+                # Other content types are sent cross-origin without a preflight.
+                if (method == "POST" or body) and (
+                    content_type.strip().lower() != "application/json"
+                ):
+                    await self.respond(
+                        writer, 415, {"error": "Expected an application/json body."}
+                    )
+                    return
+                body = json.loads(body) if body else {}
+                await self.route(writer, method, path.split("/")[1:], body)
+            except (ValueError, TypeError, json.JSONDecodeError) as exception:
+                await self.respond(writer, 400, {"error": str(exception)})
+            except KeyError as exception:
+                await self.respond(writer, 404, {"error": f"Unknown {exception}."})
+            except ConnectionError:
+                pass
+            except Exception as exception:
+                await self.respond(writer, 500, {"error": repr(exception)})
+        finally:
+            writer.close()
+
+    async def route(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        segments: list,
+        body: Dict[str, Any],
+    ) -> None:
+        workspace = self.workspace
+        allowed = route_method(segments)
+
+        if allowed is None:
+            await self.respond(writer, 404, {"error": "No route."})
+        elif method == "OPTIONS":
+            await self.respond(writer, 204)
+        elif method != allowed:
+            await self.respond(writer, 405, {"error": f"Expected {allowed}."})
+        elif segments == ["health"]:
+            await self.respond(writer, 200, {"status": "ok", **workspace.pool.report()})
+        elif segments == ["corpora"]:
+            corpus_id = await workspace.load_corpus(
+                body["path"], body.get("columns", []), body["model"]
+            )
+            embeddings = await workspace.embeddings[corpus_id]
+            await self.respond(
+                writer, 200, {"corpus": corpus_id, "documents": len(embeddings)}
+            )
+        elif segments == ["reductions"]:
+            reduction_id = await workspace.reduce(
+                body["corpus"],
+                n_neighbors=body.get("n_neighbors", 15),
+                n_components=body.get("n_components", 5),
+                min_dist=body.get("min_dist", 0.0),
+                seed=body.get("seed", 42),
+            )
+            await self.respond(writer, 200, {"reduction": reduction_id})
+        elif segments == ["sweeps"]:
+            sweep = await workspace.start_sweep(
+                body["reduction"],
+                body["parameters"],
+                body["metrics"],
+                block_size=body.get("block_size", 1),
+            )
+            await self.respond(writer, 200, sweep.status())
+        elif segments[0] == "sweeps" and len(segments) == 2:
+            await self.respond(writer, 200, workspace.sweeps[segments[1]].status())
+        elif segments[0] == "sweeps" and segments[2] == "maps":
+            sweep = workspace.sweeps[segments[1]]
+            await self.respond(writer, 200, await asyncio.to_thread(sweep.partial_maps))
+        elif segments[0] == "sweeps" and segments[2] == "events":
+            await self.stream_events(writer, segments[1])
+
+    async def stream_events(self, writer: asyncio.StreamWriter, sweep_id: str) -> None:
+        sweep = self.workspace.sweeps[sweep_id]
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: text/event-stream\r\n"
+                "Cache-Control: no-cache\r\n"
+                f"{self.cors_headers}"
+                "Connection: close\r\n\r\n"
+            ).encode()
+        )
+
+        # The status line is sent, so failures are reported as events of the stream.
+        try:
+            last_snapshot = 0.0
+            async for result in sweep.follow():
+                await self.send_event(writer, "configuration", result)
+                if time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    last_snapshot = time.monotonic()
+                    maps = await asyncio.to_thread(sweep.partial_maps)
+                    await self.send_event(writer, "maps", maps)
+
+            await self.send_event(
+                writer, "maps", await asyncio.to_thread(sweep.partial_maps)
+            )
+            await self.send_event(writer, "done", sweep.status())
+        except ConnectionError:
+            raise
+        except Exception as exception:
+            await self.send_event(writer, "error", {"error": repr(exception)})
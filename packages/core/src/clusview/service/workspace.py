@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import json
+from itertools import product
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List
+
+import numpy as np
+
+from ..loaders.documents.csv_concatenator import CSVConcatenator
+from ..metrics.average_cluster_size import AverageClusterSize
+from ..metrics.base_metric import BaseMetric
+from ..metrics.cluster_count import ClusterCount
+from ..metrics.davies_bouldin_score import DaviesBouldinScore
+from ..metrics.outlier_ratio import OutlierRatio
+from ..metrics.silhouette_score import SilhouetteScore
+from ..pipelines.metric_mapper import cluster_and_measure
+from ..pipelines.reduction import UMAPSweep
+from ..pipelines.worker_pool import WorkerPool
+from ..samplers.clusters.hdsbcan_sampler import HDBSCANSampler
+from ..samplers.parameters.geometric_sampler import GeometricSampler
+from ..samplers.parameters.linear_sampler import LinearSampler
+
+if TYPE_CHECKING:
+    from hdbscan import HDBSCAN
+    from sentence_transformers import SentenceTransformer
+
+METRICS = {
+    "SilhouetteScore": SilhouetteScore,
+    "DaviesBouldinScore": DaviesBouldinScore,
+    "OutlierRatio": OutlierRatio,
+    "ClusterCount": ClusterCount,
+    "AverageClusterSize": AverageClusterSize,
+}
+
+SAMPLERS = {"linear": LinearSampler, "geometric": GeometricSampler}
+
+
+def request_key(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def plain(value: Any) -> Any:
+    """Converts numpy scalars to their Python equivalent, for JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+async def iterate_sweep(
+    pool: WorkerPool,
+    configurations: List["HDBSCAN"],
+    parameter_names: List[str],
+    embeddings: np.ndarray,
+    metrics: Dict[str, BaseMetric],
+    block_size: int = 1,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Sweeps HDBSCAN configurations in the pool, yielding each one as soon as it is
+    measured.
+
+    Configurations are submitted in blocks of `block_size`, in the given order, and
+    yielded in completion order.
+
+    Yields:
+        Dict[str, Any]: The parameters and metric values of a configuration, by name.
+    """
+
+    async def measure(block: List["HDBSCAN"]) -> tuple:
+        future = pool.submit(cluster_and_measure, block, embeddings, metrics)
+        return block, await asyncio.wrap_future(future)
+
+    tasks = [
+        asyncio.ensure_future(measure(configurations[start : start + block_size]))
+        for start in range(0, len(configurations), block_size)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            block, metric_values = await next_done
+            for row, hdbscan in enumerate(block):
+                result = {
+                    name: plain(getattr(hdbscan, name)) for name in parameter_names
+                }
+                for metric in metrics:
+                    result[metric] = float(metric_values[metric][row])
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class Sweep:
+    """
+    A sweep running in the background, whose results can be followed while it runs.
+
+    Args:
+        sweep_id (str): Identifier of the sweep.
+        parameter_names (List[str]): Swept HDBSCAN parameters.
+        metric_names (List[str]): Measured metrics.
+        total (int): Number of configurations.
+    """
+
+    def __init__(
+        self,
+        sweep_id: str,
+        parameter_names: List[str],
+        metric_names: List[str],
+        total: int,
+    ) -> None:
+        self.sweep_id = sweep_id
+        self.parameter_names = parameter_names
+        self.metric_names = metric_names
+        self.total = total
+        self.results: List[Dict[str, Any]] = []
+        self.error: str = None
+        self.done = False
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sweep": self.sweep_id,
+            "parameters": self.parameter_names,
+            "metrics": self.metric_names,
+            "completed": len(self.results),
+            "total": self.total,
+            "done": self.done,
+            "error": self.error,
+        }
+
+    async def run(self, results: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for result in results:
+                async with self.changed:
+                    self.results.append(result)
+                    self.changed.notify_all()
+        except Exception as exception:
+            self.error = repr(exception)
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields every result of the sweep, those already in and then those to come,
+        until the sweep is done.
+        """
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(
+                    lambda: len(self.results) > sent or self.done
+                )
+                pending = self.results[sent:]
+                done = self.done
+            for result in pending:
+                yield result
+            sent += len(pending)
+            if done and sent == len(self.results):
+                return
+
+    def partial_maps(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Metric maps of the configurations measured so far, interpolated over the whole
+        grid, with `None` outside the convex hull of the measured configurations.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: For each metric, its hyperparameters, the
+            values of the first grid cell, and the nested list of map values. Empty
+            until enough configurations are in to interpolate.
+        """
+        import polars as pl
+
+        from ..metrics.metric_maps import MetricMap
+
+        if len(self.results) <= len(self.parameter_names):
+            return {}
+
+        sampling = pl.DataFrame(self.results)
+        maps = {}
+        for metric in self.metric_names:
+            try:
+                metric_map = MetricMap(
+                    sampling.select(self.parameter_names + [metric])
+                    .group_by(self.parameter_names)
+                    .agg(pl.col(metric).mean())
+                )
+            except Exception:
+                # Qhull cannot triangulate the first, possibly collinear, samples.
+                continue
+            mapping = metric_map.mapping
+            maps[metric] = {
+                "hyperparameters": metric_map.hyperparameters,
+                "origin": [plain(value) for value in metric_map.origin],
+                "coordinates": [
+                    [plain(value) for value in axis] for axis in metric_map.coordinates
+                ],
+                "mapping": np.where(np.isnan(mapping), None, mapping).tolist(),
+            }
+        return maps
+
+
+class Workspace:
+    """
+    Documents, embeddings and reductions kept in memory between requests.
+
+    Every stage is keyed by its inputs, so that repeated requests, and concurrent
+    requests for the same inputs, share a single computation. Embedding and reduction
+    run in threads, off the event loop, and sweeps in a warm `WorkerPool`.
+
+    Corpora are only read from `data_dir`, and models only run their own code when
+    listed in `trusted_models`, as requests may come from any local client.
+
+    Args:
+        pool (WorkerPool): Pool in which sweeps run. A new pool if `None`.
+        device (str): Device the transformers encode on.
+        data_dir (str): Directory corpus paths are resolved in, and may not leave.
+        trusted_models (List[str]): Models allowed to run the code of their
+            repository, e.g. for custom architectures.
+
+    Examples:
+        >>> workspace = Workspace()
+        >>> corpus = await workspace.load_corpus("papers.csv", ["Title", "Abstract"], "all-MiniLM-L6-v2")
+        >>> reduction = await workspace.reduce(corpus, seed=42)
+        >>> sweep = await workspace.start_sweep(reduction, parameters, ["SilhouetteScore"])
+        >>> async for result in sweep.follow():
+        ...     print(result)
+        {'min_cluster_size': 40, 'min_samples': 10, 'SilhouetteScore': 0.43}
+    """
+
+    def __init__(
+        self,
+        pool: WorkerPool = None,
+        device: str = "cpu",
+        data_dir: str = ".",
+        trusted_models: List[str] = None,
+    ) -> None:
+        self.pool = pool or WorkerPool()
+        self.device = device
+        self.data_dir = Path(data_dir).resolve()
+        self.trusted_models = set(trusted_models or [])
+        self.transformers: Dict[str, "SentenceTransformer"] = {}
+        self.embeddings: Dict[str, asyncio.Future] = {}
+        self.reductions: Dict[str, asyncio.Future] = {}
+        self.sweeps: Dict[str, Sweep] = {}
+
+    def transformer(self, model: str) -> "SentenceTransformer":
+        if model not in self.transformers:
+            from sentence_transformers import SentenceTransformer
+
+            self.transformers[model] = SentenceTransformer(
+                model, trust_remote_code=model in self.trusted_models
+            )
+        return self.transformers[model]
+
+    def resolve_path(self, path: str) -> Path:
+        """
+        Raises:
+            ValueError: If the path leads outside `data_dir`.
+        """
+        resolved = (self.data_dir / path).resolve()
+        if not resolved.is_relative_to(self.data_dir):
+            raise ValueError(f"Path '{path}' is outside the data directory.")
+        return resolved
+
+    async def load_corpus(self, path: str, columns: List[str], model: str) -> str:
+        """
+        Loads and embeds a CSV corpus, unless it is already resident.
+
+        Returns:
+            str: Identifier of the corpus.
+        """
+        resolved = self.resolve_path(path)
+        corpus_id = request_key(str(resolved), columns, model)
+
+        def embed() -> np.ndarray:
+            documents = CSVConcatenator(str(resolved), columns).load_documents()
+            return self.transformer(model).encode(documents, device=self.device)
+
+        if corpus_id not in self.embeddings:
+            self.embeddings[corpus_id] = asyncio.ensure_future(asyncio.to_thread(embed))
+        try:
+            await self.embeddings[corpus_id]
+        except Exception:
+            del self.embeddings[corpus_id]
+            raise
+        return corpus_id
+
+    async def reduce(
+        self,
+        corpus_id: str,
+        n_neighbors: int = 15,
+        n_components: int = 5,
+        min_dist: float = 0.0,
+        seed: int = 42,
+    ) -> str:
+        """
+        Reduces a resident corpus with UMAP, unless the reduction is already resident.
+
+        Returns:
+            str: Identifier of the reduction.
+        """
+        embeddings = await self.embeddings[corpus_id]
+        reduction_id = request_key(corpus_id, n_neighbors, n_components, min_dist, seed)
+
+        def reduce() -> np.ndarray:
+            sweep = UMAPSweep([n_neighbors], [n_components], [min_dist])
+            [(_, reduced_embeddings)] = sweep.reduce(embeddings, random_state=seed)
+            return reduced_embeddings
+
+        if reduction_id not in self.reductions:
+            self.reductions[reduction_id] = asyncio.ensure_future(
+                asyncio.to_thread(reduce)
+            )
+        try:
+            await self.reductions[reduction_id]
+        except Exception:
+            del self.reductions[reduction_id]
+            raise
+        return reduction_id
+
+    async def start_sweep(
+        self,
+        reduction_id: str,
+        parameters: List[Dict[str, Any]],
+        metrics: List[str],
+        block_size: int = 1,
+        seed: int = 0,
+    ) -> Sweep:
+        """
+        Starts sweeping HDBSCAN configurations over a resident reduction.
+
+        Configurations are submitted in a random order, so that the partial maps cover
+        the whole grid, coarsely at first, within the first few results.
+
+        Args:
+            reduction_id (str): Identifier of the reduction to cluster.
+            parameters (List[Dict[str, Any]]): Swept parameters, each with a `name`, a
+                `min`, a `max`, a number of `samples` and a `sampler`, either `linear`
+                (default) or `geometric`.
+            metrics (List[str]): Names of the metrics to measure, see `METRICS`.
+            block_size (int): Number of configurations per pool task.
+            seed (int): Seed of the submission order.
+
+        Returns:
+            Sweep: The running sweep.
+        """
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown:
+            raise ValueError(
+                f"Unknown metrics {unknown}, expected any of {list(METRICS)}."
+            )
+
+        embeddings = await self.reductions[reduction_id]
+        sampler = HDBSCANSampler(
+            [
+                SAMPLERS[parameter.get("sampler", "linear")](
+                    parameter["name"],
+                    parameter["min"],
+                    parameter["max"],
+                    parameter["samples"],
+                )
+                for parameter in parameters
+            ]
+        )
+        parameter_names = [parameter["name"] for parameter in parameters]
+
+        configurations = list(sampler.iterate_configurations())
+        order = np.random.default_rng(seed).permutation(len(configurations))
+        configurations = [configurations[index] for index in order]
+
+        sweep_id = request_key(reduction_id, parameters, metrics, len(self.sweeps))
+        sweep = Sweep(sweep_id, parameter_names, list(metrics), len(configurations))
+        sweep.task = asyncio.ensure_future(
+            sweep.run(
+                iterate_sweep(
+                    self.pool,
+                    configurations,
+                    parameter_names,
+                    embeddings,
+                    {metric: METRICS[metric]() for metric in metrics},
+                    block_size,
+                )
+            )
+        )
+        self.sweeps[sweep_id] = sweep
+        return sweep
@@ -0,0 +1,3 @@
+"""
+Compact on-disk storage for sweep artifacts.
+"""
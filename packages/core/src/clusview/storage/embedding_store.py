@@ -0,0 +1,315 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# int8 codes span [-INT8_LEVELS, INT8_LEVELS], keeping the code range symmetric.
+INT8_LEVELS = 127
+
+
+def quantize(
+    embeddings: np.ndarray, offsets: np.ndarray, scales: np.ndarray
+) -> np.ndarray:
+    codes = np.rint((embeddings - offsets) / scales)
+    return np.clip(codes, -INT8_LEVELS, INT8_LEVELS).astype(np.int8)
+
+
+class EmbeddingStore:
+    """
+    Embeddings stored in reduced precision in a memory-mapped file.
+
+    Vectors are kept as `float16`, halving their size, or as `int8` codes with a
+    scale and an offset per dimension, quartering it. Reads dequantise to `float32`
+    chunk by chunk, so that the full-precision array only ever exists where it is
+    consumed, e.g. inside the worker fitting UMAP, never in the parent holding the
+    embeddings of every model. Stores pickle as their path, so handing one to a pool
+    task costs nothing and workers read from the shared page cache.
+
+    Use `quality` to check how much a precision degrades the embeddings.
+
+    Args:
+        directory (str): Directory of a store written with `from_array` or `encode`.
+
+    Examples:
+        >>> store = EmbeddingStore.encode("stores/gte", transformer, documents, "int8")
+        >>> store.nbytes / (len(store) * store.n_dimensions * 4)
+        0.25
+        >>> reduced_embeddings = UMAP(...).fit_transform(store.dequantize())
+        >>> store.quality(transformer.encode(documents[:1000]), np.arange(1000))
+        {'max_abs_error': 0.0041, 'mean_cosine': 0.99996, 'recall@10': 0.97}
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        meta = json.loads((self.directory / "meta.json").read_text())
+        self.precision: str = meta["precision"]
+        self.codes = np.load(self.directory / "embeddings.npy", mmap_mode="r")
+        self.offsets: np.ndarray = None
+        self.scales: np.ndarray = None
+        if self.precision == "int8":
+            self.offsets = np.load(self.directory / "offsets.npy")
+            self.scales = np.load(self.directory / "scales.npy")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"directory": str(self.directory)}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["directory"])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_dimensions(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def __getitem__(self, index: Any) -> np.ndarray:
+        """
+        Dequantised rows, for any numpy index over the documents.
+        """
+        rows = np.asarray(self.codes[index], dtype=np.float32)
+        if self.precision == "int8":
+            rows = rows * self.scales + self.offsets
+        return rows
+
+    def chunks(self, chunk_size: int = 65_536) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields the start of each chunk of documents and its dequantised embeddings.
+        """
+        for start in range(0, len(self), chunk_size):
+            yield start, self[start : start + chunk_size]
+
+    def dequantize(
+        self, out: np.ndarray = None, chunk_size: int = 65_536
+    ) -> np.ndarray:
+        """
+        Dequantises the whole store into a `float32` array, chunk by chunk, so that no
+        intermediate full-size array is allocated.
+
+        Args:
+            out (np.ndarray): Array to write into, allocated if `None`.
+            chunk_size (int): Number of documents dequantised at once.
+
+        Returns:
+            np.ndarray: The embeddings, of shape (documents, dimensions).
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=np.float32)
+        for start, chunk in self.chunks(chunk_size):
+            out[start : start + len(chunk)] = chunk
+        return out
+
+    def quality(
+        self,
+        reference: np.ndarray,
+        indices: np.ndarray,
+        k: int = 10,
+        chunk_size: int = 65_536,
+    ) -> Dict[str, float]:
+        """
+        Compares some stored embeddings with their full-precision originals.
+
+        Args:
+            reference (np.ndarray): Full-precision embeddings of the sampled documents.
+            indices (np.ndarray): Indices of the sampled documents in the store.
+            k (int): Number of nearest neighbours compared.
+            chunk_size (int): Number of documents searched at once.
+
+        Returns:
+            Dict[str, float]: The largest absolute error of any component, the mean
+            cosine similarity between stored and original vectors, and the mean
+            fraction of the `k` nearest cosine neighbours of each sample, among the
+            samples, that the stored vectors retrieve (`recall@k`).
+        """
+        reference = np.asarray(reference, dtype=np.float32)
+        stored = self[np.asarray(indices)]
+        max_abs_error = float(np.abs(stored - reference).max())
+
+        def normalized(vectors: np.ndarray) -> np.ndarray:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+        reference, stored = normalized(reference), normalized(stored)
+        k = min(k, len(reference) - 1)
+
+        recall = []
+        for start in range(0, len(reference) if k > 0 else 0, chunk_size):
+            stop = start + chunk_size
+            true_similarities = reference[start:stop] @ reference.T
+            stored_similarities = stored[start:stop] @ stored.T
+            for similarities in (true_similarities, stored_similarities):
+                # A document is not its own neighbour.
+                rows = np.arange(len(similarities))
+                similarities[rows, rows + start] = -np.inf
+            true_neighbours = np.argpartition(-true_similarities, k, axis=1)[:, :k]
+            found_neighbours = np.argpartition(-stored_similarities, k, axis=1)[:, :k]
+            recall.extend(
+                len(np.intersect1d(true_row, found_row)) / k
+                for true_row, found_row in zip(true_neighbours, found_neighbours)
+            )
+
+        return {
+            "max_abs_error": max_abs_error,
+            "mean_cosine": float((reference * stored).sum(axis=1).mean()),
+            f"recall@{k}": float(np.mean(recall)) if recall else 1.0,
+        }
+
+    @classmethod
+    def create(
+        cls,
+        directory: str,
+        n_documents: int,
+        n_dimensions: int,
+        precision: str,
+        offsets: np.ndarray = None,
+        scales: np.ndarray = None,
+    ) -> np.ndarray:
+        if precision not in PRECISIONS:
+            raise ValueError(
+                f"Unknown precision {precision}, expected any of {PRECISIONS}."
+            )
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "meta.json").write_text(json.dumps({"precision": precision}))
+        if precision == "int8":
+            np.save(path / "offsets.npy", offsets.astype(np.float32))
+            np.save(path / "scales.npy", scales.astype(np.float32))
+        return np.lib.format.open_memmap(
+            path / "embeddings.npy",
+            mode="w+",
+            dtype=np.dtype(precision),
+            shape=(n_documents, n_dimensions),
+        )
+
+    @classmethod
+    def from_array(
+        cls,
+        directory: str,
+        embeddings: np.ndarray,
+        precision: str = "int8",
+        chunk_size: int = 65_536,
+    ) -> "EmbeddingStore":
+        """
+        Stores an array, possibly itself memory-mapped, in reduced precision.
+
+        The `int8` scales and offsets map the range of each dimension over the whole
+        array onto the codes.
+
+        Args:
+            directory (str): Directory of the store, created if needed.
+            embeddings (np.ndarray): Embeddings of shape (documents, dimensions).
+            precision (str): `float16`, `int8`, or `float32` to only memory-map them.
+            chunk_size (int): Number of documents converted at once.
+
+        Returns:
+            EmbeddingStore: The new store.
+        """
+        offsets = scales = None
+        if precision == "int8":
+            low = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+            high = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+            for start in range(0, len(embeddings), chunk_size):
+                chunk = embeddings[start : start + chunk_size]
+                low = np.minimum(low, chunk.min(axis=0))
+                high = np.maximum(high, chunk.max(axis=0))
+            offsets, scales = range_quantization(low, high)
+
+        codes = cls.create(
+            directory, *embeddings.shape, precision, offsets=offsets, scales=scales
+        )
+        for start in range(0, len(embeddings), chunk_size):
+            chunk = np.asarray(embeddings[start : start + chunk_size], dtype=np.float32)
+            codes[start : start + len(chunk)] = (
+                quantize(chunk, offsets, scales) if precision == "int8" else chunk
+            )
+        codes.flush()
+        del codes
+        return cls(directory)
+
+    @classmethod
+    def encode(
+        cls,
+        directory: str,
+        transformer: Any,
+        documents: List[str],
+        precision: str = "int8",
+        batch_size: int = 8_192,
+        calibration_size: int = 8_192,
+        **encode_kwargs: Any,
+    ) -> "EmbeddingStore":
+        """
+        Encodes documents straight into a store, one batch at a time, so that the
+        full-precision embeddings of the corpus are never held at once.
+
+        The `int8` ranges are calibrated on the first `calibration_size` documents,
+        widened by a tenth, and later values beyond them are clipped.
+
+        Args:
+            directory (str): Directory of the store, created if needed.
+            transformer (SentenceTransformer): Model encoding the documents.
+            documents (List[str]): Documents to encode.
+            precision (str): `float16`, `int8`, or `float32` to only memory-map them.
+            batch_size (int): Number of documents encoded and stored at once.
+            calibration_size (int): Number of documents calibrating the `int8` ranges.
+            encode_kwargs: Any other argument of `transformer.encode`.
+
+        Returns:
+            EmbeddingStore: The new store.
+        """
+
+        def encode(batch: List[str]) -> np.ndarray:
+            return np.asarray(
+                transformer.encode(batch, **encode_kwargs), dtype=np.float32
+            )
+
+        first = encode(documents[: max(batch_size, calibration_size)])
+        offsets = scales = None
+        if precision == "int8":
+            low, high = first.min(axis=0), first.max(axis=0)
+            margin = (high - low) * 0.05
+            offsets, scales = range_quantization(low - margin, high + margin)
+
+        codes = cls.create(
+            directory,
+            len(documents),
+            first.shape[1],
+            precision,
+            offsets=offsets,
+            scales=scales,
+        )
+
+        def store(start: int, embeddings: np.ndarray) -> None:
+            codes[start : start + len(embeddings)] = (
+                quantize(embeddings, offsets, scales)
+                if precision == "int8"
+                else embeddings
+            )
+
+        store(0, first)
+        for start in range(len(first), len(documents), batch_size):
+            store(start, encode(documents[start : start + batch_size]))
+        codes.flush()
+        del codes
+        return cls(directory)
+
+
+def range_quantization(
+    low: np.ndarray, high: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Offsets and scales mapping `[low, high]`, per dimension, onto the `int8` codes.
+    """
+    offsets = (high + low) / 2
+    scales = np.maximum((high - low) / (2 * INT8_LEVELS), np.finfo(np.float32).tiny)
+    return offsets.astype(np.float32), scales.astype(np.float32)
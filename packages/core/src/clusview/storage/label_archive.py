@@ -0,0 +1,199 @@
+import json
+import zipfile
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+
+def smallest_label_dtype(labels: np.ndarray) -> np.dtype:
+    """
+    Smallest signed integer dtype able to hold `labels` and the differences between
+    any two of its values.
+
+    Examples:
+        >>> smallest_label_dtype(np.array([-1, 0, 5]))
+        dtype('int8')
+        >>> smallest_label_dtype(np.array([-1, 0, 300]))
+        dtype('int16')
+    """
+    if labels.size == 0:
+        return np.dtype(np.int8)
+
+    low, high = int(labels.min()), int(labels.max())
+    bound = max(high - low, abs(low), abs(high))
+    for dtype in (np.int8, np.int16, np.int32):
+        if bound <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def write_array(archive: zipfile.ZipFile, name: str, array: np.ndarray) -> None:
+    with archive.open(f"{name}.npy", "w", force_zip64=True) as file:
+        np.lib.format.write_array(file, np.asarray(array), allow_pickle=False)
+
+
+class LabelArchiveWriter:
+    """
+    Writes the cluster labels of every configuration of a sweep to a compact archive.
+
+    Labels are buffered in blocks of configurations. Each block is sorted by its
+    parameter values, so that neighbouring grid points end up next to each other, and
+    stored as its first label vector followed by the differences between consecutive
+    vectors, in the smallest integer dtype that fits. Neighbouring configurations tend
+    to share most of their labels, so the differences are mostly zeros, which the
+    archive's deflate compression shrinks down to a fraction of the raw size.
+
+    The embeddings the labels were computed on are stored along with them, so that an
+    archive is enough to compute any new metric, see `Rescorer`.
+
+    Args:
+        path (str): Path of the archive, a `.npz` file readable with `np.load`.
+        parameter_names (List[str]): Names of the hyperparameters of each configuration.
+        embeddings (np.ndarray): Embeddings that were clustered.
+        block_size (int): Number of configurations per block.
+
+    Examples:
+        >>> with LabelArchiveWriter("labels.npz", ["min_cluster_size", "min_samples"], X) as writer:
+        ...     for hdbscan in sampler.iterate_configurations():
+        ...         labels = hdbscan.fit_predict(X)
+        ...         writer.add([hdbscan.min_cluster_size, hdbscan.min_samples], labels)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        parameter_names: List[str],
+        embeddings: np.ndarray,
+        block_size: int = 256,
+    ) -> None:
+        self.path = path
+        self.parameter_names = parameter_names
+        self.block_size = block_size
+
+        self.archive = zipfile.ZipFile(
+            path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        )
+        write_array(self.archive, "embeddings", embeddings)
+
+        self.blocks = 0
+        self.configurations = 0
+        self.parameters: List[Sequence] = []
+        self.labels: List[np.ndarray] = []
+
+    def add(self, parameters: Sequence, labels: np.ndarray) -> None:
+        self.parameters.append(list(parameters))
+        self.labels.append(labels)
+        if len(self.labels) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.labels:
+            return
+
+        parameters = np.array(self.parameters)
+        order = np.lexsort(parameters.T[::-1])
+        labels = np.stack(self.labels)[order].astype(np.int64)
+
+        dtype = smallest_label_dtype(labels)
+        deltas = np.empty_like(labels, dtype=dtype)
+        deltas[0] = labels[0]
+        deltas[1:] = np.diff(labels, axis=0)
+
+        write_array(self.archive, f"parameters_{self.blocks}", parameters[order])
+        write_array(self.archive, f"labels_{self.blocks}", deltas)
+
+        self.blocks += 1
+        self.configurations += len(labels)
+        self.parameters = []
+        self.labels = []
+
+    def close(self) -> None:
+        self.flush()
+        with self.archive.open("meta.json", "w") as file:
+            file.write(
+                json.dumps(
+                    {
+                        "parameter_names": self.parameter_names,
+                        "blocks": self.blocks,
+                        "configurations": self.configurations,
+                    }
+                ).encode()
+            )
+        self.archive.close()
+
+    def __enter__(self) -> "LabelArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class LabelArchive:
+    """
+    Reads an archive written by `LabelArchiveWriter`, one block at a time.
+
+    The parameters of every block are indexed when the archive is opened, so that
+    `labels_of` only decodes the block holding the requested configuration.
+
+    Args:
+        path (str): Path of the archive.
+
+    Examples:
+        >>> archive = LabelArchive("labels.npz")
+        >>> archive.parameter_names
+        ['min_cluster_size', 'min_samples']
+        >>> for parameters, labels in archive.iterate_blocks():
+        ...     parameters.shape, labels.shape
+        ((256, 2), (256, 5000))
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with zipfile.ZipFile(path) as archive:
+            meta = json.loads(archive.read("meta.json"))
+
+        self.parameter_names: List[str] = meta["parameter_names"]
+        self.blocks: int = meta["blocks"]
+        self.configurations: int = meta["configurations"]
+
+        self.index: Dict[tuple, Tuple[int, int]] = {}
+        with np.load(self.path) as archive:
+            for block in range(self.blocks):
+                for row, parameters in enumerate(archive[f"parameters_{block}"]):
+                    self.index.setdefault(tuple(parameters.tolist()), (block, row))
+
+    def __len__(self) -> int:
+        return self.configurations
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        with np.load(self.path) as archive:
+            return archive["embeddings"]
+
+    def labels_of(self, parameters: Sequence) -> np.ndarray:
+        """
+        Decodes the labels of a single configuration, e.g. a point of a metric map.
+
+        Raises:
+            KeyError: If the archive has no such configuration.
+        """
+        key = tuple(np.asarray(parameters).tolist())
+        if key not in self.index:
+            raise KeyError(f"No configuration {list(parameters)} in {self.path}.")
+
+        block, row = self.index[key]
+        with np.load(self.path) as archive:
+            deltas = archive[f"labels_{block}"][: row + 1]
+        return deltas.sum(axis=0, dtype=np.int64).astype(deltas.dtype)
+
+    def iterate_blocks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yields the parameters (configurations x hyperparameters) and the decoded labels
+        (configurations x documents) of each block.
+        """
+        with np.load(self.path) as archive:
+            for block in range(self.blocks):
+                parameters = archive[f"parameters_{block}"]
+                deltas = archive[f"labels_{block}"]
+                labels = np.cumsum(deltas, axis=0, dtype=np.int64).astype(deltas.dtype)
+                yield parameters, labels
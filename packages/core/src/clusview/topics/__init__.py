@@ -0,0 +1,3 @@
+"""
+Topic representations of clustering configurations.
+"""
@@ -0,0 +1,284 @@
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List
+
+import numpy as np
+
+from ..loaders.documents.base_document_loader import BaseDocumentLoader
+from ..profiling.profiler import profiler
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+    from sklearn.feature_extraction.text import CountVectorizer
+
+SPARSE_PARTS = ("data", "indices", "indptr")
+
+
+def window_matrix(
+    token_ids: List[np.ndarray], window: int, n_terms: int
+) -> "csr_matrix":
+    """
+    Binary matrix of shape (windows, terms) with a one where a term occurs in a window.
+
+    Every document contributes its windows of `window` consecutive tokens, or a single
+    window when it is shorter.
+    """
+    from scipy.sparse import csr_matrix
+
+    rows, columns = [], []
+    n_windows = 0
+    for ids in token_ids:
+        if len(ids) == 0:
+            continue
+        starts = np.arange(max(1, len(ids) - window + 1))
+        positions = starts[:, None] + np.arange(min(window, len(ids)))
+        rows.append(np.repeat(n_windows + starts, positions.shape[1]))
+        columns.append(ids[positions.ravel()])
+        n_windows += len(starts)
+
+    if not rows:
+        return csr_matrix((0, n_terms))
+    matrix = csr_matrix(
+        (np.ones(sum(map(len, rows))), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(n_windows, n_terms),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+class CooccurrenceIndex:
+    """
+    Term co-occurrence counts of a corpus, built once so that the coherence of any set
+    of topics is a handful of sparse lookups instead of a rescan of the corpus.
+
+    Counts are taken over sliding windows of `window` consecutive vocabulary tokens,
+    stop words being dropped by the vectorizer first, or over whole documents if
+    `window` is `None`. The index keeps the upper triangle of the symmetric count
+    matrix, whose diagonal holds the number of windows containing each term, and the
+    document-term matrix, so that topics can be extracted over the same vocabulary, see
+    `TopicCoherence`.
+
+    A saved index is memory-mapped when loaded, and pickles as its path, so that pool
+    workers share it through the page cache.
+
+    Args:
+        documents (List[str]): The corpus, as loaded by a `BaseDocumentLoader`.
+        vectorizer (CountVectorizer): Tokenizer and vocabulary builder. English stop
+            words removed, terms in at least 2 documents, if `None`. Bound its
+            `max_features` on large corpora, as the counts grow with the square of the
+            vocabulary.
+        window (int): Number of consecutive tokens per window, whole documents if
+            `None`. 10 is the usual window of NPMI coherence.
+        chunk_size (int): Number of documents counted at once.
+
+    Examples:
+        >>> index = CooccurrenceIndex.from_loader(loader, window=10)
+        >>> index.save("stores/cooccurrence")
+        >>> index = CooccurrenceIndex.load("stores/cooccurrence")
+        >>> index.coherence([["protein", "folding", "structure"], ["galaxy", "dark"]])
+        array([0.31, 0.18])
+    """
+
+    def __init__(
+        self,
+        documents: List[str],
+        vectorizer: "CountVectorizer" = None,
+        window: int = None,
+        chunk_size: int = 10_000,
+    ) -> None:
+        from scipy.sparse import csr_matrix, triu
+
+        if vectorizer is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+
+            vectorizer = CountVectorizer(stop_words="english", min_df=2)
+
+        with profiler.stage("cooccurrence.vectorize"):
+            document_terms = vectorizer.fit_transform(documents).tocsr()
+        vocabulary = vectorizer.get_feature_names_out()
+        n_terms = len(vocabulary)
+
+        counts = csr_matrix((n_terms, n_terms), dtype=np.int64)
+        n_windows = 0
+        with profiler.stage("cooccurrence.count"):
+            for windows in self.iterate_windows(
+                documents, document_terms, vectorizer, window, chunk_size
+            ):
+                counts = counts + triu(windows.T @ windows).astype(np.int64)
+                n_windows += windows.shape[0]
+
+        self.setup(document_terms, vocabulary, counts.tocsr(), n_windows, window)
+
+    @staticmethod
+    def iterate_windows(
+        documents: List[str],
+        document_terms: "csr_matrix",
+        vectorizer: "CountVectorizer",
+        window: int,
+        chunk_size: int,
+    ) -> Iterator["csr_matrix"]:
+        """
+        Yields the binary window-term matrix of each chunk of documents.
+        """
+        if window is None:
+            for start in range(0, len(documents), chunk_size):
+                windows = document_terms[start : start + chunk_size].copy()
+                windows.data[:] = 1
+                yield windows
+            return
+
+        analyzer = vectorizer.build_analyzer()
+        term_ids = vectorizer.vocabulary_
+        for start in range(0, len(documents), chunk_size):
+            token_ids = []
+            for document in documents[start : start + chunk_size]:
+                ids = np.fromiter(
+                    (term_ids.get(token, -1) for token in analyzer(document)),
+                    dtype=np.int64,
+                )
+                token_ids.append(ids[ids >= 0])
+            yield window_matrix(token_ids, window, len(term_ids))
+
+    def setup(
+        self,
+        document_terms: "csr_matrix",
+        vocabulary: np.ndarray,
+        counts: "csr_matrix",
+        n_windows: int,
+        window: int | None,
+        directory: str = None,
+    ) -> None:
+        self.document_terms = document_terms
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.n_windows = n_windows
+        self.window = window
+        self.directory = directory
+        self.term_ids: Dict[str, int] = {
+            str(term): index for index, term in enumerate(vocabulary)
+        }
+
+    @classmethod
+    def from_loader(
+        cls, document_loader: BaseDocumentLoader, **kwargs: Any
+    ) -> "CooccurrenceIndex":
+        return cls(document_loader.load_documents(), **kwargs)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        if self.directory is not None:
+            return {"directory": self.directory}
+        state = self.__dict__.copy()
+        del state["term_ids"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        if "counts" not in state:
+            self.__dict__.update(CooccurrenceIndex.load(state["directory"]).__dict__)
+            return
+        self.setup(**state)
+
+    def save(self, directory: str) -> None:
+        """
+        Saves the index as plain `.npy` arrays, memory-mapped by `load`.
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, matrix in (
+            ("counts", self.counts),
+            ("document_terms", self.document_terms),
+        ):
+            for part in SPARSE_PARTS:
+                np.save(path / f"{name}_{part}.npy", getattr(matrix, part))
+        np.save(path / "vocabulary.npy", self.vocabulary.astype(str))
+        (path / "meta.json").write_text(
+            json.dumps(
+                {
+                    "n_windows": self.n_windows,
+                    "window": self.window,
+                    "document_terms_shape": list(self.document_terms.shape),
+                }
+            )
+        )
+        self.directory = str(path)
+
+    @classmethod
+    def load(cls, directory: str) -> "CooccurrenceIndex":
+        from scipy.sparse import csr_matrix
+
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text())
+        vocabulary = np.load(path / "vocabulary.npy")
+
+        def matrix(name: str, shape: tuple) -> "csr_matrix":
+            parts = [
+                np.load(path / f"{name}_{part}.npy", mmap_mode="r")
+                for part in SPARSE_PARTS
+            ]
+            return csr_matrix(tuple(parts), shape=shape, copy=False)
+
+        index = cls.__new__(cls)
+        index.setup(
+            matrix("document_terms", tuple(meta["document_terms_shape"])),
+            vocabulary,
+            matrix("counts", (len(vocabulary), len(vocabulary))),
+            meta["n_windows"],
+            meta["window"],
+            directory=str(path),
+        )
+        return index
+
+    def npmi(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """
+        Normalised pointwise mutual information of pairs of term indices.
+
+        Returns:
+            np.ndarray: NPMI of each pair, in [-1, 1], -1 for terms never seen
+            together.
+        """
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        joint = np.asarray(self.counts[first, second], dtype=float).ravel()
+        diagonal = self.counts.diagonal()
+        marginal = diagonal[first].astype(float) * diagonal[second]
+
+        n = max(self.n_windows, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pmi = np.log(joint * n / marginal)
+            npmi = pmi / -np.log(joint / n)
+        npmi = np.where(joint >= n, 1.0, npmi)
+        return np.where(joint == 0, -1.0, npmi)
+
+    def coherence(self, topics: List[List[str]]) -> np.ndarray:
+        """
+        NPMI coherence of topics, the mean NPMI over every pair of their terms.
+
+        All pairs of every topic are looked up at once. Terms outside the vocabulary
+        are ignored.
+
+        Args:
+            topics (List[List[str]]): The top terms of each topic.
+
+        Returns:
+            np.ndarray: The coherence of each topic, NaN for topics with fewer than two
+            known terms.
+        """
+        first, second, owners = [], [], []
+        for topic, terms in enumerate(topics):
+            ids = np.array(
+                [self.term_ids[term] for term in terms if term in self.term_ids],
+                dtype=np.int64,
+            )
+            rows, columns = np.triu_indices(len(ids), k=1)
+            first.append(ids[rows])
+            second.append(ids[columns])
+            owners.append(np.full(len(rows), topic))
+
+        if not topics:
+            return np.array([], dtype=float)
+        owners = np.concatenate(owners).astype(np.int64)
+        values = self.npmi(np.concatenate(first), np.concatenate(second))
+
+        pairs = np.bincount(owners, minlength=len(topics))
+        totals = np.bincount(owners, weights=values, minlength=len(topics))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(pairs > 0, totals / pairs, np.nan)
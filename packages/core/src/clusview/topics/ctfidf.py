@@ -0,0 +1,183 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import numpy as np
+
+from ..loaders.documents.base_document_loader import BaseDocumentLoader
+from ..profiling.profiler import profiler
+from .partitions import PartitionCache, canonical_labels
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+    from sklearn.feature_extraction.text import CountVectorizer
+
+
+def indicator_matrix(canonical: np.ndarray, n_clusters: int) -> "csr_matrix":
+    """
+    Sparse matrix of shape (clusters, documents) with a one where a document belongs
+    to a cluster. Outliers belong to none.
+    """
+    from scipy.sparse import csr_matrix
+
+    documents = np.flatnonzero(canonical >= 0)
+    return csr_matrix(
+        (np.ones(len(documents)), (canonical[documents], documents)),
+        shape=(n_clusters, len(canonical)),
+    )
+
+
+def top_terms(
+    weights: "csr_matrix", vocabulary: np.ndarray, top_k: int
+) -> List[List[Tuple[str, float]]]:
+    """
+    Returns:
+        List[List[Tuple[str, float]]]: The `top_k` terms of each row of a sparse weight
+        matrix, and their weights, from the highest.
+    """
+    topics = []
+    for row in range(weights.shape[0]):
+        start, stop = weights.indptr[row], weights.indptr[row + 1]
+        data, indices = weights.data[start:stop], weights.indices[start:stop]
+        if len(data) > top_k:
+            kept = np.argpartition(-data, top_k)[:top_k]
+            data, indices = data[kept], indices[kept]
+        order = np.argsort(-data, kind="stable")
+        topics.append([(str(vocabulary[indices[i]]), float(data[i])) for i in order])
+    return topics
+
+
+class ClassTFIDF:
+    """
+    Class-based TF-IDF topic representations for any clustering of a corpus.
+
+    The document-term matrix is built once. The term counts of every cluster of a
+    configuration then come from a single sparse product, the cluster indicator matrix
+    times the document-term matrix, and are weighted as in BERTopic: term frequencies
+    within each cluster, L1-normalised, times `log(1 + A / f)`, where `A` is the
+    average number of words per cluster and `f` the frequency of the term over all
+    clusters.
+
+    Topics are cached per distinct partition, see `PartitionCache`, so that revisiting
+    a configuration of a metric map, or any configuration with the same clusters, is
+    immediate.
+
+    Args:
+        documents (List[str]): The corpus, as loaded by a `BaseDocumentLoader`.
+        vectorizer (CountVectorizer): Tokenizer and vocabulary builder. English stop
+            words removed, terms in at least 2 documents, if `None`.
+        top_k (int): Number of terms per topic.
+        cache_size (int): Number of partitions whose topics are cached.
+
+    Examples:
+        >>> ctfidf = ClassTFIDF.from_loader(CSVConcatenator("papers.csv", ["Title", "Abstract"]))
+        >>> labels = HDBSCAN(min_cluster_size=40, min_samples=10).fit_predict(reduced_embeddings)
+        >>> ctfidf.topics(labels)[0]
+        [('protein', 0.081), ('folding', 0.064), ('structure', 0.041), ...]
+
+        >>> archive = LabelArchive("maps/labels_0.npz")
+        >>> ctfidf.topics(archive.labels_of([40, 10]))
+    """
+
+    def __init__(
+        self,
+        documents: List[str],
+        vectorizer: "CountVectorizer" = None,
+        top_k: int = 10,
+        cache_size: int = 1024,
+    ) -> None:
+        if vectorizer is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+
+            vectorizer = CountVectorizer(stop_words="english", min_df=2)
+
+        with profiler.stage("ctfidf.vectorize"):
+            document_terms = vectorizer.fit_transform(documents).tocsr()
+        vocabulary = vectorizer.get_feature_names_out()
+        self.setup(document_terms, vocabulary, top_k, cache_size)
+
+    def setup(
+        self,
+        document_terms: "csr_matrix",
+        vocabulary: np.ndarray,
+        top_k: int,
+        cache_size: int,
+    ) -> None:
+        self.document_terms = document_terms
+        self.vocabulary = vocabulary
+        self.top_k = top_k
+        self.cache = PartitionCache(cache_size)
+
+    @classmethod
+    def from_loader(
+        cls, document_loader: BaseDocumentLoader, **kwargs: Any
+    ) -> "ClassTFIDF":
+        return cls(document_loader.load_documents(), **kwargs)
+
+    @classmethod
+    def from_counts(
+        cls,
+        document_terms: "csr_matrix",
+        vocabulary: np.ndarray,
+        top_k: int = 10,
+        cache_size: int = 1024,
+    ) -> "ClassTFIDF":
+        """
+        Topics over an existing document-term matrix, such as that of a
+        `CooccurrenceIndex`, without vectorizing the corpus again.
+        """
+        ctfidf = cls.__new__(cls)
+        ctfidf.setup(document_terms.tocsr(), vocabulary, top_k, cache_size)
+        return ctfidf
+
+    def class_terms(self, canonical: np.ndarray) -> "csr_matrix":
+        """
+        Returns:
+            csr_matrix: Term counts of each canonical cluster, of shape
+            (clusters, terms).
+        """
+        n_clusters = int(canonical.max()) + 1 if len(canonical) else 0
+        return (indicator_matrix(canonical, n_clusters) @ self.document_terms).tocsr()
+
+    def weights(self, canonical: np.ndarray) -> "csr_matrix":
+        """
+        Returns:
+            csr_matrix: c-TF-IDF weights of each canonical cluster, of shape
+            (clusters, terms).
+        """
+        from scipy.sparse import diags
+
+        counts = self.class_terms(canonical)
+        words_per_cluster = np.asarray(counts.sum(axis=1)).ravel()
+        term_frequencies = np.asarray(counts.sum(axis=0)).ravel()
+
+        average_words = words_per_cluster.mean() if len(words_per_cluster) else 0.0
+        idf = np.log1p(average_words / np.maximum(term_frequencies, 1))
+        tf = diags(1 / np.maximum(words_per_cluster, 1)) @ counts
+        return (tf @ diags(idf)).tocsr()
+
+    def topics(
+        self, labels: np.ndarray, top_k: int = None
+    ) -> Dict[int, List[Tuple[str, float]]]:
+        """
+        Top terms of every cluster of a configuration.
+
+        Args:
+            labels (np.ndarray): Label of every document, -1 for outliers.
+            top_k (int): Number of terms per topic, `self.top_k` if `None`.
+
+        Returns:
+            Dict[int, List[Tuple[str, float]]]: The terms of each cluster, by label,
+            with their c-TF-IDF weights, from the highest.
+        """
+        top_k = top_k or self.top_k
+        canonical, clusters = canonical_labels(labels)
+
+        def compute() -> List[List[Tuple[str, float]]]:
+            with profiler.stage("ctfidf.topics"):
+                return top_terms(self.weights(canonical), self.vocabulary, top_k)
+
+        # Only topics of the default size are cached.
+        if top_k == self.top_k:
+            canonical_topics = self.cache.get_or_compute(canonical, compute)
+        else:
+            canonical_topics = compute()
+        return {int(label): terms for label, terms in zip(clusters, canonical_topics)}
@@ -0,0 +1,81 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+
+import numpy as np
+
+
+def canonical_labels(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Renumbers clusters by order of first appearance, keeping outliers at -1, so that
+    label vectors describing the same partition become identical.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The renumbered labels, and the original label of
+        each canonical cluster.
+
+    Examples:
+        >>> canonical_labels(np.array([3, 3, -1, 0, 3, 0]))
+        (array([ 0,  0, -1,  1,  0,  1]), array([3, 0]))
+    """
+    labels = np.asarray(labels)
+    clustered = labels >= 0
+    clusters, first_index, inverse = np.unique(
+        labels[clustered], return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_index, kind="stable")
+    rank = np.empty(len(clusters), dtype=np.int64)
+    rank[order] = np.arange(len(clusters))
+
+    canonical = np.full(len(labels), -1, dtype=np.int64)
+    canonical[clustered] = rank[inverse.reshape(-1)]
+    return canonical, clusters[order]
+
+
+def partition_key(canonical: np.ndarray) -> str:
+    """
+    Returns:
+        str: Digest identifying a partition, given its canonical labels.
+    """
+    return hashlib.sha1(np.ascontiguousarray(canonical, dtype=np.int64)).hexdigest()
+
+
+class PartitionCache:
+    """
+    Least-recently-used cache of results computed from a partition of the documents.
+
+    Neighbouring configurations of a sweep often produce the same partition under
+    different label numbers, so entries are keyed by the canonical labels, and
+    results are computed for canonical clusters `0..n-1`.
+
+    Args:
+        max_size (int): Number of partitions kept.
+
+    Examples:
+        >>> cache = PartitionCache(1024)
+        >>> canonical, clusters = canonical_labels(labels)
+        >>> result = cache.get_or_compute(canonical, lambda: expensive(canonical))
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_or_compute(self, canonical: np.ndarray, compute: Callable[[], Any]) -> Any:
+        key = partition_key(canonical)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        result = compute()
+        self.entries[key] = result
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return result
@@ -0,0 +1,164 @@
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+from ..profiling.profiler import profiler
+from .ctfidf import indicator_matrix
+from .partitions import PartitionCache, canonical_labels
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import NearestNeighbors
+
+
+class RepresentativeIndex:
+    """
+    Most central documents of every cluster of any configuration of a run.
+
+    A nearest-neighbour index over the embeddings is built once. The centroids of
+    every cluster of a configuration then come from a single sparse product, the
+    cluster indicator matrix times the embeddings, and are looked up in the index at
+    once, keeping the nearest neighbours that belong to their cluster. The few
+    clusters that do not get `top_k` members this way, such as elongated ones whose
+    centroid lies among other clusters, are ranked exactly, which only costs a pass
+    over their own members. The first representative of a cluster, its member closest
+    to the centroid, stands in for its medoid without the quadratic search.
+
+    Representatives are cached per distinct partition, see `PartitionCache`, so that
+    browsing clusters across a sweep only computes each partition once.
+
+    Args:
+        embeddings (np.ndarray): Embeddings of the documents, the reduced ones that
+            were clustered or the original ones.
+        metric (str): Distance between documents, any metric of `NearestNeighbors`.
+        top_k (int): Number of representatives per cluster.
+        oversampling (int): Neighbours looked up per representative, to make up for
+            those in other clusters.
+        cache_size (int): Number of partitions whose representatives are cached.
+
+    Examples:
+        >>> index = RepresentativeIndex(reduced_embeddings, top_k=5)
+        >>> archive = LabelArchive("maps/labels_0.npz")
+        >>> representatives = index.representatives(archive.labels_of([40, 10]))
+        >>> [documents[document] for document in representatives[0]]
+        ['Protein folding with ...', ...]
+        >>> index.medoids(archive.labels_of([40, 10]))
+        {0: 1532, 1: 87, ...}
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        metric: str = "euclidean",
+        top_k: int = 5,
+        oversampling: int = 4,
+        cache_size: int = 1024,
+    ) -> None:
+        from sklearn.neighbors import NearestNeighbors
+
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.metric = metric
+        self.top_k = top_k
+        self.oversampling = oversampling
+        self.cache = PartitionCache(cache_size)
+        with profiler.stage("representatives.index"):
+            self.neighbors: "NearestNeighbors" = NearestNeighbors(metric=metric)
+            self.neighbors.fit(self.embeddings)
+
+    def centroids(self, canonical: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Mean embedding of each canonical cluster, of shape
+            (clusters, dimensions).
+        """
+        n_clusters = int(canonical.max()) + 1 if len(canonical) else 0
+        sizes = np.bincount(canonical[canonical >= 0], minlength=n_clusters)
+        sums = indicator_matrix(canonical, n_clusters) @ self.embeddings
+        return sums / np.maximum(sizes, 1)[:, None]
+
+    def rank_members(
+        self, canonical: np.ndarray, centroids: np.ndarray, clusters: np.ndarray
+    ) -> List[np.ndarray]:
+        """
+        Exact ranking of the members of some clusters by distance to their centroid.
+        """
+        from sklearn.metrics import pairwise_distances
+
+        order = np.argsort(canonical, kind="stable")
+        bounds = np.searchsorted(canonical[order], [clusters, clusters + 1])
+        ranked = []
+        for cluster, start, stop in zip(clusters, *bounds):
+            members = order[start:stop]
+            distances = pairwise_distances(
+                self.embeddings[members],
+                centroids[cluster][None, :],
+                metric=self.metric,
+            ).ravel()
+            ranked.append(members[np.argsort(distances, kind="stable")[: self.top_k]])
+        return ranked
+
+    def canonical_representatives(self, canonical: np.ndarray) -> List[np.ndarray]:
+        """
+        Returns:
+            List[np.ndarray]: The indices of the `top_k` documents of each canonical
+            cluster closest to its centroid, from the closest.
+        """
+        centroids = self.centroids(canonical)
+        if len(centroids) == 0:
+            return []
+
+        n_neighbors = min(self.top_k * self.oversampling, len(self.embeddings))
+        _, neighbors = self.neighbors.kneighbors(centroids, n_neighbors=n_neighbors)
+
+        # Neighbours of each centroid outside its cluster are moved last.
+        members = canonical[neighbors] == np.arange(len(centroids))[:, None]
+        order = np.argsort(~members, axis=1, kind="stable")[:, : self.top_k]
+        found = members.sum(axis=1)
+
+        sizes = np.bincount(canonical[canonical >= 0], minlength=len(centroids))
+        missing = np.flatnonzero(found < np.minimum(sizes, self.top_k))
+        representatives = [
+            row[:count]
+            for row, count in zip(
+                np.take_along_axis(neighbors, order, axis=1),
+                np.minimum(found, self.top_k),
+            )
+        ]
+        for cluster, ranked in zip(
+            missing, self.rank_members(canonical, centroids, missing)
+        ):
+            representatives[cluster] = ranked
+        return representatives
+
+    def representatives(self, labels: np.ndarray) -> Dict[int, np.ndarray]:
+        """
+        Most central documents of every cluster of a configuration.
+
+        Args:
+            labels (np.ndarray): Label of every document, -1 for outliers.
+
+        Returns:
+            Dict[int, np.ndarray]: The indices of the `top_k` documents of each
+            cluster closest to its centroid, by label, from the closest.
+        """
+        canonical, clusters = canonical_labels(labels)
+
+        def compute() -> List[np.ndarray]:
+            with profiler.stage("representatives.query"):
+                return self.canonical_representatives(canonical)
+
+        canonical_representatives = self.cache.get_or_compute(canonical, compute)
+        return {
+            int(label): documents
+            for label, documents in zip(clusters, canonical_representatives)
+        }
+
+    def medoids(self, labels: np.ndarray) -> Dict[int, int]:
+        """
+        Returns:
+            Dict[int, int]: The member of each cluster closest to its centroid, by
+            label.
+        """
+        return {
+            label: int(documents[0])
+            for label, documents in self.representatives(labels).items()
+        }